@@ -0,0 +1,256 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+
+from compressed_input import file_stem
+from duckdb_catalog import DuckDBCatalog, quote_literal
+from engine_settings import EngineSettings
+from file_loader import FileLoader, MultiFileLoader
+from ingest_cache import IngestCache
+from query_server import QueryServer
+from sql_templates import default_templates, render_template, template_placeholders
+
+TEMPLATES_FILE = 'sql_templates.json'  # 与界面共用的自定义模板文件
+OUTPUT_FORMATS = ('csv', 'parquet')
+FETCH_ROWS = 10000  # 输出到标准输出时每批取回的行数
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='sql4csv',
+        description='命令行批处理：导入CSV/Excel文件，执行SQL模板或SQL文件，并把结果写出为CSV/Parquet（不启动界面）',
+        epilog='示例:\n'
+               '  python cli.py -l sales=data/sales.csv -t 分组统计 -p table=sales -p column=region -o out.parquet\n'
+               '  python cli.py -w work.duckdb -f report.sql -o report.csv',
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('-w', '--workspace', help='打开DuckDB工作区文件（其中的表、自定义模板可直接使用）')
+    parser.add_argument('-l', '--load', action='append', default=[], metavar='[表名=]路径',
+                        help='导入文件为表，可重复；路径可使用通配符（多个文件按列名合并为一张表）')
+    parser.add_argument('--native', action='store_true', help='使用DuckDB原生CSV读取器导入')
+    parser.add_argument('--no-clean', action='store_true', help='不清理数据（保留全空行和列名空格）')
+    parser.add_argument('--encoding', help='文件编码（默认自动检测）')
+    parser.add_argument('--no-cache', action='store_true', help='不使用导入缓存')
+
+    query = parser.add_mutually_exclusive_group()
+    query.add_argument('-s', '--sql', help='要执行的SQL（可包含多条语句，写出最后一条语句的结果）')
+    query.add_argument('-f', '--sql-file', help='要执行的SQL文件')
+    query.add_argument('-t', '--template', help='要执行的模板名称')
+    query.add_argument('--list-templates', action='store_true', help='列出可用的模板及其参数')
+    query.add_argument('--serve', nargs='?', type=int, const=QueryServer.DEFAULT_PORT, metavar='端口',
+                       help=f'导入后开启本机HTTP/JSON查询服务（默认端口 {QueryServer.DEFAULT_PORT}），按 Ctrl+C 停止')
+    parser.add_argument('-p', '--param', action='append', default=[], metavar='名称=值',
+                        help='模板参数，可重复；未指定的参数使用模板中的默认值')
+    parser.add_argument('--templates', default=TEMPLATES_FILE, help=f'自定义模板文件（默认 {TEMPLATES_FILE}）')
+
+    parser.add_argument('-o', '--output', help='输出文件（.csv 或 .parquet），不指定时以CSV写到标准输出')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, help='输出格式（默认按输出文件扩展名）')
+    parser.add_argument('-q', '--quiet', action='store_true', help='不输出进度信息')
+    return parser.parse_args(argv)
+
+
+def log(args, message):
+    """进度信息写到标准错误，不影响写到标准输出的结果"""
+    if not args.quiet:
+        print(message, file=sys.stderr)
+
+
+def load_templates(args, meta):
+    """可用的模板：默认模板、自定义模板文件和工作区中保存的模板（按名称去重，先出现的优先）"""
+    templates = default_templates()
+    if os.path.exists(args.templates):
+        with open(args.templates, 'r', encoding='utf-8') as f:
+            templates += json.load(f)
+    templates += meta.get('custom_templates', [])
+    unique = {}
+    for template in templates:
+        unique.setdefault(template['name'], template)
+    return list(unique.values())
+
+
+def parse_pairs(values, option):
+    """解析 名称=值 形式的参数"""
+    pairs = {}
+    for value in values:
+        name, sep, text = value.partition('=')
+        if not sep or not name:
+            raise ValueError(f'{option} 参数格式应为 名称=值: {value}')
+        pairs[name.strip()] = text
+    return pairs
+
+
+def load_files(args, catalog):
+    """导入 --load 指定的文件，返回导入的表名列表"""
+    cache = None
+    if not args.no_cache:
+        try:
+            cache = IngestCache()
+        except OSError as e:
+            log(args, f'导入缓存不可用: {e}')
+
+    table_names = []
+    for spec in args.load:
+        table_name, sep, path = spec.partition('=')
+        if not sep:
+            table_name, path = '', spec
+        file_paths = sorted(glob.glob(path)) if glob.has_magic(path) else [path]
+        if not file_paths:
+            raise FileNotFoundError(f'没有匹配的文件: {path}')
+        for file_path in file_paths:
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(f'文件不存在: {file_path}')
+        table_name = table_name or file_stem(file_paths[0]).lower().replace(' ', '_')
+
+        options = dict(native=args.native, clean=not args.no_clean, encoding=args.encoding, cache=cache)
+        if len(file_paths) > 1:
+            loader = MultiFileLoader(catalog, file_paths, table_name, **options)
+        else:
+            loader = FileLoader(catalog, file_paths[0], table_name, **options)
+        started = time.monotonic()
+        result = loader.load()
+        row_count, col_count = catalog.table_shape(table_name)
+        cache_note = '（来自导入缓存）' if result['from_cache'] else ''
+        log(args, f'已导入 {table_name}: {len(file_paths)} 个文件，{row_count} 行 × {col_count} 列，'
+                  f'耗时 {time.monotonic() - started:.2f} 秒{cache_note}')
+        for drift in result['schema_drift']:
+            log(args, f'列结构不一致: {drift}')
+        table_names.append(table_name)
+    return table_names
+
+
+def query_to_run(args, templates):
+    """要执行的SQL和绑定的参数值 (SQL, 参数值列表)"""
+    if args.sql is not None:
+        return args.sql, []
+    if args.sql_file is not None:
+        with open(args.sql_file, 'r', encoding='utf-8') as f:
+            return f.read(), []
+
+    template = next((t for t in templates if t['name'] == args.template), None)
+    if template is None:
+        raise ValueError(f'未找到模板: {args.template}（使用 --list-templates 查看可用的模板）')
+    values = parse_pairs(args.param, '--param')
+    for param in template.get('params', []):
+        if param['name'] not in values and 'default' in param:
+            values[param['name']] = param['default']
+    unknown = set(values) - set(template_placeholders(template['sql']))
+    if unknown:
+        raise ValueError(f'模板 {template["name"]} 没有参数: {", ".join(sorted(unknown))}')
+    return render_template(template, values)
+
+
+def write_output(args, cursor, sql, params):
+    """执行最后一条语句并写出结果：写文件时由DuckDB直接COPY，否则以CSV分批写到标准输出，返回行数"""
+    if args.output is not None:
+        output_format = args.format or os.path.splitext(args.output)[1].lstrip('.').lower()
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f'不支持的输出格式: {output_format}（可用 --format 指定 csv 或 parquet）')
+        options = 'FORMAT csv, HEADER' if output_format == 'csv' else 'FORMAT parquet, COMPRESSION zstd'
+        return cursor.execute(
+            f'COPY ({sql}\n) TO {quote_literal(args.output)} ({options})', params
+        ).fetchone()[0]
+
+    cursor.execute(sql, params)
+    writer = csv.writer(sys.stdout, lineterminator='\n')
+    writer.writerow([column[0] for column in cursor.description])
+    row_count = 0
+    while True:
+        rows = cursor.fetchmany(FETCH_ROWS)
+        if not rows:
+            break
+        writer.writerows(rows)
+        row_count += len(rows)
+    return row_count
+
+
+def run_query(args, catalog, sql, params):
+    """依次执行各条语句，写出最后一条查询语句的结果"""
+    cursor = catalog.cursor()
+    try:
+        statements = cursor.extract_statements(sql)
+        if not statements:
+            raise ValueError('SQL为空')
+        if params and len(statements) != 1:
+            raise ValueError('带参数的模板只能包含一条SQL语句')
+        for number, statement in enumerate(statements, 1):
+            started = time.monotonic()
+            query = statement.query.strip().rstrip(';')
+            try:
+                if number == len(statements) and statement.type.name == 'SELECT':
+                    row_count = write_output(args, cursor, query, params)
+                    target = args.output or '标准输出'
+                    log(args, f'已写出 {row_count} 行到 {target}，耗时 {time.monotonic() - started:.2f} 秒')
+                else:
+                    cursor.execute(query, params)
+                    log(args, f'第 {number} 条语句（{statement.type.name}）完成，耗时 {time.monotonic() - started:.2f} 秒')
+            except Exception as e:
+                raise Exception(f'第 {number} 条语句执行失败: {e}') from e
+    finally:
+        cursor.close()
+
+
+def serve(args, catalog):
+    """开启查询服务，直到按 Ctrl+C"""
+    server = QueryServer(catalog, args.serve)
+    server.start()
+    log(args, f'查询服务已开启: {server.url}，访问令牌 {server.token}'
+              f'（请求头 Authorization: Bearer <令牌>；POST /query 执行查询，GET /tables、/metrics 查看表和统计），按 Ctrl+C 停止')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    metrics = server.metrics_snapshot()
+    log(args, f"查询服务已停止，共执行 {metrics['queries']} 次查询")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    catalog = None
+    try:
+        catalog = DuckDBCatalog(settings=EngineSettings())
+        meta = {}
+        if args.workspace:
+            meta = catalog.open_workspace(args.workspace)
+        templates = load_templates(args, meta)
+
+        if args.list_templates:
+            for template in templates:
+                params = ', '.join(
+                    param['name'] + (f'={param["default"]}' if 'default' in param else '')
+                    for param in template.get('params', [])
+                )
+                print(f'{template["name"]}\t{params}')
+            return 0
+
+        loaded = load_files(args, catalog)
+        if args.serve is not None:
+            serve(args, catalog)
+        elif args.sql is None and args.sql_file is None and args.template is None:
+            if not loaded:
+                log(args, '请指定 --sql、--sql-file 或 --template（使用 -h 查看帮助）')
+                return 2
+        else:
+            sql, params = query_to_run(args, templates)
+            run_query(args, catalog, sql, params)
+
+        if args.workspace and loaded:
+            # 导入的表已写入工作区文件，同时保存表信息
+            catalog.save_workspace(meta)
+        return 0
+    except Exception as e:
+        print(f'错误: {e}', file=sys.stderr)
+        return 1
+    finally:
+        if catalog is not None:
+            catalog.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
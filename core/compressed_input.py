@@ -0,0 +1,87 @@
+import gzip
+import os
+import zipfile
+from contextlib import contextmanager
+
+try:
+    import zstandard  # 可选依赖，用于 .zst 文件的流式解压
+except ImportError:
+    zstandard = None
+
+# 支持流式导入的压缩格式 {扩展名: 压缩类型}
+COMPRESSED_SUFFIXES = {
+    '.csv.gz': 'gzip',
+    '.csv.zst': 'zstd',
+    '.zip': 'zip',
+}
+
+# DuckDB CSV读取器可以直接解压的格式
+DUCKDB_COMPRESSIONS = ('gzip', 'zstd')
+
+
+def compression_of(file_path):
+    """根据扩展名判断压缩类型，未压缩时返回None"""
+    lower_path = file_path.lower()
+    for suffix, compression in COMPRESSED_SUFFIXES.items():
+        if lower_path.endswith(suffix):
+            return compression
+    return None
+
+
+def is_csv_file(file_path):
+    """是否为CSV文件（包括压缩的CSV和zip压缩包）"""
+    return file_path.lower().endswith('.csv') or compression_of(file_path) is not None
+
+
+def zip_member(archive):
+    """返回压缩包中唯一的CSV文件名"""
+    names = [
+        name for name in archive.namelist()
+        if not name.endswith('/') and not name.startswith('__MACOSX/')
+    ]
+    if len(names) != 1:
+        raise Exception(f'压缩包中应只包含一个CSV文件，实际包含 {len(names)} 个文件')
+    if not names[0].lower().endswith('.csv'):
+        raise Exception(f'压缩包中的文件不是CSV文件: {names[0]}')
+    return names[0]
+
+
+@contextmanager
+def decompressed(fileobj, compression):
+    """将压缩文件对象包装为解压后的字节流（边读边解压，不写临时文件）
+
+    fileobj 只会被顺序读取压缩后的字节，可在外层统计已读取的压缩字节数。
+    """
+    if compression == 'gzip':
+        with gzip.GzipFile(fileobj=fileobj, mode='rb') as stream:
+            yield stream
+    elif compression == 'zstd':
+        if zstandard is None:
+            raise Exception('读取 .zst 文件需要安装 zstandard（pip install zstandard）')
+        with zstandard.ZstdDecompressor().stream_reader(fileobj) as stream:
+            yield stream
+    elif compression == 'zip':
+        with zipfile.ZipFile(fileobj) as archive:
+            with archive.open(zip_member(archive)) as stream:
+                yield stream
+    else:
+        yield fileobj
+
+
+@contextmanager
+def open_input(file_path):
+    """以二进制方式打开输入文件，压缩文件返回解压后的字节流"""
+    with open(file_path, 'rb') as raw:
+        with decompressed(raw, compression_of(file_path)) as stream:
+            yield stream
+
+
+def file_stem(file_path):
+    """去掉目录和扩展名（包括压缩扩展名）后的文件名，如 data.csv.gz -> data"""
+    file_name = os.path.basename(file_path)
+    compression = compression_of(file_name)
+    if compression == 'zip':
+        file_name = file_name[:-len('.zip')]
+    elif compression is not None:
+        file_name = os.path.splitext(file_name)[0]
+    return os.path.splitext(file_name)[0]
@@ -0,0 +1,540 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import duckdb
+
+
+def quote_identifier(name):
+    """为SQL标识符加引号"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def quote_literal(value):
+    """为SQL字符串字面量加引号"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def sample_clause(sample):
+    """抽样导入的SQL子句，sample: {'method': 'head'|'reservoir'|'bernoulli', 'rows': 行数, 'percent': 百分比}"""
+    if sample is None:
+        return ''
+    if sample['method'] == 'head':
+        return f' LIMIT {int(sample["rows"])}'
+    if sample['method'] == 'reservoir':
+        # 流式读取CSV时 USING SAMPLE reservoir 的结果偏向文件后部，
+        # 改用随机数排序取前N行（Top-N只保留N行，结果等价于均匀的水库抽样）
+        return f' ORDER BY random() LIMIT {int(sample["rows"])}'
+    return f' USING SAMPLE {float(sample["percent"])}% (bernoulli)'
+
+
+class DuckDBCatalog:
+    """长期存在的DuckDB数据目录，表只导入一次，变化时原地修改"""
+
+    META_SCHEMA = 'sql4csv'  # 工作区元数据（表信息、查询历史、模板）所在的schema
+
+    def __init__(self, database=':memory:', settings=None):
+        self.database = database
+        self.settings = settings  # EngineSettings，每个新连接的数据库都应用内存、线程和溢写目录设置
+        self.conn = self.connect(database)
+        # 主连接只在界面线程使用，写操作加锁避免与游标创建交错
+        self.lock = threading.RLock()
+        # 表信息 {表名: {'kind': 'table'|'linked'|'view', 'source': 文件路径, ...}}
+        self.table_info = {}
+        # 表的数据版本号 {小写表名: 版本号}，导入、追加、重命名、删除时递增，用于查询结果缓存失效
+        self.table_versions = {}
+        # 只追加了行的版本号 {小写表名: {版本号, ...}}，物化表据此判断能否只处理新增的行
+        self.append_versions = {}
+
+    def connect(self, database):
+        conn = duckdb.connect(database)
+        conn.execute('SET enable_progress_bar_print = false')
+        if self.settings is not None:
+            try:
+                self.settings.apply(conn)
+            except Exception:
+                conn.close()
+                raise
+        return conn
+
+    def apply_settings(self):
+        """修改引擎设置后立即应用到当前数据库（对所有游标生效），返回需要重新打开数据库才能生效的设置"""
+        with self.lock:
+            return self.settings.apply(self.conn)
+
+    def memory_usage(self):
+        """当前内存占用和溢写到磁盘的字节数，以及内存上限 (内存字节数, 溢写字节数, 内存上限)"""
+        with self.lock:
+            memory_bytes, temp_bytes = self.conn.execute(
+                'SELECT SUM(memory_usage_bytes), SUM(temporary_storage_bytes) FROM duckdb_memory()'
+            ).fetchone()
+            memory_limit = self.conn.execute("SELECT current_setting('memory_limit')").fetchone()[0]
+        return memory_bytes or 0, temp_bytes or 0, memory_limit
+
+    @property
+    def is_workspace(self):
+        """是否使用工作区文件（而不是内存数据库）"""
+        return self.database != ':memory:'
+
+    def open_workspace(self, path):
+        """打开工作区文件作为数据目录，返回其中保存的元数据"""
+        conn = self.connect(path)
+        with self.lock:
+            self.conn.close()
+            self.conn = conn
+            self.database = path
+        meta = self.read_meta()
+        saved_info = meta.pop('table_info', {})
+        
+        # 以文件中实际存在的表为准，补全没有记录的表（如通过SQL创建的表）
+        self.bump_version(*self.table_info)
+        self.table_info = {}
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT table_name, table_type FROM information_schema.tables WHERE table_schema = 'main'"
+            ).fetchall()
+        for table_name, table_type in rows:
+            default_kind = 'view' if table_type == 'VIEW' else 'table'
+            self.table_info[table_name] = saved_info.get(table_name, {'kind': default_kind, 'source': None})
+            self.bump_version(table_name)
+        return meta
+
+    def save_workspace(self, meta, path=None):
+        """保存工作区元数据；path与当前文件不同时把整个数据目录复制到新文件并切换过去"""
+        table_info = {
+            name: {key: value for key, value in info.items() if not key.startswith('row_count')}
+            for name, info in self.table_info.items()
+        }
+        self.write_meta(dict(meta, table_info=table_info))
+        if path is None or os.path.abspath(path) == os.path.abspath(self.database):
+            with self.lock:
+                self.conn.execute('CHECKPOINT')
+            return
+        
+        for stale_file in (path, path + '.wal'):
+            if os.path.exists(stale_file):
+                os.remove(stale_file)
+        with self.lock:
+            source_db = self.conn.execute('SELECT current_database()').fetchone()[0]
+            self.conn.execute(f'ATTACH {quote_literal(path)} AS sql4csv_workspace')
+            try:
+                self.conn.execute(f'COPY FROM DATABASE {quote_identifier(source_db)} TO sql4csv_workspace')
+            finally:
+                self.conn.execute('DETACH sql4csv_workspace')
+        table_info = self.table_info
+        self.open_workspace(path)
+        self.table_info = table_info
+
+    def write_meta(self, meta):
+        """写入元数据（每项保存为JSON）"""
+        with self.lock:
+            self.conn.execute(f'CREATE SCHEMA IF NOT EXISTS {self.META_SCHEMA}')
+            self.conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {self.META_SCHEMA}.meta (key VARCHAR PRIMARY KEY, value VARCHAR)'
+            )
+            for key, value in meta.items():
+                self.conn.execute(
+                    f'INSERT OR REPLACE INTO {self.META_SCHEMA}.meta VALUES (?, ?)',
+                    [key, json.dumps(value, ensure_ascii=False)]
+                )
+
+    def read_meta(self):
+        """读取元数据，没有元数据时返回空字典"""
+        with self.lock:
+            try:
+                rows = self.conn.execute(f'SELECT key, value FROM {self.META_SCHEMA}.meta').fetchall()
+            except duckdb.CatalogException:
+                return {}
+        return {key: json.loads(value) for key, value in rows}
+
+    def cursor(self):
+        """为工作线程创建独立游标（共享同一个数据库），并开启进度跟踪"""
+        with self.lock:
+            cursor = self.conn.cursor()
+        # 进度设置是连接级别的，需要在每个游标上单独开启
+        cursor.execute('SET enable_progress_bar = true')
+        cursor.execute('SET enable_progress_bar_print = false')
+        return cursor
+
+    @contextmanager
+    def writer(self, cursor=None):
+        """写操作上下文：传入工作线程游标时以事务执行（失败或取消时回滚），否则使用加锁的主连接"""
+        if cursor is None:
+            with self.lock:
+                yield self.conn
+            return
+        cursor.execute('BEGIN TRANSACTION')
+        try:
+            yield cursor
+        except BaseException:
+            cursor.execute('ROLLBACK')
+            raise
+        cursor.execute('COMMIT')
+
+    def register_dataframe(self, table_name, df, cursor=None, source=None):
+        """将DataFrame写入目录中的表（已存在则替换）"""
+        with self.writer(cursor) as conn:
+            self._drop_other_kind(conn, table_name, 'table')
+            conn.register('_sql4csv_import', df)
+            try:
+                conn.execute(
+                    f'CREATE OR REPLACE TABLE {quote_identifier(table_name)} '
+                    f'AS SELECT * FROM _sql4csv_import'
+                )
+            finally:
+                conn.unregister('_sql4csv_import')
+        with self.lock:
+            self.table_info[table_name] = {'kind': 'table', 'source': source}
+            self.bump_version(table_name)
+
+    def append_dataframe(self, table_name, df, cursor=None, replace_last_row=False):
+        """将DataFrame按列顺序追加到已有的表（值按表的列类型转换）
+
+        replace_last_row 为True时在同一事务中先删除表的最后一行（跟踪模式下导入时未写完的行），
+        表版本按修改而不是追加记录。
+        """
+        table = quote_identifier(table_name)
+        with self.writer(cursor) as conn:
+            if replace_last_row:
+                conn.execute(f'DELETE FROM {table} WHERE rowid = (SELECT MAX(rowid) FROM {table})')
+            conn.register('_sql4csv_append', df)
+            try:
+                conn.execute(f'INSERT INTO {table} SELECT * FROM _sql4csv_append')
+            finally:
+                conn.unregister('_sql4csv_append')
+        if replace_last_row:
+            with self.lock:
+                self.bump_version(table_name)
+        else:
+            self.mark_appended(table_name)
+
+    def ingest_parquet(self, table_name, parquet_path, cursor=None, source=None):
+        """从Parquet快照导入表"""
+        with self.writer(cursor) as conn:
+            self._drop_other_kind(conn, table_name, 'table')
+            conn.execute(
+                f'CREATE OR REPLACE TABLE {quote_identifier(table_name)} AS '
+                f'SELECT * FROM read_parquet(?)',
+                [parquet_path]
+            )
+        with self.lock:
+            self.table_info[table_name] = {'kind': 'table', 'source': source or parquet_path}
+            self.bump_version(table_name)
+
+    def export_parquet(self, table_name, parquet_path, cursor=None):
+        """将表导出为zstd压缩的Parquet文件"""
+        sql = (f'COPY {quote_identifier(table_name)} TO {quote_literal(parquet_path)} '
+               f'(FORMAT parquet, COMPRESSION zstd)')
+        if cursor is not None:
+            cursor.execute(sql)
+        else:
+            with self.lock:
+                self.conn.execute(sql)
+
+    def ingest_csv(self, table_name, file_path, encoding='utf-8', clean=False, cursor=None,
+                   filename_column=None, sample=None):
+        """使用DuckDB多线程CSV读取器直接导入文件（自动推断列类型）
+
+        file_path 可以是文件路径列表，多个文件按列名合并为一张表并行读取，
+        filename_column 不为空时添加记录来源文件名的列，sample 不为空时只导入抽样数据。
+        """
+        options = 'auto_detect = true, encoding = ?'
+        params = [file_path, encoding]
+        if isinstance(file_path, (list, tuple)):
+            options += ', union_by_name = true'
+        if filename_column:
+            options += ', filename = ?'
+            params.append(filename_column)
+        with self.writer(cursor) as conn:
+            self._drop_other_kind(conn, table_name, 'table')
+            conn.execute(
+                f'CREATE OR REPLACE TABLE {quote_identifier(table_name)} AS '
+                f'SELECT * FROM read_csv(?, {options}){sample_clause(sample)}',
+                params
+            )
+            if clean:
+                self.clean_table(conn, table_name)
+        with self.lock:
+            self.table_info[table_name] = {'kind': 'table', 'source': file_path}
+            self.bump_version(table_name)
+
+    def describe_csv(self, file_path, encoding='utf-8', cursor=None):
+        """嗅探CSV文件的列名和类型（只读取样本，不导入）"""
+        sql = 'DESCRIBE SELECT * FROM read_csv(?, auto_detect = true, encoding = ?)'
+        if cursor is not None:
+            rows = cursor.execute(sql, [file_path, encoding]).fetchall()
+        else:
+            with self.lock:
+                rows = self.conn.execute(sql, [file_path, encoding]).fetchall()
+        return [(row[0], row[1]) for row in rows]
+
+    def link_file(self, table_name, file_path):
+        """将CSV/Excel文件注册为外部视图，查询时直接读取文件（列裁剪和过滤下推）"""
+        lower_path = file_path.lower()
+        if lower_path.endswith(('.csv', '.csv.gz', '.csv.zst')):
+            source = f'read_csv({quote_literal(file_path)}, auto_detect = true)'
+        elif lower_path.endswith('.xlsx'):
+            source = f'read_xlsx({quote_literal(file_path)})'
+        else:
+            raise ValueError('仅支持链接 .csv（含 .csv.gz/.csv.zst）和 .xlsx 文件')
+        with self.writer() as conn:
+            self._drop_other_kind(conn, table_name, 'linked')
+            conn.execute(
+                f'CREATE OR REPLACE VIEW {quote_identifier(table_name)} AS SELECT * FROM {source}'
+            )
+        with self.lock:
+            self.table_info[table_name] = {'kind': 'linked', 'source': file_path}
+            self.bump_version(table_name)
+
+    def is_linked(self, table_name):
+        """是否为外部链接的表"""
+        return self.table_info.get(table_name, {}).get('kind') == 'linked'
+
+    def object_type(self, table_name):
+        """表在DuckDB中的对象类型（TABLE 或 VIEW）"""
+        return 'VIEW' if self.table_info.get(table_name, {}).get('kind') in ('linked', 'view') else 'TABLE'
+
+    def _drop_other_kind(self, conn, table_name, kind):
+        """覆盖同名对象前，删除类型不同的旧对象（表和视图不能互相替换）"""
+        if table_name in self.table_info and self.table_info[table_name]['kind'] != kind:
+            conn.execute(f'DROP {self.object_type(table_name)} IF EXISTS {quote_identifier(table_name)}')
+
+    def clean_table(self, conn, table_name):
+        """在数据目录中清理数据：删除全空行、去除列名前后空格"""
+        table = quote_identifier(table_name)
+        columns = [row[0] for row in conn.execute(f'DESCRIBE {table}').fetchall()]
+        if columns:
+            all_null = ' AND '.join(f'{quote_identifier(col)} IS NULL' for col in columns)
+            conn.execute(f'DELETE FROM {table} WHERE {all_null}')
+        for col in columns:
+            stripped = col.strip()
+            if stripped and stripped != col:
+                conn.execute(
+                    f'ALTER TABLE {table} RENAME COLUMN {quote_identifier(col)} TO {quote_identifier(stripped)}'
+                )
+
+    def rename_table(self, old_name, new_name):
+        """重命名表"""
+        if old_name == new_name:
+            return
+        with self.lock:
+            self.conn.execute(
+                f'ALTER {self.object_type(old_name)} {quote_identifier(old_name)} RENAME TO {quote_identifier(new_name)}'
+            )
+            if old_name in self.table_info:
+                self.table_info[new_name] = self.table_info.pop(old_name)
+            self.bump_version(old_name, new_name)
+
+    def drop_table(self, table_name):
+        """删除表"""
+        with self.lock:
+            self.conn.execute(f'DROP {self.object_type(table_name)} IF EXISTS {quote_identifier(table_name)}')
+            self.table_info.pop(table_name, None)
+            self.bump_version(table_name)
+
+    def bump_version(self, *table_names):
+        """表的数据发生变化，递增版本号"""
+        with self.lock:
+            for table_name in table_names:
+                key = table_name.lower()
+                self.table_versions[key] = self.table_versions.get(key, 0) + 1
+
+    def mark_appended(self, table_name):
+        """表只在末尾追加了行，递增版本号并记录为追加版本"""
+        key = table_name.lower()
+        with self.lock:
+            self.bump_version(table_name)
+            self.append_versions.setdefault(key, set()).add(self.table_versions[key])
+
+    def appended_since(self, table_name, version):
+        """表从指定版本号以来是否只追加过行（没有被替换、修改或重命名）"""
+        key = table_name.lower()
+        with self.lock:
+            appended = set(self.append_versions.get(key, ()))
+            current = self.table_versions.get(key, 0)
+        return all(v in appended for v in range(version + 1, current + 1))
+
+    def table_version(self, table_name):
+        """表的数据版本（外部链接的表附加文件大小和修改时间）"""
+        with self.lock:
+            version = [self.table_versions.get(table_name.lower(), 0)]
+            info = self.table_info.get(table_name, {})
+        if info.get('kind') == 'linked':
+            try:
+                stat = os.stat(info['source'])
+                version += [stat.st_size, stat.st_mtime_ns]
+            except OSError:
+                # 外部文件已移动或删除
+                version += [None, None]
+        return version
+
+    def statement_types(self, sql):
+        """解析SQL中各语句的类型，如 ['SELECT', 'CREATE']"""
+        with self.lock:
+            statements = self.conn.extract_statements(sql)
+        return [statement.type.name for statement in statements]
+
+    def parsed_nodes(self, sql, node_type):
+        """只解析不执行，返回SQL语法树中指定类型的节点（如 TABLE_FUNCTION、BASE_TABLE）"""
+        with self.lock:
+            tree = json.loads(self.conn.execute('SELECT json_serialize_sql(?)', [sql]).fetchone()[0])
+        if tree.get('error'):
+            raise ValueError(tree.get('error_message', '无法解析SQL'))
+        found = []
+        nodes = [tree]
+        while nodes:
+            node = nodes.pop()
+            if isinstance(node, dict):
+                if node.get('type') == node_type:
+                    found.append(node)
+                nodes.extend(node.values())
+            elif isinstance(node, list):
+                nodes.extend(node)
+        return found
+
+    def table_functions(self, sql):
+        """解析SELECT中调用的表函数名（如 read_csv、read_text），只解析不执行"""
+        return [node['function']['function_name'] for node in self.parsed_nodes(sql, 'TABLE_FUNCTION')]
+
+    def referenced_tables(self, sql):
+        """解析SQL引用的表名（忽略大小写，按数据目录中的表名返回）
+
+        get_table_names 会把视图展开成底层的表，外部链接的表（read_csv视图）因此会丢失，
+        这里再从语法树中补上直接引用的数据目录对象。
+        """
+        with self.lock:
+            table_names = set(self.conn.get_table_names(sql))
+        known = {name.lower(): name for name in self.table_info}
+        try:
+            table_names.update(
+                node['table_name'] for node in self.parsed_nodes(sql, 'BASE_TABLE')
+                if node['table_name'].lower() in known
+            )
+        except ValueError:
+            # 非SELECT语句无法序列化语法树
+            pass
+        return sorted({known.get(name.lower(), name) for name in table_names})
+
+    def table_columns(self, table_name):
+        """获取表的列名和类型 [(列名, 类型), ...]"""
+        with self.lock:
+            rows = self.conn.execute(f'DESCRIBE {quote_identifier(table_name)}').fetchall()
+        return [(row[0], row[1]) for row in rows]
+
+    def table_shape(self, table_name):
+        """获取表的行数和列数"""
+        return self.row_count(table_name), len(self.table_columns(table_name))
+
+    def linked_file_key(self, table_name):
+        """外部链接文件的 (大小, 修改时间)，文件已移动或删除时返回None"""
+        try:
+            stat = os.stat(self.table_info[table_name]['source'])
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime
+
+    def needs_row_count(self, table_name):
+        """外部链接表的行数是否需要重新扫描文件统计（文件仍可访问且计数后有变化）"""
+        info = self.table_info.get(table_name, {})
+        if info.get('kind') != 'linked':
+            return False
+        file_key = self.linked_file_key(table_name)
+        return file_key is not None and info.get('row_count_key') != file_key
+
+    def row_count(self, table_name, cursor=None):
+        """获取表的行数（外部链接的表按文件大小和修改时间缓存计数结果，文件不可用时返回None）
+
+        统计外部链接表需要扫描整个文件，界面中先用 needs_row_count 判断，在后台游标上统计。
+        """
+        info = self.table_info.get(table_name, {})
+        file_key = None
+        if info.get('kind') == 'linked':
+            file_key = self.linked_file_key(table_name)
+            if file_key is None:
+                return None
+            if info.get('row_count_key') == file_key:
+                return info['row_count']
+        sql = f'SELECT COUNT(*) FROM {quote_identifier(table_name)}'
+        try:
+            if cursor is not None:
+                row_count = cursor.execute(sql).fetchone()[0]
+            else:
+                with self.lock:
+                    row_count = self.conn.execute(sql).fetchone()[0]
+        except duckdb.InterruptException:
+            raise
+        except duckdb.Error:
+            if file_key is None:
+                raise
+            # 文件无法读取（格式损坏或读取期间被删除），记录为不可用
+            row_count = None
+        if file_key is not None:
+            with self.lock:
+                info['row_count'] = row_count
+                info['row_count_key'] = file_key
+        return row_count
+
+    def column_stats(self, table_name):
+        """统计每列的非空值数和唯一值数，返回 (总行数, [(列名, 类型, 非空值数, 唯一值数), ...])"""
+        columns = self.table_columns(table_name)
+        if not columns:
+            return 0, []
+        exprs = ['COUNT(*)']
+        for col, _ in columns:
+            exprs.append(f'COUNT({quote_identifier(col)})')
+            exprs.append(f'COUNT(DISTINCT {quote_identifier(col)})')
+        with self.lock:
+            row = self.conn.execute(
+                f'SELECT {", ".join(exprs)} FROM {quote_identifier(table_name)}'
+            ).fetchone()
+        stats = []
+        for i, (col, dtype) in enumerate(columns):
+            stats.append((col, dtype, row[1 + i * 2], row[2 + i * 2]))
+        return row[0], stats
+
+    def summarize(self, table_name, cursor=None):
+        """使用SUMMARIZE获取列统计信息（需要扫描全表，界面中在后台游标上执行）"""
+        sql = f'SUMMARIZE {quote_identifier(table_name)}'
+        if cursor is not None:
+            return cursor.execute(sql).df()
+        with self.lock:
+            return self.conn.execute(sql).df()
+
+    def fetch_df(self, table_name, limit=None):
+        """将表（或其前若干行）转换为DataFrame"""
+        sql = f'SELECT * FROM {quote_identifier(table_name)}'
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+        with self.lock:
+            return self.conn.execute(sql).df()
+
+    def table_names(self):
+        """获取目录中的所有表名"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT table_name FROM information_schema.tables WHERE table_schema = 'main'"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def sync_tables(self):
+        """按数据库中实际存在的表更新表信息（通过SQL创建或删除了表），返回 (新增的表, 删除的表)"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT table_name, table_type FROM information_schema.tables WHERE table_schema = 'main'"
+            ).fetchall()
+            existing = {table_name: table_type for table_name, table_type in rows}
+            added = [table_name for table_name in existing if table_name not in self.table_info]
+            removed = [table_name for table_name in self.table_info if table_name not in existing]
+            for table_name in added:
+                kind = 'view' if existing[table_name] == 'VIEW' else 'table'
+                self.table_info[table_name] = {'kind': kind, 'source': None}
+            for table_name in removed:
+                del self.table_info[table_name]
+            self.bump_version(*added, *removed)
+        return added, removed
+
+    def close(self):
+        """关闭数据库连接"""
+        with self.lock:
+            self.conn.close()
@@ -1,8 +1,9 @@
+import glob
 import json
 import os
-import duckdb
 from datetime import datetime
 import numpy as np
+import duckdb
 import pandas as pd
 from PyQt5.QtCore import Qt, QTimer, QEvent
 from PyQt5.QtGui import QFont, QKeySequence
@@ -15,18 +16,65 @@ from PyQt5.QtWidgets import (
 )
 
 from chart_widget import ChartWidget
+from compressed_input import file_stem
+from duckdb_catalog import DuckDBCatalog
+from engine_settings import EngineSettings
+from encoding_detector import SUPPORTED_ENCODINGS
+from file_load_thread import FileLoadThread
+from file_loader import FileLoader, MultiFileLoader
+from ingest_cache import IngestCache
+from materialize_thread import MaterializeThread
+from materialized_view import rebaseline
+from profile_widget import ProfileWidget
+from query_profile_thread import QueryProfileThread
+from query_result import QueryResult
+from query_server import QueryServer
+from query_session import QuerySession, statement_at, statement_spans
+from result_cache import ResultCache, SQL_TOKEN
+from result_tab import ResultTab
+from row_count_thread import RowCountThread
 from sql_highlighter import SQLSyntaxHighlighter
 from sql_query_thread import SQLQueryThread
+from sql_templates import (
+    PARAM_TYPES, default_templates, template_placeholders, render_template
+)
+from table_summary_thread import TableSummaryThread
+from tail_follow_thread import TailFollowThread
+from tail_follower import TailFollower
 
 
 class AdvancedCSVSQLEditor(QMainWindow):
+    CHART_MAX_ROWS = 100000  # 分页结果用于图表的最大行数
+    EXCEL_MAX_ROWS = 1048575  # Excel工作表最多能容纳的数据行数
+    MAX_CONCURRENT_QUERIES = 4  # 同时执行的查询数，超出的查询排队等待
+    MEMORY_REFRESH_MS = 2000  # 刷新内存占用显示的间隔（毫秒）
+    
     def __init__(self):
         super().__init__()
-        self.df = None
-        self.db_connection = None
+        self.df = None  # 当前表的DataFrame（原生导入的表按需生成）
+        self.chart_pending = False  # 图表数据是否等待切换到图表页时再生成
+        self.engine_settings = EngineSettings()  # 内存上限、线程数、溢写目录（按用户保存）
+        self.startup_warnings = []  # 启动时遇到的问题，界面创建后显示在状态栏
+        self.catalog = self.create_catalog()  # 常驻的DuckDB数据目录
+        self.ingest_cache = self.create_ingest_cache()
+        self.result_cache = ResultCache()  # 查询结果缓存（按SQL和表版本号）
+        self.query_session = QuerySession(self.catalog)  # 脚本共用的会话游标，临时表在会话期间保留
+        # 跟踪持续增长的CSV文件，定时追加新增行
+        self.follow_thread = TailFollowThread()
+        self.follow_thread.rows_appended.connect(self.on_rows_appended)
+        self.follow_thread.error_occurred.connect(self.on_follow_error)
+        self.follow_thread.start()
         self.table_name = "data_table"
         self.tables = {}  # 存储多个表的字典 {表名: DataFrame}
         self.query_history = []
+        self.pending_queries = []  # 排队等待执行的结果标签页
+        self.query_count = 0  # 已创建的结果标签页数，用于命名
+        self.chart_result = None  # 图表待使用的查询结果（切换到图表页时再取数据）
+        self.materialize_thread = None  # 创建或刷新物化表的线程
+        self.materialize_pending = False  # 刷新期间源表又有变化，结束后再检查一次
+        self.row_count_threads = {}  # 正在后台统计行数的外部链接表 {表名: RowCountThread}
+        self.summary_thread = None  # 在后台统计当前表各列的线程
+        self.query_server = None  # 本机查询服务，开启后其他脚本可通过HTTP查询已导入的表
         self.custom_templates = self.load_custom_templates()
         # self.init_ui()    # 创建中央部件
         central_widget = QWidget()
@@ -39,9 +87,17 @@ class AdvancedCSVSQLEditor(QMainWindow):
         self.create_toolbar(main_layout)
         
         # 创建进度条
+        progress_layout = QHBoxLayout()
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
-        main_layout.addWidget(self.progress_bar)
+        progress_layout.addWidget(self.progress_bar)
+        
+        # 取消加载按钮（仅在后台加载文件时显示）
+        self.cancel_load_btn = QPushButton('⏹ 取消加载')
+        self.cancel_load_btn.setVisible(False)
+        self.cancel_load_btn.clicked.connect(self.cancel_load)
+        progress_layout.addWidget(self.cancel_load_btn)
+        main_layout.addLayout(progress_layout)
         
         # 创建分割器
         splitter = QSplitter(Qt.Horizontal)
@@ -59,7 +115,15 @@ class AdvancedCSVSQLEditor(QMainWindow):
         splitter.setSizes([500, 1100])
         
         # 状态栏
-        self.statusBar().showMessage('请先加载CSV或Excel文件')
+        self.statusBar().showMessage('；'.join(self.startup_warnings) or '请先加载CSV或Excel文件')
+        
+        # 状态栏右侧显示数据库引擎的内存占用
+        self.memory_label = QLabel()
+        self.statusBar().addPermanentWidget(self.memory_label)
+        self.memory_timer = QTimer(self)
+        self.memory_timer.timeout.connect(self.update_memory_usage)
+        self.memory_timer.start(self.MEMORY_REFRESH_MS)
+        self.update_memory_usage()
         
     def create_toolbar(self, layout):
         """创建工具栏"""
@@ -70,11 +134,32 @@ class AdvancedCSVSQLEditor(QMainWindow):
         self.load_btn.clicked.connect(self.load_file)
         toolbar_layout.addWidget(self.load_btn)
         
+        # 批量导入多个同结构文件为一张表
+        self.batch_load_btn = QPushButton('📂 批量导入')
+        self.batch_load_btn.setToolTip('选择多个文件或输入通配符（如 D:/data/*.csv），并行导入为一张合并表')
+        self.batch_load_btn.clicked.connect(self.load_multiple_files)
+        toolbar_layout.addWidget(self.batch_load_btn)
+        
+        # 链接文件（不导入，查询时直接读取文件）
+        self.link_btn = QPushButton('🔗 链接文件')
+        self.link_btn.setToolTip('将CSV/Excel文件注册为外部表，查询时只读取用到的列和行，不占用内存')
+        self.link_btn.clicked.connect(self.link_file)
+        toolbar_layout.addWidget(self.link_btn)
+        
         # 添加多表管理按钮
         self.manage_tables_btn = QPushButton('📑 管理表')
         self.manage_tables_btn.clicked.connect(self.manage_tables)
         toolbar_layout.addWidget(self.manage_tables_btn)
         
+        # 工作区（DuckDB文件，保存表、查询历史和模板）
+        self.open_workspace_btn = QPushButton('🗄️ 打开工作区')
+        self.open_workspace_btn.clicked.connect(self.open_workspace)
+        toolbar_layout.addWidget(self.open_workspace_btn)
+        
+        self.save_workspace_btn = QPushButton('💾 保存工作区')
+        self.save_workspace_btn.clicked.connect(self.save_workspace)
+        toolbar_layout.addWidget(self.save_workspace_btn)
+        
         # 文件信息显示
         self.file_info_label = QLabel('未加载文件')
         toolbar_layout.addWidget(self.file_info_label)
@@ -86,6 +171,67 @@ class AdvancedCSVSQLEditor(QMainWindow):
         self.auto_clean_cb.setChecked(True)
         toolbar_layout.addWidget(self.auto_clean_cb)
         
+        # 压缩列类型（分类、数值向下转换、Arrow字符串），减少pandas数据的内存占用
+        self.compact_types_cb = QCheckBox('压缩类型')
+        self.compact_types_cb.setToolTip('低基数字符串转为分类类型、数值向下转换、其余字符串使用Arrow存储（原生导入的表已是列式存储，无需压缩）')
+        toolbar_layout.addWidget(self.compact_types_cb)
+        
+        # CSV原生导入（DuckDB多线程读取，不经过pandas）
+        self.native_load_cb = QCheckBox('⚡ 原生CSV导入')
+        self.native_load_cb.setToolTip('使用DuckDB多线程读取CSV并自动推断类型，大文件更快、更省内存')
+        toolbar_layout.addWidget(self.native_load_cb)
+        
+        # 抽样导入（超大文件只导入部分数据用于探索）
+        self.sample_combo = QComboBox()
+        self.sample_combo.addItem('完整导入', '')
+        for method, label in FileLoader.SAMPLE_METHODS.items():
+            self.sample_combo.addItem(label, method)
+        self.sample_combo.setToolTip('只导入前N行或随机抽样N行（单次流式读取），之后可在表列表右键导入完整数据')
+        toolbar_layout.addWidget(self.sample_combo)
+        
+        self.sample_rows_spin = QSpinBox()
+        self.sample_rows_spin.setRange(100, 100000000)
+        self.sample_rows_spin.setSingleStep(10000)
+        self.sample_rows_spin.setValue(100000)
+        self.sample_rows_spin.setSuffix(' 行')
+        self.sample_rows_spin.setEnabled(False)
+        self.sample_combo.currentIndexChanged.connect(
+            lambda: self.sample_rows_spin.setEnabled(bool(self.sample_combo.currentData()))
+        )
+        toolbar_layout.addWidget(self.sample_rows_spin)
+        
+        # CSV编码（默认采样自动检测，可手动指定）
+        toolbar_layout.addWidget(QLabel('编码:'))
+        self.encoding_combo = QComboBox()
+        self.encoding_combo.addItem('自动检测', '')
+        for encoding in SUPPORTED_ENCODINGS:
+            self.encoding_combo.addItem(encoding, encoding)
+        toolbar_layout.addWidget(self.encoding_combo)
+        
+        # 导入缓存（未变化的文件直接从列式快照加载）
+        self.use_cache_cb = QCheckBox('导入缓存')
+        self.use_cache_cb.setToolTip('为导入的文件保存压缩的列式快照，文件未变化时再次加载只需数秒')
+        self.use_cache_cb.setChecked(self.ingest_cache is not None)
+        self.use_cache_cb.setEnabled(self.ingest_cache is not None)
+        toolbar_layout.addWidget(self.use_cache_cb)
+        
+        self.clear_cache_btn = QPushButton('🧹 清除缓存')
+        self.clear_cache_btn.clicked.connect(self.clear_ingest_cache)
+        self.clear_cache_btn.setEnabled(self.ingest_cache is not None)
+        toolbar_layout.addWidget(self.clear_cache_btn)
+        
+        # 引擎资源设置（内存上限、线程数、溢写目录）
+        self.engine_settings_btn = QPushButton('⚙️ 引擎设置')
+        self.engine_settings_btn.clicked.connect(self.show_engine_settings)
+        toolbar_layout.addWidget(self.engine_settings_btn)
+        
+        # 本机查询服务（其他脚本直接查询已导入的表，不需要重新导入）
+        self.server_btn = QPushButton('🌐 查询服务')
+        self.server_btn.setCheckable(True)
+        self.server_btn.setToolTip('在本机开启HTTP/JSON查询服务，其他脚本可直接查询已导入的表')
+        self.server_btn.toggled.connect(self.toggle_query_server)
+        toolbar_layout.addWidget(self.server_btn)
+        
         # 显示行数限制
         toolbar_layout.addWidget(QLabel('显示行数:'))
         self.display_limit_spin = QSpinBox()
@@ -123,6 +269,8 @@ class AdvancedCSVSQLEditor(QMainWindow):
         self.tables_list.setSelectionBehavior(QTableWidget.SelectRows)
         self.tables_list.setSelectionMode(QTableWidget.SingleSelection)
         self.tables_list.itemClicked.connect(self.on_table_selected)
+        self.tables_list.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.tables_list.customContextMenuRequested.connect(self.show_tables_list_context_menu)
         tables_layout.addWidget(self.tables_list)
         
         # 表元数据按钮
@@ -156,6 +304,39 @@ class AdvancedCSVSQLEditor(QMainWindow):
         self.execute_btn.setEnabled(False)
         query_layout.addWidget(self.execute_btn)
         
+        # 只执行选中的文本或光标所在的语句
+        self.execute_current_btn = QPushButton('⏯ 执行当前语句')
+        self.execute_current_btn.setToolTip('执行选中的SQL，未选中时执行光标所在的语句 (Ctrl+Enter)')
+        self.execute_current_btn.setShortcut(QKeySequence('Ctrl+Return'))
+        self.execute_current_btn.clicked.connect(self.execute_current_statement)
+        query_layout.addWidget(self.execute_current_btn)
+        
+        # 开启性能分析执行查询，查看各算子的耗时
+        self.profile_btn = QPushButton('⏱ 性能分析')
+        self.profile_btn.setToolTip('执行查询并显示各算子的耗时、行数和输出大小')
+        self.profile_btn.clicked.connect(self.profile_query)
+        query_layout.addWidget(self.profile_btn)
+        
+        # 把查询保存为物化表，源表变化时自动刷新
+        self.materialize_btn = QPushButton('🧊 保存为物化表')
+        self.materialize_btn.setToolTip('将查询结果保存为表，源表变化时自动刷新（只追加了行时增量刷新）')
+        self.materialize_btn.clicked.connect(self.save_materialized_view)
+        query_layout.addWidget(self.materialize_btn)
+        
+        # 停止正在执行的查询
+        self.stop_query_btn = QPushButton('⏹ 停止')
+        self.stop_query_btn.clicked.connect(self.stop_query)
+        self.stop_query_btn.setEnabled(False)
+        query_layout.addWidget(self.stop_query_btn)
+        
+        # 查询超时（0表示不限制）
+        self.timeout_spin = QSpinBox()
+        self.timeout_spin.setRange(0, 86400)
+        self.timeout_spin.setSuffix(' 秒')
+        self.timeout_spin.setSpecialValueText('不限超时')
+        self.timeout_spin.setToolTip('查询超过设定时间后自动停止')
+        query_layout.addWidget(self.timeout_spin)
+        
         self.clear_btn = QPushButton('🗑️ 清空')
         self.clear_btn.clicked.connect(self.clear_sql)
         query_layout.addWidget(self.clear_btn)
@@ -242,16 +423,19 @@ class AdvancedCSVSQLEditor(QMainWindow):
         
         # 创建标签页
         self.tab_widget = QTabWidget()
+        self.tab_widget.currentChanged.connect(self.on_tab_changed)
         
         # 原始数据标签页
         self.original_table = QTableWidget()
         self.original_table.setSelectionMode(QTableWidget.ContiguousSelection)  # 允许连续选择
         self.tab_widget.addTab(self.original_table, '📊 原始数据')
         
-        # 查询结果标签页
-        self.result_table = QTableWidget()
-        self.result_table.setSelectionMode(QTableWidget.ContiguousSelection)  # 允许连续选择
-        self.tab_widget.addTab(self.result_table, '🔍 查询结果')
+        # 查询结果标签页（每个查询一个子标签页，可同时执行多个查询）
+        self.result_tabs = QTabWidget()
+        self.result_tabs.setTabsClosable(True)
+        self.result_tabs.tabCloseRequested.connect(self.close_result_tab)
+        self.result_tabs.currentChanged.connect(self.on_result_tab_changed)
+        self.tab_widget.addTab(self.result_tabs, '🔍 查询结果')
         
         # 为表格添加复制功能
         self.setup_copy_functionality()
@@ -260,6 +444,10 @@ class AdvancedCSVSQLEditor(QMainWindow):
         self.chart_widget = ChartWidget()
         self.tab_widget.addTab(self.chart_widget, '📈 数据可视化')
         
+        # 性能分析标签页
+        self.profile_widget = ProfileWidget()
+        self.tab_widget.addTab(self.profile_widget, '⏱ 性能分析')
+        
         # 数据分析标签页
         analysis_widget = self.create_analysis_widget()
         self.tab_widget.addTab(analysis_widget, '📋 数据分析')
@@ -295,150 +483,650 @@ class AdvancedCSVSQLEditor(QMainWindow):
         """加载CSV或Excel文件"""
         file_path, _ = QFileDialog.getOpenFileName(
             self, '选择文件', '', 
-            'CSV文件 (*.csv);;Excel文件 (*.xlsx *.xls);;所有文件 (*)'
+            'CSV文件 (*.csv *.csv.gz *.csv.zst *.zip);;Excel文件 (*.xlsx *.xls);;所有文件 (*)'
         )
         
         if file_path:
-            # 弹出对话框让用户输入表名
-            from PyQt5.QtWidgets import QInputDialog
-            file_name = os.path.splitext(os.path.basename(file_path))[0]
-            default_table_name = file_name.lower().replace(' ', '_')
-            
-            table_name, ok = QInputDialog.getText(
-                self, '输入表名', 
-                '请为导入的数据表指定一个名称（仅使用字母、数字和下划线）：',
-                text=default_table_name
-            )
-            
-            if not ok or not table_name:
-                return
-                
-            # 验证表名是否合法（只包含字母、数字和下划线）
-            import re
-            if not re.match(r'^[a-zA-Z0-9_]+$', table_name):
-                QMessageBox.warning(self, '警告', '表名只能包含字母、数字和下划线')
-                return
-                
-            # 检查表名是否已存在
-            if table_name in self.tables and QMessageBox.question(
-                self, '确认覆盖', 
-                f'表 "{table_name}" 已存在，是否覆盖？',
-                QMessageBox.Yes | QMessageBox.No, QMessageBox.No
-            ) != QMessageBox.Yes:
+            table_name = self.ask_table_name(file_path)
+            if not table_name:
                 return
                 
             try:
-                self.progress_bar.setVisible(True)
-                self.progress_bar.setValue(0)
-                
-                # 根据文件扩展名选择读取方法
-                if file_path.lower().endswith('.csv'):
-                    # 尝试不同的编码
-                    encodings = ['utf-8', 'gbk', 'gb2312', 'latin1']
-                    for encoding in encodings:
-                        try:
-                            df = pd.read_csv(file_path, encoding=encoding)
-                            break
-                        except UnicodeDecodeError:
-                            continue
-                    else:
-                        raise Exception("无法识别文件编码")
-                        
-                elif file_path.lower().endswith(('.xlsx', '.xls')):
-                    df = pd.read_excel(file_path)
-                else:
-                    raise Exception("不支持的文件格式")
-                
-                self.progress_bar.setValue(50)
-                
-                # 数据清理
-                if self.auto_clean_cb.isChecked():
-                    df = self.clean_data(df)
-                
-                # 保存到表字典中
-                self.tables[table_name] = df
-                
-                # 如果是第一个表，设为当前表
-                if len(self.tables) == 1 or self.df is None:
-                    self.df = df
-                    self.table_name = table_name
-                
-                # 更新数据库
-                self.create_database()
-                
-                self.progress_bar.setValue(80)
-                
-                # 更新表列表
-                self.update_tables_list()
-                
-                # 显示原始数据
-                self.display_original_data()
-                
-                # 更新图表组件
-                self.chart_widget.update_data(self.df)
-                
-                self.progress_bar.setValue(100)
-                
-                # 更新界面状态
-                file_name = os.path.basename(file_path)
-                self.file_info_label.setText(f'已加载: {file_name} ({len(self.df)}行, {len(self.df.columns)}列)')
-                self.execute_btn.setEnabled(True)
-                self.statusBar().showMessage(f'文件加载成功: {file_name}')
-                
-                # 显示数据信息
-                self.show_data_info()
-                
-                # 隐藏进度条
-                QTimer.singleShot(1000, lambda: self.progress_bar.setVisible(False))
-                
+                loader = FileLoader(
+                    self.catalog, file_path, table_name,
+                    native=self.native_load_cb.isChecked(),
+                    clean=self.auto_clean_cb.isChecked(),
+                    encoding=self.encoding_combo.currentData() or None,
+                    cache=self.active_ingest_cache(),
+                    compact_types=self.compact_types_cb.isChecked(),
+                    sample=self.selected_sample()
+                )
             except Exception as e:
-                self.progress_bar.setVisible(False)
                 QMessageBox.critical(self, '错误', f'加载文件失败:\n{str(e)}')
+                return
                 
-    def clean_data(self, df):
-        """数据清理"""
-        if df is not None:
-            # 删除完全空白的行
-            df = df.dropna(how='all')
+            self.start_loading(loader, os.path.basename(file_path))
+    
+    def selected_sample(self):
+        """工具栏选择的抽样方式，完整导入时返回None"""
+        method = self.sample_combo.currentData()
+        if not method:
+            return None
+        return {'method': method, 'rows': self.sample_rows_spin.value()}
+    
+    def sample_note(self, table_name):
+        """抽样导入的表的说明文字，完整数据返回空字符串"""
+        sample = self.catalog.table_info.get(table_name, {}).get('sample')
+        if not sample:
+            return ''
+        return f"（抽样数据: {FileLoader.SAMPLE_METHODS[sample['method']]} {sample['rows']} 行）"
+    
+    def load_full_data(self, table_name):
+        """重新导入抽样表的完整数据，替换同名表（查询和模板中的表名不变）"""
+        if self.is_busy():
+            QMessageBox.warning(self, '警告', '请等待当前加载或查询完成')
+            return
+        info = self.catalog.table_info[table_name]
+        try:
+            loader = FileLoader(
+                self.catalog, info['source'], table_name,
+                native=self.native_load_cb.isChecked(),
+                clean=self.auto_clean_cb.isChecked(),
+                encoding=info.get('encoding'),
+                cache=self.active_ingest_cache(),
+                compact_types=self.compact_types_cb.isChecked()
+            )
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'加载文件失败:\n{str(e)}')
+            return
+        
+        self.start_loading(loader, os.path.basename(info['source']))
+                
+    def load_multiple_files(self):
+        """批量导入多个同结构文件（多选或通配符），合并为一张表"""
+        from PyQt5.QtWidgets import QDialogButtonBox
+        
+        dialog = QDialog(self)
+        dialog.setWindowTitle('批量导入文件')
+        dialog.resize(560, 180)
+        layout = QVBoxLayout(dialog)
+        
+        layout.addWidget(QLabel('输入通配符路径，或点击“选择文件”选择多个文件:'))
+        pattern_layout = QHBoxLayout()
+        pattern_edit = QLineEdit()
+        pattern_edit.setPlaceholderText('例如: D:/data/2024-*.csv')
+        pattern_layout.addWidget(pattern_edit)
+        browse_btn = QPushButton('选择文件...')
+        pattern_layout.addWidget(browse_btn)
+        layout.addLayout(pattern_layout)
+        
+        selected_label = QLabel('')
+        layout.addWidget(selected_label)
+        selected_files = []
+        
+        def browse_files():
+            file_paths, _ = QFileDialog.getOpenFileNames(
+                dialog, '选择文件', '', 
+                'CSV文件 (*.csv *.csv.gz *.csv.zst *.zip);;Excel文件 (*.xlsx *.xls);;所有文件 (*)'
+            )
+            if file_paths:
+                selected_files[:] = file_paths
+                pattern_edit.clear()
+                selected_label.setText(f'已选择 {len(file_paths)} 个文件')
+        
+        browse_btn.clicked.connect(browse_files)
+        pattern_edit.textEdited.connect(lambda: (selected_files.clear(), selected_label.clear()))
+        
+        source_cb = QCheckBox(f'添加来源文件名列 ({MultiFileLoader.SOURCE_COLUMN})')
+        layout.addWidget(source_cb)
+        
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        button_box.accepted.connect(dialog.accept)
+        button_box.rejected.connect(dialog.reject)
+        layout.addWidget(button_box)
+        
+        if dialog.exec_() != QDialog.Accepted:
+            return
+            
+        file_paths = list(selected_files)
+        pattern = pattern_edit.text().strip()
+        if not file_paths and pattern:
+            file_paths = sorted(path for path in glob.glob(pattern) if os.path.isfile(path))
+        if not file_paths:
+            QMessageBox.warning(self, '警告', '没有找到匹配的文件')
+            return
+            
+        table_name = self.ask_table_name(file_paths[0])
+        if not table_name:
+            return
+            
+        try:
+            loader = MultiFileLoader(
+                self.catalog, file_paths, table_name,
+                native=self.native_load_cb.isChecked(),
+                clean=self.auto_clean_cb.isChecked(),
+                encoding=self.encoding_combo.currentData() or None,
+                add_source_column=source_cb.isChecked(),
+                cache=self.active_ingest_cache(),
+                compact_types=self.compact_types_cb.isChecked()
+            )
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'加载文件失败:\n{str(e)}')
+            return
+            
+        self.start_loading(loader, f'{len(file_paths)} 个文件')
+                
+    def start_loading(self, loader, description):
+        """在后台线程中解析文件并写入数据目录"""
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setValue(0)
+        self.cancel_load_btn.setVisible(True)
+        self.cancel_load_btn.setEnabled(True)
+        self.set_loading_state(True)
+        self.statusBar().showMessage(f'正在加载 {description}...')
+        
+        self.load_thread = FileLoadThread(loader)
+        self.load_thread.load_finished.connect(self.on_load_success)
+        self.load_thread.load_cancelled.connect(self.on_load_cancelled)
+        self.load_thread.error_occurred.connect(self.on_load_error)
+        self.load_thread.progress_updated.connect(self.progress_bar.setValue)
+        self.load_thread.bytes_updated.connect(self.on_load_progress)
+        self.load_thread.start()
+        
+    def create_catalog(self):
+        """创建数据目录（引擎设置无法应用时使用DuckDB默认设置）"""
+        try:
+            return DuckDBCatalog(settings=self.engine_settings)
+        except Exception as e:
+            self.startup_warnings.append(f'应用引擎设置失败，已使用默认设置: {e}')
+            catalog = DuckDBCatalog()
+            catalog.settings = self.engine_settings
+            return catalog
+            
+    def update_memory_usage(self):
+        """在状态栏显示数据库引擎的内存占用、内存上限和溢写到磁盘的大小"""
+        try:
+            memory_bytes, temp_bytes, memory_limit = self.catalog.memory_usage()
+        except Exception:
+            return
+        text = f'🧠 内存 {ProfileWidget.format_bytes(memory_bytes)} / 上限 {memory_limit}'
+        if temp_bytes:
+            text += f'，溢写 {ProfileWidget.format_bytes(temp_bytes)}'
+        if self.query_server is not None:
+            metrics = self.query_server.metrics_snapshot()
+            text += f"  |  🌐 {self.query_server.url}（{metrics['queries']} 次查询，{metrics['pool_in_use']} 个执行中）"
+        self.memory_label.setText(text)
+        
+    def toggle_query_server(self, checked):
+        """开启或停止本机查询服务"""
+        if not checked:
+            if self.query_server is not None:
+                self.query_server.stop()
+                self.query_server = None
+            self.server_btn.setToolTip('在本机开启HTTP/JSON查询服务，其他脚本可直接查询已导入的表')
+            self.update_memory_usage()
+            self.statusBar().showMessage('查询服务已停止')
+            return
+            
+        from PyQt5.QtWidgets import QInputDialog
+        port, ok = QInputDialog.getInt(
+            self, '查询服务', '监听端口（只接受本机连接）：', QueryServer.DEFAULT_PORT, 1024, 65535
+        )
+        server = None
+        if ok:
+            server = QueryServer(self.catalog, port, timeout=self.timeout_spin.value() or QueryServer.DEFAULT_TIMEOUT)
+            try:
+                server.start()
+            except OSError as e:
+                QMessageBox.critical(self, '错误', f'开启查询服务失败:\n{str(e)}')
+                server = None
+        if server is None:
+            self.server_btn.blockSignals(True)
+            self.server_btn.setChecked(False)
+            self.server_btn.blockSignals(False)
+            return
+        self.query_server = server
+        self.update_memory_usage()
+        self.server_btn.setToolTip(f'查询服务: {server.url}\n访问令牌: {server.token}')
+        self.statusBar().showMessage(
+            f'查询服务已开启: {server.url}，访问令牌 {server.token}'
+            f'（请求头 Authorization: Bearer <令牌>；POST /query 执行查询，GET /tables、/metrics 查看表和统计）'
+        )
+        
+    def show_engine_settings(self):
+        """引擎设置对话框：内存上限、工作线程数、溢写目录"""
+        from PyQt5.QtWidgets import QDialogButtonBox, QFormLayout, QDoubleSpinBox
+        
+        dialog = QDialog(self)
+        dialog.setWindowTitle('引擎设置')
+        dialog.setModal(True)
+        dialog.resize(500, 200)
+        
+        layout = QVBoxLayout(dialog)
+        form_layout = QFormLayout()
+        values = self.engine_settings.values
+        
+        memory_spin = QDoubleSpinBox()
+        memory_spin.setRange(0, 4096)
+        memory_spin.setDecimals(1)
+        memory_spin.setSuffix(' GB')
+        memory_spin.setSpecialValueText('自动（物理内存的80%）')
+        memory_spin.setValue(values.get('memory_limit_gb') or 0)
+        form_layout.addRow('内存上限:', memory_spin)
+        
+        threads_spin = QSpinBox()
+        threads_spin.setRange(0, 256)
+        threads_spin.setSpecialValueText(f'自动（{os.cpu_count()} 个）')
+        threads_spin.setValue(int(values.get('threads') or 0))
+        form_layout.addRow('工作线程数:', threads_spin)
+        
+        temp_layout = QHBoxLayout()
+        temp_edit = QLineEdit(values.get('temp_directory') or '')
+        temp_edit.setPlaceholderText('超出内存上限时中间结果写入的目录')
+        temp_layout.addWidget(temp_edit)
+        browse_btn = QPushButton('浏览...')
+        browse_btn.clicked.connect(lambda: temp_edit.setText(
+            QFileDialog.getExistingDirectory(dialog, '选择溢写目录', temp_edit.text()) or temp_edit.text()
+        ))
+        temp_layout.addWidget(browse_btn)
+        form_layout.addRow('溢写目录:', temp_layout)
+        layout.addLayout(form_layout)
+        
+        note = QLabel('设置对所有查询生效；查询超出内存上限时，中间结果溢写到磁盘而不会耗尽内存。')
+        note.setWordWrap(True)
+        layout.addWidget(note)
+        
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        button_box.accepted.connect(dialog.accept)
+        button_box.rejected.connect(dialog.reject)
+        layout.addWidget(button_box)
+        
+        if dialog.exec_() != QDialog.Accepted:
+            return
             
-            # 清理列名（去除前后空格）
-            df.columns = df.columns.str.strip()
+        old_values = dict(values)
+        values.update({
+            'memory_limit_gb': memory_spin.value(),
+            'threads': threads_spin.value(),
+            'temp_directory': temp_edit.text().strip(),
+        })
+        try:
+            pending = self.catalog.apply_settings()
+        except Exception as e:
+            # 恢复原来的设置
+            values.clear()
+            values.update(old_values)
+            try:
+                self.catalog.apply_settings()
+            except Exception:
+                pass
+            QMessageBox.critical(self, '错误', f'应用引擎设置失败:\n{str(e)}')
+            return
+        try:
+            self.engine_settings.save()
+        except OSError as e:
+            QMessageBox.warning(self, '警告', f'设置已生效，但保存失败:\n{str(e)}')
+        if pending:
+            QMessageBox.information(self, '提示', '已有数据溢写到原目录，新的溢写目录将在重新启动或打开工作区后生效')
+        self.update_memory_usage()
+        self.statusBar().showMessage('引擎设置已更新')
+        
+    def create_ingest_cache(self):
+        """创建导入缓存（缓存目录不可用时返回None）"""
+        try:
+            return IngestCache()
+        except OSError as e:
+            self.startup_warnings.append(f'导入缓存不可用: {e}')
+            return None
             
-            # 重置索引
-            df = df.reset_index(drop=True)
+    def active_ingest_cache(self):
+        """本次加载使用的导入缓存"""
+        if self.ingest_cache is not None and self.use_cache_cb.isChecked():
+            return self.ingest_cache
+        return None
+        
+    def clear_ingest_cache(self):
+        """清空导入缓存"""
+        size_mb = self.ingest_cache.total_size() / 1024 / 1024
+        if QMessageBox.question(
+            self, '确认清除', 
+            f'确定要清除导入缓存吗？（当前占用 {size_mb:.1f} MB）',
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+        ) != QMessageBox.Yes:
+            return
+        self.ingest_cache.clear()
+        self.statusBar().showMessage(f'已清除导入缓存，释放 {size_mb:.1f} MB')
+        
+    def is_busy(self):
+        """是否有正在进行的加载或查询"""
+        for thread_name in ('load_thread', 'profile_thread', 'materialize_thread'):
+            thread = getattr(self, thread_name, None)
+            if thread is not None and thread.isRunning():
+                return True
+        return bool(self.pending_queries or self.running_query_tabs())
+        
+    def workspace_meta(self):
+        """需要保存到工作区的界面数据"""
+        return {
+            'query_history': self.query_history,
+            'custom_templates': self.custom_templates,
+        }
+        
+    def save_workspace(self):
+        """保存工作区：已打开工作区时原地保存，否则另存为新的DuckDB文件"""
+        if self.is_busy():
+            QMessageBox.warning(self, '警告', '请等待当前加载或查询完成')
+            return
             
-        return df
+        path = None
+        if not self.catalog.is_workspace:
+            path, _ = QFileDialog.getSaveFileName(
+                self, '保存工作区', '', 'DuckDB工作区 (*.duckdb)'
+            )
+            if not path:
+                return
+            if not path.lower().endswith(('.duckdb', '.db')):
+                path += '.duckdb'
                 
-    def create_database(self):
-        """创建内存DuckDB数据库"""
-        # 关闭旧连接（如果存在）
-        if self.db_connection is not None:
-            self.db_connection.close()
-        # 创建新连接
-        self.db_connection = duckdb.connect(':memory:')
-        # 将所有表导入到数据库
-        for table_name, df in self.tables.items():
-            # DuckDB可以直接从DataFrame创建表
-            df.to_sql(table_name, self.db_connection, index=False, if_exists="replace")
-            # self.db_connection.register(table_name, df)
-        # 启用执行按钮
+        try:
+            self.catalog.save_workspace(self.workspace_meta(), path)
+            rebaseline(self.catalog)
+            if path is not None:
+                # 另存后切换到新文件的连接，旧连接上的分页结果已不可用
+                self.release_paged_results()
+            self.setWindowTitle(f'工作区: {os.path.basename(self.catalog.database)}')
+            self.statusBar().showMessage(f'工作区已保存: {self.catalog.database}')
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'保存工作区失败:\n{str(e)}')
+            
+    def release_paged_results(self):
+        """数据目录切换了数据库连接后，释放结果标签页中的分页结果（临时表随旧连接的游标一起关闭）"""
+        for i in range(self.result_tabs.count()):
+            tab = self.result_tabs.widget(i)
+            if tab.result is None or not tab.result.is_paged:
+                continue
+            if self.chart_result is tab.result:
+                self.chart_result = None
+            tab.result.close()
+            tab.result = None
+            tab.info_label.setText(f'⚠️ 已切换工作区，只保留已显示的 {tab.rows_loaded} 行，请重新执行查询获取完整结果')
+        self.update_query_buttons()
+        
+    def open_workspace(self):
+        """打开工作区文件，恢复其中的表、查询历史和模板"""
+        if self.is_busy():
+            QMessageBox.warning(self, '警告', '请等待当前加载或查询完成')
+            return
+            
+        path, _ = QFileDialog.getOpenFileName(
+            self, '打开工作区', '', 'DuckDB工作区 (*.duckdb *.db);;所有文件 (*)'
+        )
+        if not path:
+            return
+            
+        if self.tables and not self.catalog.is_workspace and QMessageBox.question(
+            self, '确认打开', 
+            '当前导入的表尚未保存到工作区，打开其他工作区后将丢失，是否继续？',
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+        ) != QMessageBox.Yes:
+            return
+            
+        self.stop_row_counts()
+        self.stop_summary()
+        try:
+            if self.catalog.is_workspace:
+                self.catalog.save_workspace(self.workspace_meta())
+            meta = self.catalog.open_workspace(path)
+            rebaseline(self.catalog)
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'打开工作区失败:\n{str(e)}')
+            return
+        self.release_paged_results()
+            
+        # 表都保存在工作区文件中，按需生成DataFrame
+        self.follow_thread.clear()
+        self.tables = {table_name: None for table_name in self.catalog.table_info}
+        self.df = None
+        self.table_name = next(iter(self.tables), 'data_table')
+        
+        # 恢复查询历史，合并模板（按名称去重）
+        self.query_history = meta.get('query_history', [])
+        self.update_history_display()
+        existing_names = {template['name'] for template in self.custom_templates}
+        for template in meta.get('custom_templates', []):
+            if template['name'] not in existing_names:
+                self.custom_templates.append(template)
+        self.load_templates_to_combo()
+        
+        # 刷新界面
+        self.update_tables_list()
+        if self.tables:
+            self.display_original_data()
+            self.show_data_info()
+        else:
+            self.original_table.setRowCount(0)
+            self.original_table.setColumnCount(0)
+        self.update_chart_source()
         self.execute_btn.setEnabled(len(self.tables) > 0)
+        self.setWindowTitle(f'工作区: {os.path.basename(path)}')
+        self.statusBar().showMessage(f'已打开工作区: {path} ({len(self.tables)}个表)')
+        # 保存工作区后通过SQL修改过的源表，刷新引用它们的物化表
+        self.refresh_materialized_views()
+        
+    def closeEvent(self, event):
+        """关闭窗口时保存已打开的工作区"""
+        self.follow_thread.stop()
+        if self.query_server is not None:
+            self.query_server.stop()
+        self.pending_queries.clear()
+        for tab in self.running_query_tabs():
+            tab.thread.cancel()
+            tab.thread.wait()
+        for thread in (getattr(self, 'profile_thread', None), self.materialize_thread, self.summary_thread):
+            if thread is not None and thread.isRunning():
+                thread.cancel()
+                thread.wait()
+        self.stop_row_counts()
+        if self.catalog.is_workspace:
+            try:
+                self.catalog.save_workspace(self.workspace_meta())
+            except Exception as e:
+                QMessageBox.warning(self, '警告', f'保存工作区失败: {e}')
+        super().closeEvent(event)
+        
+    def set_loading_state(self, loading):
+        """加载文件期间禁用会修改表的操作"""
+        self.load_btn.setEnabled(not loading)
+        self.link_btn.setEnabled(not loading)
+        self.batch_load_btn.setEnabled(not loading)
+        self.manage_tables_btn.setEnabled(not loading)
+        self.open_workspace_btn.setEnabled(not loading)
+        self.save_workspace_btn.setEnabled(not loading)
+        
+    def on_load_progress(self, bytes_read, total_bytes):
+        """显示已读取的字节数"""
+        self.statusBar().showMessage(
+            f'正在加载... 已读取 {bytes_read / 1024 / 1024:.1f} / {total_bytes / 1024 / 1024:.1f} MB'
+        )
+        
+    def cancel_load(self):
+        """取消正在进行的文件加载"""
+        self.cancel_load_btn.setEnabled(False)
+        self.statusBar().showMessage('正在取消加载...')
+        self.load_thread.cancel()
+        
+    def on_load_success(self, result):
+        """文件加载成功回调"""
+        table_name = result['table_name']
+        
+        # 保存到表字典中（原生导入的表只保存在数据目录中）
+        self.tables[table_name] = result['df']
+        self.on_table_added(table_name)
+        
+        # 更新界面状态
+        encoding_note = ''
+        if result['encoding']:
+            source = '自动检测' if result['encoding_detected'] else '手动指定'
+            encoding_note = f"（编码: {result['encoding']}，{source}）"
+        file_name = os.path.basename(result['file_path'])
+        if len(result.get('file_paths', [])) > 1:
+            file_name = f"{len(result['file_paths'])} 个文件 -> {table_name}"
+        row_count, col_count = self.catalog.table_shape(table_name)
+        self.file_info_label.setText(f'已加载: {file_name} ({row_count}行, {col_count}列)')
+        self.execute_btn.setEnabled(True)
+        cache_note = '（来自导入缓存）' if result['from_cache'] else ''
+        self.statusBar().showMessage(
+            f'文件加载成功: {file_name}{encoding_note}{cache_note}{self.sample_note(table_name)}'
+        )
+        
+        # 显示数据信息
+        self.show_data_info()
+        
+        self.finish_loading()
+        
+        # 报告各文件之间的列结构差异
+        if result['schema_drift']:
+            QMessageBox.warning(
+                self, '列结构不一致', 
+                '以下文件的列结构与第一个文件不同，已按列名合并（缺少的列为空值）:\n\n' + 
+                '\n'.join(result['schema_drift'][:30])
+            )
+        
+    def on_load_cancelled(self):
+        """文件加载取消回调（已有的表保持不变）"""
+        self.statusBar().showMessage('已取消加载，已有的表未受影响')
+        self.finish_loading()
+        
+    def on_load_error(self, error_msg):
+        """文件加载错误回调"""
+        self.finish_loading()
+        QMessageBox.critical(self, '错误', f'加载文件失败:\n{error_msg}')
+        
+    def finish_loading(self):
+        """恢复加载前的界面状态"""
+        self.set_loading_state(False)
+        self.cancel_load_btn.setVisible(False)
+        # 隐藏进度条
+        QTimer.singleShot(1000, lambda: self.progress_bar.setVisible(False))
+        
+    def ask_table_name(self, file_path):
+        """弹出对话框让用户输入表名，返回合法表名；取消或不合法时返回None"""
+        from PyQt5.QtWidgets import QInputDialog
+        file_name = file_stem(file_path)
+        default_table_name = file_name.lower().replace(' ', '_')
+        
+        table_name, ok = QInputDialog.getText(
+            self, '输入表名', 
+            '请为导入的数据表指定一个名称（仅使用字母、数字和下划线）：',
+            text=default_table_name
+        )
+        
+        if not ok or not table_name:
+            return None
+            
+        # 验证表名是否合法（只包含字母、数字和下划线）
+        import re
+        if not re.match(r'^[a-zA-Z0-9_]+$', table_name):
+            QMessageBox.warning(self, '警告', '表名只能包含字母、数字和下划线')
+            return None
+            
+        # 检查表名是否已存在
+        if table_name in self.tables and QMessageBox.question(
+            self, '确认覆盖', 
+            f'表 "{table_name}" 已存在，是否覆盖？',
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+        ) != QMessageBox.Yes:
+            return None
+            
+        return table_name
+        
+    def on_table_added(self, table_name):
+        """新表进入数据目录后刷新界面"""
+        # 同名表已被替换，停止跟踪旧表
+        self.follow_thread.remove(table_name)
+        
+        # 如果是第一个表或覆盖了当前表，设为当前表
+        if len(self.tables) == 1 or self.table_name not in self.tables or self.table_name == table_name:
+            self.df = self.tables[table_name]
+            self.table_name = table_name
+        
+        # 更新表列表
+        self.update_tables_list()
+        
+        # 显示原始数据
+        self.display_original_data()
+        
+        # 更新图表组件
+        self.update_chart_source()
+        
+        # 源表被替换，刷新引用它的物化表
+        if self.catalog.table_info.get(table_name, {}).get('kind') != 'materialized':
+            self.refresh_materialized_views()
+        
+    def link_file(self):
+        """将CSV或Excel文件链接为外部表（不导入数据）"""
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, '选择要链接的文件', '', 
+            'CSV文件 (*.csv *.csv.gz *.csv.zst);;Excel文件 (*.xlsx);;所有文件 (*)'
+        )
+        
+        if not file_path:
+            return
+            
+        table_name = self.ask_table_name(file_path)
+        if not table_name:
+            return
+            
+        try:
+            self.catalog.link_file(table_name, file_path)
+            self.tables[table_name] = None
+            self.on_table_added(table_name)
+            
+            # 更新界面状态
+            file_name = os.path.basename(file_path)
+            self.file_info_label.setText(f'已链接: {file_name}')
+            self.execute_btn.setEnabled(True)
+            self.statusBar().showMessage(f'文件已链接为外部表: {table_name} -> {file_name}')
+            
+            # 显示数据信息
+            self.show_data_info()
+            
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'链接文件失败:\n{str(e)}')
         
     def update_tables_list(self):
         """更新表列表显示"""
         self.tables_list.setRowCount(len(self.tables))
         
-        for i, (table_name, df) in enumerate(self.tables.items()):
-            # 表名
-            name_item = QTableWidgetItem(table_name)
+        for i, table_name in enumerate(self.tables):
+            # 表名（外部链接和正在跟踪的表加标记，实际表名保存在UserRole中）
+            if self.catalog.is_linked(table_name):
+                name_item = QTableWidgetItem(f'🔗 {table_name}')
+                name_item.setToolTip(f'外部链接: {self.catalog.table_info[table_name]["source"]}')
+            elif self.follow_thread.is_following(table_name):
+                name_item = QTableWidgetItem(f'📡 {table_name}')
+                name_item.setToolTip(f'正在跟踪: {self.catalog.table_info[table_name]["source"]}')
+            elif self.catalog.table_info.get(table_name, {}).get('kind') == 'materialized':
+                info = self.catalog.table_info[table_name]
+                name_item = QTableWidgetItem(f'🧊 {table_name}')
+                name_item.setToolTip(
+                    f'物化表（源表: {", ".join(info["sources"]) or "无"}，'
+                    f'{"可增量刷新" if info.get("incremental") else "完整重算"}，上次刷新: {info["refreshed_at"]}）\n{info["sql"]}'
+                )
+            elif self.sample_note(table_name):
+                name_item = QTableWidgetItem(f'🎲 {table_name}')
+                name_item.setToolTip(self.sample_note(table_name).strip('（）') + '，右键可导入完整数据')
+            else:
+                name_item = QTableWidgetItem(table_name)
+            name_item.setData(Qt.UserRole, table_name)
             self.tables_list.setItem(i, 0, name_item)
             
             # 行数
-            rows_item = QTableWidgetItem(str(len(df)))
+            rows_item = QTableWidgetItem(self.row_count_text(table_name))
             self.tables_list.setItem(i, 1, rows_item)
             
             # 列数
-            cols_item = QTableWidgetItem(str(len(df.columns)))
+            cols_item = QTableWidgetItem(self.column_count_text(table_name))
             self.tables_list.setItem(i, 2, cols_item)
             
         # 更新文件信息标签
@@ -447,10 +1135,122 @@ class AdvancedCSVSQLEditor(QMainWindow):
         else:
             self.file_info_label.setText('未加载文件')
     
+    def update_table_row_count(self, table_name):
+        """只刷新表列表中某个表的行数，不重建整个列表"""
+        for i in range(self.tables_list.rowCount()):
+            if self.tables_list.item(i, 0).data(Qt.UserRole) == table_name:
+                self.tables_list.setItem(i, 1, QTableWidgetItem(self.row_count_text(table_name)))
+                break
+    
+    def row_count_text(self, table_name):
+        """表的行数文本：外部链接的文件不可用时显示“?”，后台统计完成前显示“—”"""
+        if self.catalog.needs_row_count(table_name):
+            self.count_rows_in_background(table_name)
+            return '—'
+        row_count = self.catalog.row_count(table_name)
+        return '?' if row_count is None else str(row_count)
+    
+    def column_count_text(self, table_name):
+        """表的列数文本：外部链接的文件不可用时显示“?”"""
+        try:
+            return str(len(self.catalog.table_columns(table_name)))
+        except duckdb.Error:
+            return '?'
+    
+    def count_rows_in_background(self, table_name):
+        """在后台统计外部链接表的行数（扫描整个文件不阻塞界面），完成后刷新表列表"""
+        if table_name in self.row_count_threads:
+            return
+        thread = RowCountThread(self.catalog, table_name)
+        thread.count_ready.connect(self.on_row_count_ready)
+        self.row_count_threads[table_name] = thread
+        thread.start()
+    
+    def on_row_count_ready(self, table_name):
+        """外部链接表的行数统计完成"""
+        thread = self.row_count_threads.pop(table_name, None)
+        if thread is not None:
+            thread.wait()
+        if table_name in self.tables:
+            self.update_table_row_count(table_name)
+    
+    def stop_row_counts(self):
+        """取消后台的行数统计（切换工作区或关闭窗口前）"""
+        for thread in self.row_count_threads.values():
+            if thread.isRunning():
+                thread.cancel()
+                thread.wait()
+        self.row_count_threads.clear()
+    
+    def show_tables_list_context_menu(self, position):
+        """表列表右键菜单：跟踪CSV文件的新增行、导入抽样表的完整数据、刷新物化表"""
+        item = self.tables_list.itemAt(position)
+        if item is None:
+            return
+        table_name = self.tables_list.item(item.row(), 0).data(Qt.UserRole)
+        
+        from PyQt5.QtWidgets import QMenu
+        menu = QMenu()
+        if self.sample_note(table_name):
+            menu.addAction('📥 导入完整数据', lambda: self.load_full_data(table_name))
+        if self.catalog.table_info.get(table_name, {}).get('kind') == 'materialized':
+            menu.addAction('🔄 刷新物化表', lambda: self.refresh_materialized_views([table_name], manual=True))
+            menu.addAction('♻️ 完整重算', lambda: self.refresh_materialized_views([table_name], manual=True, force=True))
+            menu.addAction('📝 复制定义到编辑器', 
+                           lambda: self.sql_editor.setPlainText(self.catalog.table_info[table_name]['sql']))
+            menu.exec_(self.tables_list.mapToGlobal(position))
+            return
+        if self.follow_thread.is_following(table_name):
+            menu.addAction('🔄 立即检查新增行', self.follow_thread.poll_now)
+            menu.addAction('⏹ 停止跟踪', lambda: self.stop_following(table_name))
+        else:
+            follow_action = menu.addAction('📡 跟踪文件新增行', lambda: self.start_following(table_name))
+            follow_action.setEnabled('offset' in self.catalog.table_info.get(table_name, {}))
+        menu.exec_(self.tables_list.mapToGlobal(position))
+    
+    def start_following(self, table_name):
+        """开始跟踪表的源CSV文件，定时把新增行追加到表中"""
+        try:
+            follower = TailFollower(self.catalog, table_name)
+        except Exception as e:
+            QMessageBox.warning(self, '警告', f'无法跟踪表:\n{str(e)}')
+            return
+        self.follow_thread.add(follower)
+        self.update_tables_list()
+        self.statusBar().showMessage(
+            f'正在跟踪 {os.path.basename(follower.file_path)}，每 {self.follow_thread.interval} 秒追加新增行到表 {table_name}'
+        )
+    
+    def stop_following(self, table_name):
+        """停止跟踪表的源文件"""
+        self.follow_thread.remove(table_name)
+        self.update_tables_list()
+        self.statusBar().showMessage(f'已停止跟踪表 {table_name}')
+    
+    def on_rows_appended(self, table_name, row_count):
+        """跟踪的文件有新增行已追加到表中"""
+        if table_name not in self.tables:
+            return
+        # 已生成的DataFrame不再完整，改为按需从数据目录生成
+        self.tables[table_name] = None
+        if self.table_name == table_name:
+            self.df = None
+            self.update_chart_source()
+        self.update_table_row_count(table_name)
+        self.statusBar().showMessage(
+            f'表 {table_name} 追加了 {row_count} 行新数据（{datetime.now().strftime("%H:%M:%S")}）'
+        )
+        self.refresh_materialized_views()
+    
+    def on_follow_error(self, table_name, error_msg):
+        """跟踪出错，已停止跟踪该表"""
+        self.update_tables_list()
+        QMessageBox.warning(self, '警告', f'跟踪表 "{table_name}" 的源文件失败，已停止跟踪:\n{error_msg}')
+    
     def on_table_selected(self, item):
         """处理表选择事件"""
         row = item.row()
-        table_name = self.tables_list.item(row, 0).text()
+        table_name = self.tables_list.item(row, 0).data(Qt.UserRole)
         
         if table_name in self.tables:
             # 更新当前表
@@ -461,10 +1261,13 @@ class AdvancedCSVSQLEditor(QMainWindow):
             self.display_original_data()
             
             # 更新图表组件
-            self.chart_widget.update_data(self.df)
+            self.update_chart_source()
             
             # 更新状态栏
-            self.statusBar().showMessage(f'已选择表: {table_name} ({len(self.df)}行, {len(self.df.columns)}列)')
+            self.statusBar().showMessage(
+                f'已选择表: {table_name} ({self.row_count_text(table_name)}行, '
+                f'{self.column_count_text(table_name)}列){self.sample_note(table_name)}'
+            )
     
     def show_table_metadata(self):
         """显示表结构"""
@@ -475,12 +1278,13 @@ class AdvancedCSVSQLEditor(QMainWindow):
             return
             
         row = selected_items[0].row()
-        table_name = self.tables_list.item(row, 0).text()
+        table_name = self.tables_list.item(row, 0).data(Qt.UserRole)
         
         if table_name not in self.tables:
             return
             
-        df = self.tables[table_name]
+        # 通过数据目录统计列信息
+        row_count, column_stats = self.catalog.column_stats(table_name)
         
         # 创建表结构对话框
         from PyQt5.QtWidgets import QDialog, QVBoxLayout, QTableWidget, QTableWidgetItem
@@ -495,23 +1299,22 @@ class AdvancedCSVSQLEditor(QMainWindow):
         metadata_table = QTableWidget()
         metadata_table.setColumnCount(4)
         metadata_table.setHorizontalHeaderLabels(['列名', '数据类型', '非空值数', '唯一值数'])
-        metadata_table.setRowCount(len(df.columns))
+        metadata_table.setRowCount(len(column_stats))
         
-        for i, col in enumerate(df.columns):
+        for i, (col, dtype, non_null, unique) in enumerate(column_stats):
             # 列名
             metadata_table.setItem(i, 0, QTableWidgetItem(col))
             
             # 数据类型
-            dtype = str(df[col].dtype)
             metadata_table.setItem(i, 1, QTableWidgetItem(dtype))
             
             # 非空值数
-            non_null = df[col].count()
-            metadata_table.setItem(i, 2, QTableWidgetItem(f'{non_null}/{len(df)} ({non_null/len(df)*100:.1f}%)'))
+            non_null_pct = non_null / row_count * 100 if row_count else 0
+            metadata_table.setItem(i, 2, QTableWidgetItem(f'{non_null}/{row_count} ({non_null_pct:.1f}%)'))
             
             # 唯一值数
-            unique = df[col].nunique()
-            metadata_table.setItem(i, 3, QTableWidgetItem(f'{unique} ({unique/len(df)*100:.1f}%)'))
+            unique_pct = unique / row_count * 100 if row_count else 0
+            metadata_table.setItem(i, 3, QTableWidgetItem(f'{unique} ({unique_pct:.1f}%)'))
         
         metadata_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         layout.addWidget(metadata_table)
@@ -520,25 +1323,63 @@ class AdvancedCSVSQLEditor(QMainWindow):
     
     def display_original_data(self):
         """显示原始数据"""
-        self.populate_table(self.original_table, self.df)
+        if self.df is None and self.table_name in self.tables:
+            # 原生导入的表只取需要显示的行
+            try:
+                preview = self.catalog.fetch_df(self.table_name, limit=self.display_limit_spin.value())
+            except duckdb.Error as e:
+                # 外部链接的文件已移动或删除
+                self.populate_table(self.original_table, pd.DataFrame())
+                self.statusBar().showMessage(f'无法读取表 {self.table_name}: {e}')
+                return
+            # 外部链接表的行数在后台统计，统计完成前不显示剩余行数
+            row_count = None
+            if not self.catalog.needs_row_count(self.table_name):
+                row_count = self.catalog.row_count(self.table_name)
+            self.populate_table(self.original_table, preview, total_rows=row_count)
+        else:
+            self.populate_table(self.original_table, self.df)
+        
+    def current_df(self):
+        """获取当前表的DataFrame（原生导入的表在需要时才从数据目录生成）"""
+        if self.df is None and self.table_name in self.tables:
+            self.df = self.catalog.fetch_df(self.table_name)
+        return self.df
+        
+    def update_chart_source(self):
+        """更新图表数据源（原生导入的表延迟到切换到图表页时再生成DataFrame）"""
+        self.chart_result = None
+        if self.df is None and self.table_name in self.tables:
+            self.chart_widget.update_data(None)
+            self.chart_pending = True
+        else:
+            self.chart_widget.update_data(self.df)
+            self.chart_pending = False
+        
+    def on_tab_changed(self, index):
+        """切换标签页时按需准备图表数据"""
+        if self.chart_pending and self.tab_widget.widget(index) is self.chart_widget:
+            self.chart_pending = False
+            if self.chart_result is not None:
+                # 查询结果（大结果只取前面的行）
+                self.chart_widget.update_data(self.chart_result.to_df(limit=self.CHART_MAX_ROWS))
+            else:
+                self.chart_widget.update_data(self.current_df())
         
     def setup_copy_functionality(self):
         """设置表格的复制功能"""
-        # 为原始数据表和结果表安装事件过滤器
-        self.original_table.installEventFilter(self)
-        self.result_table.installEventFilter(self)
-        
-        # 添加右键菜单
-        self.original_table.setContextMenuPolicy(Qt.CustomContextMenu)
-        self.original_table.customContextMenuRequested.connect(self.show_table_context_menu)
-        self.result_table.setContextMenuPolicy(Qt.CustomContextMenu)
-        self.result_table.customContextMenuRequested.connect(self.show_table_context_menu)
+        self.enable_copy(self.original_table)
+        
+    def enable_copy(self, table):
+        """为表格安装事件过滤器（Ctrl+C）并添加右键菜单"""
+        table.installEventFilter(self)
+        table.setContextMenuPolicy(Qt.CustomContextMenu)
+        table.customContextMenuRequested.connect(self.show_table_context_menu)
     
     def eventFilter(self, source, event):
         """事件过滤器，处理键盘事件"""
         # 检查是否是键盘事件，以及事件源是否是表格
-        if (event.type() == QEvent.KeyPress and 
-            (source is self.original_table or source is self.result_table)):
+        if event.type() == QEvent.KeyPress and isinstance(source, QTableWidget):
             
             # 检查是否是Ctrl+C
             if event.key() == Qt.Key_C and event.modifiers() == Qt.ControlModifier:
@@ -591,13 +1432,17 @@ class AdvancedCSVSQLEditor(QMainWindow):
         # 显示菜单
         menu.exec_(sender.mapToGlobal(position))
     
-    def populate_table(self, table_widget, dataframe):
+    def populate_table(self, table_widget, dataframe, total_rows=None):
         """填充表格数据"""
         if dataframe is None or dataframe.empty:
             table_widget.setRowCount(0)
             table_widget.setColumnCount(0)
             return
             
+        # total_rows 用于只取了部分行的数据
+        if total_rows is None:
+            total_rows = len(dataframe)
+            
         # 限制显示行数以提高性能
         limit = self.display_limit_spin.value()
         display_df = dataframe.head(limit) if len(dataframe) > limit else dataframe
@@ -609,31 +1454,66 @@ class AdvancedCSVSQLEditor(QMainWindow):
         table_widget.setHorizontalHeaderLabels([str(col) for col in display_df.columns])
         
         # 填充数据
-        for i, row in enumerate(display_df.itertuples(index=False)):
-            for j, value in enumerate(row):
-                item = QTableWidgetItem(str(value))
-                table_widget.setItem(i, j, item)
+        self.fill_table_rows(table_widget, display_df, 0)
                 
         # 调整列宽
         table_widget.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
         
         # 如果数据被截断，显示提示
-        if len(dataframe) > limit:
-            table_widget.setRowCount(len(display_df) + 1)
-            for j in range(len(display_df.columns)):
-                item = QTableWidgetItem(f"... 还有 {len(dataframe) - limit} 行数据未显示")
-                item.setBackground(Qt.lightGray)
-                table_widget.setItem(len(display_df), j, item)
+        if total_rows > len(display_df):
+            self.add_truncated_row(table_widget, total_rows - len(display_df))
+            
+    def fill_table_rows(self, table_widget, dataframe, start_row):
+        """从start_row开始填充数据行"""
+        table_widget.setRowCount(start_row + len(dataframe))
+        for i, row in enumerate(dataframe.itertuples(index=False), start_row):
+            for j, value in enumerate(row):
+                item = QTableWidgetItem(str(value))
+                table_widget.setItem(i, j, item)
+                
+    def add_truncated_row(self, table_widget, remaining):
+        """在表格末尾添加“还有N行未显示”的提示行"""
+        row = table_widget.rowCount()
+        table_widget.setRowCount(row + 1)
+        for j in range(table_widget.columnCount()):
+            item = QTableWidgetItem(f"... 还有 {remaining} 行数据未显示")
+            item.setBackground(Qt.lightGray)
+            table_widget.setItem(row, j, item)
+            
+    def on_result_scrolled(self, tab, value):
+        """查询结果滚动到底部时取回下一页"""
+        result = tab.result
+        scroll_bar = tab.table.verticalScrollBar()
+        if result is None or not result.is_paged or value < scroll_bar.maximum():
+            return
+        loaded = tab.rows_loaded
+        if loaded >= result.row_count:
+            return
+            
+        # 用下一页替换末尾的提示行
+        page = result.page(loaded, self.display_limit_spin.value())
+        self.fill_table_rows(tab.table, page, loaded)
+        tab.rows_loaded = loaded + len(page)
+        if tab.rows_loaded < result.row_count:
+            self.add_truncated_row(tab.table, result.row_count - tab.rows_loaded)
+        self.statusBar().showMessage(f'已显示 {tab.rows_loaded} / {result.row_count} 行查询结果')
                 
     def show_data_info(self):
         """显示数据信息"""
         if self.df is None:
+            if self.table_name in self.tables:
+                self.show_catalog_data_info()
             return
             
         info_text = f"📊 数据概览 (加载时间: {datetime.now().strftime('%H:%M:%S')})\n"
         info_text += f"{'='*50}\n"
         info_text += f"📏 数据维度: {len(self.df)} 行 × {len(self.df.columns)} 列\n"
-        info_text += f"💾 内存使用: {self.df.memory_usage(deep=True).sum() / 1024 / 1024:.2f} MB\n\n"
+        memory_mb = self.df.memory_usage(deep=True).sum() / 1024 / 1024
+        if 'memory_before' in self.df.attrs:
+            before_mb = self.df.attrs['memory_before'] / 1024 / 1024
+            info_text += f"💾 内存使用: {memory_mb:.2f} MB（压缩前 {before_mb:.2f} MB，节省 {(1 - memory_mb / before_mb) * 100 if before_mb else 0:.1f}%）\n\n"
+        else:
+            info_text += f"💾 内存使用: {memory_mb:.2f} MB\n\n"
         
         info_text += "📋 列信息:\n"
         for i, (col, dtype) in enumerate(zip(self.df.columns, self.df.dtypes)):
@@ -653,21 +1533,94 @@ class AdvancedCSVSQLEditor(QMainWindow):
             
         self.info_text.setText(info_text)
         
+    def show_catalog_data_info(self):
+        """显示原生导入表的数据信息（先显示列类型，列统计由SUMMARIZE在后台计算）"""
+        if self.catalog.is_linked(self.table_name):
+            self.show_linked_data_info()
+            return
+            
+        row_count = self.catalog.row_count(self.table_name)
+        columns = self.catalog.table_columns(self.table_name)
+        
+        info_text = self.catalog_data_info_header(self.table_name, row_count, len(columns))
+        info_text += "📋 列信息（正在统计空值和唯一值...）:\n"
+        for i, (col, dtype) in enumerate(columns):
+            info_text += f"{i+1:2d}. {col:<20} | {dtype}\n"
+        self.info_text.setText(info_text)
+        
+        self.stop_summary()
+        self.summary_thread = TableSummaryThread(self.catalog, self.table_name)
+        self.summary_thread.summary_ready.connect(self.on_summary_ready)
+        self.summary_thread.start()
+        
+    def catalog_data_info_header(self, table_name, row_count, col_count):
+        """原生导入表数据信息的概览部分"""
+        info_text = f"📊 数据概览 (加载时间: {datetime.now().strftime('%H:%M:%S')})\n"
+        info_text += f"{'='*50}\n"
+        info_text += f"📏 数据维度: {row_count} 行 × {col_count} 列\n"
+        info = self.catalog.table_info.get(table_name, {})
+        if info.get('kind') == 'materialized':
+            info_text += f"🧊 物化表: 上次刷新 {info['refreshed_at']}，源表 {', '.join(info['sources']) or '无'}\n"
+            info_text += "💾 存储位置: DuckDB数据目录（查询结果）\n\n"
+        else:
+            info_text += "💾 存储位置: DuckDB数据目录（原生导入）\n\n"
+        return info_text
+        
+    def on_summary_ready(self, table_name, row_count, summary):
+        """后台列统计完成，当前仍显示该表时补充空值、唯一值和数值列统计"""
+        if table_name != self.table_name or self.df is not None:
+            return
+        info_text = self.catalog_data_info_header(table_name, row_count, len(summary))
+        info_text += "📋 列信息:\n"
+        for i, row in enumerate(summary.itertuples(index=False)):
+            null_pct = float(row.null_percentage) if row.null_percentage is not None else 0.0
+            null_count = int(round(row_count * null_pct / 100))
+            info_text += f"{i+1:2d}. {row.column_name:<20} | {row.column_type:<10} | 空值: {null_count:4d}({null_pct:5.1f}%) | 唯一值: ~{row.approx_unique}\n"
+            
+        # 数值列统计
+        numeric_rows = [row for row in summary.itertuples(index=False) if row.std is not None and not pd.isna(row.std)]
+        if numeric_rows:
+            info_text += "\n📊 数值列统计:\n"
+            for row in numeric_rows:
+                info_text += f"{row.column_name}: 均值={float(row.avg):.2f}, 中位数={float(row.q50):.2f}, 标准差={float(row.std):.2f}\n"
+            
+        self.info_text.setText(info_text)
+        
+    def stop_summary(self):
+        """取消正在后台进行的列统计（切换表、工作区或重新统计前）"""
+        thread, self.summary_thread = self.summary_thread, None
+        if thread is not None and thread.isRunning():
+            thread.summary_ready.disconnect(self.on_summary_ready)
+            thread.cancel()
+            thread.wait()
+        
+    def show_linked_data_info(self):
+        """显示外部链接表的数据信息（只读取列类型，不扫描整个文件）"""
+        source = self.catalog.table_info[self.table_name]['source']
+        file_key = self.catalog.linked_file_key(self.table_name)
+        try:
+            columns = self.catalog.table_columns(self.table_name)
+        except duckdb.Error:
+            columns = []
+        
+        info_text = f"📊 数据概览 (链接时间: {datetime.now().strftime('%H:%M:%S')})\n"
+        info_text += f"{'='*50}\n"
+        info_text += f"📏 数据维度: {self.row_count_text(self.table_name)} 行 × {len(columns) if columns else '?'} 列\n"
+        info_text += f"🔗 外部文件: {source}\n"
+        if file_key is None:
+            info_text += "⚠️ 外部文件已移动或删除，无法查询\n\n"
+        else:
+            info_text += f"💾 文件大小: {file_key[0] / 1024 / 1024:.2f} MB（查询时直接读取，不占用内存）\n\n"
+        
+        info_text += "📋 列信息:\n"
+        for i, (col, dtype) in enumerate(columns):
+            info_text += f"{i+1:2d}. {col:<20} | {dtype}\n"
+            
+        self.info_text.setText(info_text)
+        
     def get_default_templates(self):
-        """获取默认模板"""
-        return [
-            ('查看所有数据', 'SELECT * FROM table_name LIMIT 100;'),
-            ('数据统计', 'SELECT COUNT(*) as 总行数 FROM table_name;'),
-            ('列信息', 'PRAGMA table_info(table_name);'),
-            ('数值列统计', 'SELECT\n  AVG(column_name) as 平均值,\n  MIN(column_name) as 最小值,\n  MAX(column_name) as 最大值\nFROM table_name;'),
-            ('分组统计', 'SELECT column_name, COUNT(*) as 数量\nFROM table_name\nGROUP BY column_name\nORDER BY 数量 DESC;'),
-            ('去重查询', 'SELECT DISTINCT column_name FROM table_name;'),
-            ('条件筛选', 'SELECT * FROM table_name\nWHERE column_name > value\nLIMIT 100;'),
-            ('排序查询', 'SELECT * FROM table_name\nORDER BY column_name DESC\nLIMIT 100;'),
-            ('多表关联查询', 'SELECT a.column1, b.column2\nFROM table1 a\nJOIN table2 b ON a.id = b.id\nWHERE a.column1 > value\nLIMIT 100;'),
-            ('查看所有表', 'SELECT name FROM sqlite_master WHERE type="table";'),
-            ('查看表结构', 'PRAGMA table_info(table_name);')
-        ]
+        """获取默认模板（$name 为模板参数，应用时通过表单填写）"""
+        return default_templates()
         
     def show_database_schema(self):
         """显示数据库中的所有表和列信息"""
@@ -689,24 +1642,42 @@ class AdvancedCSVSQLEditor(QMainWindow):
         tree.setHeaderLabels(['名称', '类型', '备注'])
         tree.setColumnWidth(0, 250)
         
-        # 添加表和列
-        for table_name, df in self.tables.items():
+        # 添加表和列（通过数据目录统计）
+        for table_name in self.tables:
+            if self.catalog.is_linked(table_name):
+                # 外部链接的表只读取列类型，不扫描整个文件做统计
+                table_item = QTreeWidgetItem(tree)
+                table_item.setText(0, table_name)
+                table_item.setText(1, '外部表')
+                table_item.setText(
+                    2, f'{self.row_count_text(table_name)}行, {self.column_count_text(table_name)}列'
+                )
+                try:
+                    columns = self.catalog.table_columns(table_name)
+                except duckdb.Error:
+                    columns = []
+                for col, dtype in columns:
+                    col_item = QTreeWidgetItem(table_item)
+                    col_item.setText(0, col)
+                    col_item.setText(1, dtype)
+                continue
+                
+            row_count, column_stats = self.catalog.column_stats(table_name)
+            
             # 创建表节点
             table_item = QTreeWidgetItem(tree)
             table_item.setText(0, table_name)
             table_item.setText(1, '表')
-            table_item.setText(2, f'{len(df)}行, {len(df.columns)}列')
+            table_item.setText(2, f'{row_count}行, {len(column_stats)}列')
             
             # 添加列节点
-            for col in df.columns:
+            for col, dtype, non_null, unique in column_stats:
                 col_item = QTreeWidgetItem(table_item)
                 col_item.setText(0, col)
-                col_item.setText(1, str(df[col].dtype))
+                col_item.setText(1, dtype)
                 
                 # 添加列统计信息
-                non_null = df[col].count()
-                unique = df[col].nunique()
-                col_item.setText(2, f'非空: {non_null}/{len(df)}, 唯一值: {unique}')
+                col_item.setText(2, f'非空: {non_null}/{row_count}, 唯一值: {unique}')
         
         tree.expandAll()  # 展开所有节点
         layout.addWidget(tree)
@@ -785,22 +1756,162 @@ class AdvancedCSVSQLEditor(QMainWindow):
         
         # 添加默认模板
         self.template_combo.addItem('--- 默认模板 ---', '')
-        for name, sql in self.get_default_templates():
-            self.template_combo.addItem(f"📋 {name}", sql)
+        for template in self.get_default_templates():
+            self.template_combo.addItem(f"📋 {template['name']}", template)
         
         # 添加自定义模板
         if self.custom_templates:
             self.template_combo.addItem('--- 自定义模板 ---', '')
             for template in self.custom_templates:
-                self.template_combo.addItem(f"⭐ {template['name']}", template['sql'])
+                self.template_combo.addItem(f"⭐ {template['name']}", template)
     
     def apply_selected_template(self):
-        """应用选中的模板"""
-        sql = self.template_combo.currentData()
-        if sql:
-            self.sql_editor.setText(sql)
-        else:
+        """应用选中的模板：带参数的模板填写参数后以预处理语句执行"""
+        template = self.template_combo.currentData()
+        if not template:
             QMessageBox.information(self, '提示', '请先选择一个模板')
+            return
+            
+        self.sql_editor.setText(template['sql'])
+        if not template_placeholders(template['sql']):
+            return
+        if not self.tables:
+            QMessageBox.warning(self, '警告', '请先加载数据文件')
+            return
+            
+        values = self.ask_template_values(template)
+        if values is None:
+            return
+        try:
+            sql, bound_values = render_template(template, values)
+        except ValueError as e:
+            QMessageBox.warning(self, '警告', str(e))
+            return
+        self.submit_query(sql, params=bound_values)
+        
+    def ask_template_values(self, template):
+        """显示模板参数表单，返回 {参数名: 输入值}，取消时返回None"""
+        from PyQt5.QtCore import QDate
+        from PyQt5.QtWidgets import QDialogButtonBox, QFormLayout, QDateEdit
+        
+        dialog = QDialog(self)
+        dialog.setWindowTitle(f"模板参数 - {template['name']}")
+        dialog.setModal(True)
+        
+        layout = QVBoxLayout(dialog)
+        form_layout = QFormLayout()
+        params = {param['name']: param for param in template.get('params', [])}
+        editors = {}
+        table_combos = []
+        column_combos = []
+        for name in template_placeholders(template['sql']):
+            param = params.get(name, {'name': name, 'type': 'text'})
+            param_type = param.get('type', 'text')
+            default = param.get('default')
+            if param_type == 'table':
+                editor = QComboBox()
+                editor.addItems(list(self.tables))
+                editor.setCurrentText(default or self.table_name)
+                table_combos.append(editor)
+            elif param_type == 'column':
+                editor = QComboBox()
+                editor.setEditable(True)
+                column_combos.append((editor, default))
+            elif param_type == 'boolean':
+                editor = QCheckBox()
+                editor.setChecked(bool(default))
+            elif param_type == 'date':
+                editor = QDateEdit()
+                editor.setCalendarPopup(True)
+                editor.setDisplayFormat('yyyy-MM-dd')
+                editor.setDate(QDate.fromString(default, 'yyyy-MM-dd') if default else QDate.currentDate())
+            else:
+                editor = QLineEdit('' if default is None else str(default))
+            editors[name] = editor
+            form_layout.addRow(f"{param.get('label', name)} ({PARAM_TYPES.get(param_type, '文本')}):", editor)
+        layout.addLayout(form_layout)
+        
+        def update_columns():
+            """列名下拉框列出表单中所选各表的列"""
+            columns = []
+            for table_combo in table_combos or [None]:
+                table_name = table_combo.currentText() if table_combo else self.table_name
+                if table_name in self.tables:
+                    columns += [col for col, _ in self.catalog.table_columns(table_name) if col not in columns]
+            for column_combo, default in column_combos:
+                current = column_combo.currentText() or default
+                column_combo.clear()
+                column_combo.addItems(columns)
+                if current:
+                    column_combo.setCurrentText(current)
+        for table_combo in table_combos:
+            table_combo.currentTextChanged.connect(update_columns)
+        update_columns()
+        
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        button_box.button(QDialogButtonBox.Ok).setText('执行')
+        button_box.accepted.connect(dialog.accept)
+        button_box.rejected.connect(dialog.reject)
+        layout.addWidget(button_box)
+        
+        if dialog.exec_() != QDialog.Accepted:
+            return None
+        values = {}
+        for name, editor in editors.items():
+            if isinstance(editor, QComboBox):
+                values[name] = editor.currentText()
+            elif isinstance(editor, QCheckBox):
+                values[name] = editor.isChecked()
+            elif isinstance(editor, QLineEdit):
+                values[name] = editor.text()
+            else:
+                values[name] = editor.date().toPyDate()
+        return values
+        
+    def create_params_table(self, sql_edit, params):
+        """模板参数类型表：随SQL中的 $name 占位符自动增减行，可设置类型和默认值"""
+        params_table = QTableWidget(0, 3)
+        params_table.setHorizontalHeaderLabels(['参数', '类型', '默认值'])
+        params_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        params_table.setMaximumHeight(150)
+        
+        def sync_rows():
+            existing = {param['name']: param for param in params}
+            existing.update({param['name']: param for param in self.read_params_table(params_table)})
+            names = template_placeholders(sql_edit.toPlainText())
+            params_table.setRowCount(len(names))
+            for row, name in enumerate(names):
+                param = existing.get(name, {'name': name, 'type': 'text'})
+                name_item = QTableWidgetItem(name)
+                name_item.setFlags(name_item.flags() & ~Qt.ItemIsEditable)
+                params_table.setItem(row, 0, name_item)
+                type_combo = QComboBox()
+                for param_type, label in PARAM_TYPES.items():
+                    type_combo.addItem(label, param_type)
+                type_combo.setCurrentIndex(max(type_combo.findData(param.get('type', 'text')), 0))
+                params_table.setCellWidget(row, 1, type_combo)
+                default = param.get('default')
+                params_table.setItem(row, 2, QTableWidgetItem('' if default is None else str(default)))
+        
+        sql_edit.textChanged.connect(sync_rows)
+        sync_rows()
+        return params_table
+        
+    @staticmethod
+    def read_params_table(params_table):
+        """读取模板参数类型表 [{'name', 'type', 'default'}, ...]"""
+        params = []
+        for row in range(params_table.rowCount()):
+            name_item = params_table.item(row, 0)
+            type_combo = params_table.cellWidget(row, 1)
+            if name_item is None or type_combo is None:
+                continue
+            param = {'name': name_item.text(), 'type': type_combo.currentData()}
+            default_item = params_table.item(row, 2)
+            if default_item is not None and default_item.text().strip():
+                param['default'] = default_item.text().strip()
+            params.append(param)
+        return params
     
     def add_custom_template(self):
         """添加自定义模板"""
@@ -830,13 +1941,18 @@ class AdvancedCSVSQLEditor(QMainWindow):
         layout.addWidget(QLabel('SQL内容:'))
         sql_edit = QTextEdit()
         sql_edit.setFont(QFont('Consolas', 10))
-        sql_edit.setPlaceholderText('请输入SQL语句...')
+        sql_edit.setPlaceholderText('请输入SQL语句，参数写作 $name（如 LIMIT $limit）...')
         # 如果编辑器中有内容，预填充
         current_sql = self.sql_editor.toPlainText().strip()
         if current_sql:
             sql_edit.setText(current_sql)
         layout.addWidget(sql_edit)
         
+        # 模板参数
+        layout.addWidget(QLabel('模板参数:'))
+        params_table = self.create_params_table(sql_edit, [])
+        layout.addWidget(params_table)
+        
         # 按钮
         button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         button_box.accepted.connect(dialog.accept)
@@ -867,6 +1983,7 @@ class AdvancedCSVSQLEditor(QMainWindow):
                 'name': name,
                 'description': desc,
                 'sql': sql,
+                'params': self.read_params_table(params_table),
                 'created_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
             
@@ -935,6 +2052,11 @@ class AdvancedCSVSQLEditor(QMainWindow):
         sql_edit.setText(selected_template['sql'])
         layout.addWidget(sql_edit)
         
+        # 模板参数
+        layout.addWidget(QLabel('模板参数:'))
+        params_table = self.create_params_table(sql_edit, selected_template.get('params', []))
+        layout.addWidget(params_table)
+        
         # 按钮
         button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         button_box.accepted.connect(dialog.accept)
@@ -965,6 +2087,7 @@ class AdvancedCSVSQLEditor(QMainWindow):
                 'name': name,
                 'description': desc,
                 'sql': sql,
+                'params': self.read_params_table(params_table),
                 'modified_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             })
             
@@ -1098,16 +2221,16 @@ class AdvancedCSVSQLEditor(QMainWindow):
                 QMessageBox.warning(dialog, '警告', f'表名 "{new_name}" 已存在')
                 return
                 
-            # 重命名表
+            # 重命名表（等待正在进行的跟踪检查结束）
+            with self.follow_thread.lock:
+                self.catalog.rename_table(old_name, new_name)
+                self.follow_thread.rename(old_name, new_name)
             self.tables[new_name] = self.tables.pop(old_name)
             
             # 如果重命名的是当前表，更新当前表名
             if self.table_name == old_name:
                 self.table_name = new_name
                 
-            # 更新数据库
-            self.create_database()
-            
             # 更新表列表
             self.update_tables_list()
             tables_list.clear()
@@ -1132,6 +2255,8 @@ class AdvancedCSVSQLEditor(QMainWindow):
                 return
                 
             # 删除表
+            self.follow_thread.remove(table_name)
+            self.catalog.drop_table(table_name)
             del self.tables[table_name]
             
             # 如果删除的是当前表，更新当前表
@@ -1141,20 +2266,18 @@ class AdvancedCSVSQLEditor(QMainWindow):
                     self.table_name = next(iter(self.tables))
                     self.df = self.tables[self.table_name]
                     self.display_original_data()
-                    self.chart_widget.update_data(self.df)
+                    self.update_chart_source()
                 else:
                     # 没有表了
                     self.table_name = "data_table"
                     self.df = None
                     self.original_table.setRowCount(0)
                     self.original_table.setColumnCount(0)
-                    self.chart_widget.update_data(None)
+                    self.update_chart_source()
                     
-            # 更新数据库
-            self.create_database()
-            
             # 更新表列表
             self.update_tables_list()
+            self.execute_btn.setEnabled(len(self.tables) > 0)
             tables_list.clear()
             tables_list.addItems(self.tables.keys())
             
@@ -1168,11 +2291,28 @@ class AdvancedCSVSQLEditor(QMainWindow):
     
     def execute_query(self):
         """执行SQL查询"""
-        if self.db_connection is None:
+        if not self.tables:
             QMessageBox.warning(self, '警告', '请先加载数据文件')
             return
             
-        sql_query = self.sql_editor.toPlainText().strip()
+        self.submit_query(self.sql_editor.toPlainText().strip())
+        
+    def execute_current_statement(self):
+        """执行选中的SQL文本，未选中时执行光标所在的语句"""
+        if not self.tables:
+            QMessageBox.warning(self, '警告', '请先加载数据文件')
+            return
+            
+        text_cursor = self.sql_editor.textCursor()
+        if text_cursor.hasSelection():
+            # 选区中的段落分隔符替换为换行
+            sql_query = text_cursor.selectedText().replace('\u2029', '\n').strip()
+        else:
+            sql_query = statement_at(self.sql_editor.toPlainText(), text_cursor.position())
+        self.submit_query(sql_query)
+        
+    def submit_query(self, sql_query, params=None):
+        """为SQL创建结果标签页并加入执行队列（多语句脚本按顺序执行，带参数的模板以预处理语句执行）"""
         if not sql_query:
             QMessageBox.warning(self, '警告', '请输入SQL查询语句')
             return
@@ -1182,59 +2322,432 @@ class AdvancedCSVSQLEditor(QMainWindow):
         self.query_history.append(f"[{timestamp}] {sql_query[:50]}...")
         self.update_history_display()
         
-        # 显示进度条
-        self.progress_bar.setVisible(True)
-        self.progress_bar.setValue(0)
+        # 每个查询一个结果标签页
+        tab = self.create_result_tab(sql_query)
+        tab.history_index = len(self.query_history) - 1
+        tab.params = params
+        
+        # 相同的查询且涉及的表没有变化时直接使用缓存的结果（带参数的查询结果随参数值变化，不缓存）
+        tab.cache_key = self.result_cache.make_key(self.catalog, sql_query) if params is None else None
+        if tab.cache_key is None:
+            # 可能修改数据的语句，清空缓存的结果
+            if not self.result_cache.is_read_only(self.catalog, sql_query):
+                self.result_cache.clear()
+        else:
+            cached_df = self.result_cache.get(tab.cache_key)
+            if cached_df is not None:
+                self.on_query_success(tab, QueryResult.from_dataframe(cached_df), from_cache=True)
+                return
         
-        # 禁用执行按钮
-        self.execute_btn.setEnabled(False)
-        self.execute_btn.setText('执行中...')
+        # 加入队列，有空闲时立即执行
+        self.pending_queries.append(tab)
+        self.start_pending_queries()
+        self.update_query_buttons()
+        
+    def create_result_tab(self, sql_query):
+        """为查询创建结果标签页并切换过去"""
+        self.query_count += 1
+        tab = ResultTab(sql_query, f'查询 {self.query_count}')
+        self.enable_copy(tab.table)
+        # 大结果滚动到底部时继续取回下一页
+        tab.table.verticalScrollBar().valueChanged.connect(
+            lambda value, tab=tab: self.on_result_scrolled(tab, value)
+        )
+        index = self.result_tabs.addTab(tab, f'⏳ {tab.title}')
+        self.result_tabs.setTabToolTip(index, sql_query)
+        self.result_tabs.setCurrentIndex(index)
+        self.tab_widget.setCurrentIndex(1)  # 切换到结果标签页
+        return tab
+        
+    def running_query_tabs(self):
+        """正在执行查询的结果标签页"""
+        tabs = [self.result_tabs.widget(i) for i in range(self.result_tabs.count())]
+        tabs += getattr(self, 'closing_tabs', [])
+        return [tab for tab in tabs if tab.is_running()]
+        
+    def start_pending_queries(self):
+        """在并发数上限内启动排队的查询，每个查询使用独立的游标"""
+        while self.pending_queries and len(self.running_query_tabs()) < self.MAX_CONCURRENT_QUERIES:
+            tab = self.pending_queries.pop(0)
+            timeout = self.timeout_spin.value() or None
+            if tab.params is not None or self.query_session.uses_session(tab.sql_query):
+                # 脚本、修改数据的语句、引用会话临时表的查询和预处理语句在会话游标上依次执行
+                tab.thread = SQLQueryThread(
+                    tab.sql_query, timeout=timeout, session=self.query_session, params=tab.params
+                )
+            else:
+                tab.thread = SQLQueryThread(tab.sql_query, self.catalog.cursor(), timeout=timeout)
+            tab.thread.result_ready.connect(lambda result, tab=tab: self.on_query_success(tab, result))
+            tab.thread.error_occurred.connect(lambda error_msg, tab=tab: self.on_query_error(tab, error_msg))
+            tab.thread.query_cancelled.connect(lambda reason, tab=tab: self.on_query_cancelled(tab, reason))
+            tab.thread.progress_detail.connect(
+                lambda percent, elapsed, remaining, tab=tab: self.on_query_progress(tab, percent, elapsed, remaining)
+            )
+            tab.set_running()
+            self.set_result_tab_title(tab, '⏳')
+            tab.thread.start()
+        
+    def current_result_tab(self):
+        return self.result_tabs.currentWidget()
+        
+    def set_result_tab_title(self, tab, icon):
+        index = self.result_tabs.indexOf(tab)
+        if index >= 0:
+            self.result_tabs.setTabText(index, f'{icon} {tab.title}')
+        
+    def update_query_buttons(self):
+        """根据当前结果标签页的状态更新停止和导出按钮"""
+        tab = self.current_result_tab()
+        self.stop_query_btn.setEnabled(tab is not None and (tab.is_running() or tab in self.pending_queries))
+        self.export_btn.setEnabled(tab is not None and tab.result is not None)
+        
+    def on_result_tab_changed(self, index):
+        """切换结果标签页时，图表和导出使用该标签页的结果"""
+        self.update_query_buttons()
+        tab = self.current_result_tab()
+        if tab is not None and tab.result is not None:
+            self.set_chart_result(tab.result)
+        
+    def set_chart_result(self, result):
+        """图表使用查询结果（切换到图表页时再取数据）"""
+        self.chart_result = result
+        self.chart_pending = True
+        if self.tab_widget.currentWidget() is self.chart_widget:
+            self.on_tab_changed(self.tab_widget.currentIndex())
+        
+    def close_result_tab(self, index):
+        """关闭结果标签页，停止其中的查询并释放结果"""
+        tab = self.result_tabs.widget(index)
+        self.result_tabs.removeTab(index)
+        if tab in self.pending_queries:
+            self.pending_queries.remove(tab)
+        if self.chart_result is not None and self.chart_result is tab.result:
+            self.chart_result = None
+        tab.release()
+        if tab.is_running():
+            # 等查询线程结束后再销毁
+            if not hasattr(self, 'closing_tabs'):
+                self.closing_tabs = []
+            self.closing_tabs.append(tab)
+            tab.thread.cancel()
+        else:
+            tab.deleteLater()
+        self.update_query_buttons()
+        
+    def finish_query(self, tab):
+        """查询结束后启动排队的查询，清理已关闭的标签页"""
+        if tab.thread is not None and tab.thread.session is not None and \
+                not self.result_cache.is_read_only(self.catalog, tab.sql_query):
+            self.mark_tables_modified(tab.sql_query)
+        if tab.closed:
+            if tab.result is not None:
+                tab.result.close()
+            if tab in getattr(self, 'closing_tabs', []):
+                self.closing_tabs.remove(tab)
+            tab.deleteLater()
+        self.start_pending_queries()
+        self.update_query_buttons()
+        
+    def stop_query(self):
+        """停止当前结果标签页中的查询（排队中的查询直接取消）"""
+        tab = self.current_result_tab()
+        if tab is None:
+            return
+        self.stop_query_btn.setEnabled(False)
+        if tab in self.pending_queries:
+            self.pending_queries.remove(tab)
+            self.on_query_cancelled(tab, '已取消')
+            return
+        if tab.is_running():
+            self.statusBar().showMessage('正在停止查询...')
+            tab.thread.cancel()
+        
+    def on_query_progress(self, tab, percent, elapsed, remaining):
+        """显示查询进度、已用时间和预计剩余时间"""
+        tab.set_progress(percent, elapsed, remaining)
+        if tab is self.current_result_tab():
+            self.statusBar().showMessage(f'{tab.title}: {tab.info_label.text()}')
+        
+    def selected_query(self, purpose):
+        """选中的SQL、单条语句或光标所在的语句，不是单条查询语句（SELECT）时提示并返回None"""
+        if not self.tables:
+            QMessageBox.warning(self, '警告', '请先加载数据文件')
+            return None
+            
+        text_cursor = self.sql_editor.textCursor()
+        sql_text = self.sql_editor.toPlainText()
+        if text_cursor.hasSelection():
+            sql_query = text_cursor.selectedText().replace('\u2029', '\n').strip()
+        elif len(statement_spans(sql_text)) > 1:
+            sql_query = statement_at(sql_text, text_cursor.position())
+        else:
+            sql_query = sql_text.strip()
+        if not sql_query:
+            QMessageBox.warning(self, '警告', '请输入SQL查询语句')
+            return None
+            
+        try:
+            statement_types = self.catalog.statement_types(sql_query)
+        except Exception as e:
+            QMessageBox.critical(self, 'SQL查询错误', f'SQL解析失败:\n{str(e)}')
+            return None
+        if statement_types != ['SELECT']:
+            QMessageBox.warning(self, '警告', f'{purpose}只支持单条查询语句（SELECT）')
+            return None
+        return sql_query
+        
+    def profile_query(self):
+        """开启性能分析执行查询（选中的SQL、单条语句或光标所在的语句）"""
+        # 只分析查询，避免性能分析时修改数据
+        sql_query = self.selected_query('性能分析')
+        if sql_query is None:
+            return
+            
+        if self.query_session.uses_session(sql_query):
+            # 引用了会话临时表
+            self.profile_thread = QueryProfileThread(sql_query, session=self.query_session)
+        else:
+            self.profile_thread = QueryProfileThread(sql_query, self.catalog.cursor())
+        self.profile_thread.profile_ready.connect(self.on_profile_ready)
+        self.profile_thread.error_occurred.connect(self.on_profile_error)
+        self.profile_btn.setEnabled(False)
+        self.statusBar().showMessage('正在进行性能分析...')
+        self.profile_thread.start()
+        
+    def on_profile_ready(self, profile):
+        """显示性能分析结果"""
+        self.profile_btn.setEnabled(True)
+        self.profile_widget.show_profile(profile)
+        self.tab_widget.setCurrentWidget(self.profile_widget)
+        self.statusBar().showMessage(f"性能分析完成，总耗时 {profile['plan'].get('latency', 0):.3f} 秒")
+        
+    def on_profile_error(self, error_msg):
+        self.profile_btn.setEnabled(True)
+        QMessageBox.critical(self, '性能分析失败', f'性能分析失败:\n{error_msg}')
+        self.statusBar().showMessage('性能分析失败')
+        
+    def save_materialized_view(self):
+        """把查询（选中的SQL、单条语句或光标所在的语句）保存为物化表"""
+        sql_query = self.selected_query('物化表')
+        if sql_query is None:
+            return
+        if self.query_session.uses_session(sql_query):
+            QMessageBox.warning(self, '警告', '物化表不能引用会话中的临时表')
+            return
+        if self.materialize_thread is not None and self.materialize_thread.isRunning():
+            QMessageBox.warning(self, '警告', '正在刷新物化表，请稍后再试')
+            return
+            
+        from PyQt5.QtWidgets import QInputDialog
+        import re
+        table_name, ok = QInputDialog.getText(
+            self, '保存为物化表', 
+            '请为物化表指定一个名称（仅使用字母、数字和下划线）：\n源表变化时自动刷新，只追加了行时增量刷新',
+            text=f'mv_{len(self.tables) + 1}'
+        )
+        if not ok or not table_name:
+            return
+        if not re.match(r'^[a-zA-Z0-9_]+$', table_name):
+            QMessageBox.warning(self, '警告', '表名只能包含字母、数字和下划线')
+            return
+        kind = self.catalog.table_info.get(table_name, {}).get('kind')
+        if kind is not None and kind != 'materialized':
+            QMessageBox.warning(self, '警告', f'表 "{table_name}" 已存在且不是物化表，请使用其他表名')
+            return
+        if kind == 'materialized' and QMessageBox.question(
+            self, '确认覆盖', 
+            f'物化表 "{table_name}" 已存在，是否替换其定义？',
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+        ) != QMessageBox.Yes:
+            return
+            
+        self.start_materialize_thread(
+            MaterializeThread(self.catalog, [table_name], create_sql=sql_query, manual=True)
+        )
+        self.statusBar().showMessage(f'正在创建物化表 {table_name}...')
+        
+    def refresh_materialized_views(self, table_names=None, manual=False, force=False):
+        """刷新源表有变化的物化表（force 时完整重算），正在刷新时等本轮结束后再检查"""
+        if self.materialize_thread is not None and self.materialize_thread.isRunning():
+            if manual:
+                QMessageBox.warning(self, '警告', '正在刷新物化表，请稍后再试')
+            else:
+                self.materialize_pending = True
+            return
+        if not any(info.get('kind') == 'materialized' for info in self.catalog.table_info.values()):
+            return
+        self.start_materialize_thread(
+            MaterializeThread(self.catalog, table_names, force=force, manual=manual)
+        )
+        
+    def start_materialize_thread(self, thread):
+        self.materialize_pending = False
+        self.materialize_thread = thread
+        thread.view_refreshed.connect(self.on_view_refreshed)
+        thread.error_occurred.connect(self.on_materialize_error)
+        thread.finished.connect(self.on_materialize_finished)
+        thread.start()
         
-        # 创建查询线程
-        self.query_thread = SQLQueryThread(sql_query, self.tables)
-        self.query_thread.result_ready.connect(self.on_query_success)
-        self.query_thread.error_occurred.connect(self.on_query_error)
-        self.query_thread.progress_updated.connect(self.progress_bar.setValue)
-        self.query_thread.start()
+    def on_view_refreshed(self, table_name, mode, row_count, elapsed):
+        """物化表已创建或刷新"""
+        if table_name not in self.tables:
+            self.tables[table_name] = None
+            self.on_table_added(table_name)
+            self.execute_btn.setEnabled(True)
+        else:
+            # 已生成的DataFrame不再是最新数据，改为按需从数据目录生成
+            self.tables[table_name] = None
+            if self.table_name == table_name:
+                self.df = None
+                self.display_original_data()
+                self.update_chart_source()
+            self.update_tables_list()
+        mode_text = {
+            'create': f'已创建，共 {row_count} 行',
+            'append': f'增量追加了 {row_count} 行源数据的结果',
+            'merge': f'增量合并了 {row_count} 行源数据的结果',
+            'full': f'已完整重算，共 {row_count} 行',
+        }[mode]
+        self.statusBar().showMessage(f'物化表 {table_name} {mode_text}，耗时 {elapsed:.2f} 秒')
+        
+    def on_materialize_error(self, table_name, error_msg):
+        if self.materialize_thread.manual:
+            QMessageBox.warning(self, '警告', f'物化表 "{table_name}" 创建或刷新失败:\n{error_msg}')
+        else:
+            self.statusBar().showMessage(f'物化表 {table_name} 自动刷新失败: {error_msg}')
+        
+    def on_materialize_finished(self):
+        """刷新期间源表又有变化时再检查一次"""
+        if self.materialize_pending:
+            self.refresh_materialized_views()
+        
+    def mark_tables_modified(self, sql_query):
+        """通过SQL修改了数据，SQL中出现的表都视为已变化（递增版本号），并刷新引用它们的物化表
+
+        已生成的DataFrame不再准确，改为按需从数据目录生成；通过SQL创建或删除的表同步到表列表。
+        """
+        words = set()
+        for token in SQL_TOKEN.findall(sql_query):
+            if not token.startswith(("'", '--', '/*')):
+                words.update(part.strip('"').lower() for part in token.split('.'))
+        modified = [table_name for table_name in self.catalog.table_info if table_name.lower() in words]
+        if modified:
+            self.catalog.bump_version(*modified)
+            for table_name in modified:
+                if table_name in self.tables:
+                    self.tables[table_name] = None
+        
+        try:
+            added, removed = self.catalog.sync_tables()
+        except Exception as e:
+            added, removed = [], []
+            self.statusBar().showMessage(f'同步表列表失败: {e}')
+        for table_name in added:
+            self.tables[table_name] = None
+        for table_name in removed:
+            self.follow_thread.remove(table_name)
+            self.tables.pop(table_name, None)
+        
+        if self.table_name not in self.tables:
+            # 当前表已被删除，改为第一个表
+            self.table_name = next(iter(self.tables), 'data_table')
+            self.df = None
+            if self.tables:
+                self.display_original_data()
+            else:
+                self.original_table.setRowCount(0)
+                self.original_table.setColumnCount(0)
+            self.update_chart_source()
+        elif self.table_name in modified:
+            self.df = None
+            self.display_original_data()
+            self.update_chart_source()
+        if modified or added or removed:
+            self.update_tables_list()
+            self.execute_btn.setEnabled(len(self.tables) > 0)
+        if modified or added:
+            self.refresh_materialized_views()
         
     def update_history_display(self):
         """更新查询历史显示"""
         history_text = '\n'.join(self.query_history[-10:])  # 只显示最近10条
         self.history_list.setText(history_text)
         
-    def on_query_success(self, result_df):
-        """查询成功回调"""
-        self.populate_table(self.result_table, result_df)
-        self.tab_widget.setCurrentIndex(1)  # 切换到结果标签页
+    def on_query_success(self, tab, result, from_cache=False):
+        """查询成功回调（大结果保存在查询游标中，按需分页取回）"""
+        # 查询期间涉及的表没有变化时缓存结果（只缓存已完整取回的结果）
+        if not from_cache and tab.cache_key is not None and not result.is_paged and \
+                self.result_cache.make_key(self.catalog, tab.sql_query) == tab.cache_key:
+            self.result_cache.put(tab.cache_key, result.df)
+        
+        elapsed = None if from_cache else tab.thread.elapsed
+        if not from_cache and tab.thread.session is not None:
+            statement_stats = tab.thread.statement_stats
+            if result is None:
+                # 脚本中没有返回结果的语句，显示各语句的执行情况
+                result = QueryResult.from_dataframe(pd.DataFrame([
+                    {'语句': stats['sql'], '类型': stats['type'],
+                     '耗时(秒)': round(stats['elapsed'], 3), '行数': stats['rows']}
+                    for stats in statement_stats
+                ]))
+            else:
+                tab.set_statements(statement_stats)
+        tab.set_finished(result, elapsed)
+        if tab.closed:
+            self.finish_query(tab)
+            return
+        self.set_result_tab_title(tab, '✅')
         
-        # 更新图表组件数据
-        self.chart_widget.update_data(result_df)
+        first_page = result.page(0, self.display_limit_spin.value())
+        tab.rows_loaded = len(first_page)
+        self.populate_table(tab.table, first_page, total_rows=result.row_count)
         
-        # 保存结果用于导出
-        self.query_result = result_df
-        self.export_btn.setEnabled(True)
+        self.finish_query(tab)
+        if tab is not self.current_result_tab():
+            return
         
-        # 更新状态
-        self.execute_btn.setEnabled(True)
-        self.execute_btn.setText('▶️ 执行查询')
-        self.statusBar().showMessage(f'查询完成，返回 {len(result_df)} 行 × {len(result_df.columns)} 列结果')
+        # 更新图表组件数据
+        self.set_chart_result(result)
         
-        # 隐藏进度条
-        QTimer.singleShot(1000, lambda: self.progress_bar.setVisible(False))
+        # 更新状态
+        note = ''
+        if from_cache:
+            stats = self.result_cache.stats()
+            note = f"（来自结果缓存，命中率 {stats['hit_rate'] * 100:.0f}%: {stats['hits']} 命中 / {stats['misses']} 未命中）"
+        else:
+            note = f'，耗时 {elapsed:.2f} 秒'
+        if result.is_paged:
+            note += f'（滚动到底部继续加载，图表使用前 {min(result.row_count, self.CHART_MAX_ROWS)} 行）'
+        self.statusBar().showMessage(f'{tab.title} 完成，返回 {result.row_count} 行 × {len(result.columns)} 列结果{note}')
         
-    def on_query_error(self, error_msg):
+    def on_query_error(self, tab, error_msg):
         """查询错误回调"""
-        QMessageBox.critical(self, 'SQL查询错误', f'查询执行失败:\n{error_msg}')
-        
-        # 恢复按钮状态
-        self.execute_btn.setEnabled(True)
-        self.execute_btn.setText('▶️ 执行查询')
-        self.statusBar().showMessage('查询失败')
-        self.progress_bar.setVisible(False)
+        tab.set_failed('查询失败')
+        tab.set_statements(tab.thread.statement_stats)  # 脚本中已执行的语句
+        self.set_result_tab_title(tab, '❌')
+        self.finish_query(tab)
+        if tab.closed:
+            return
+        QMessageBox.critical(self, 'SQL查询错误', f'{tab.title} 执行失败:\n{error_msg}')
+        self.statusBar().showMessage(f'{tab.title} 失败')
+        
+    def on_query_cancelled(self, tab, reason):
+        """查询被停止或超时，在查询历史中标记"""
+        index = tab.history_index
+        if index is not None and index < len(self.query_history):
+            timestamp, _, sql_text = self.query_history[index].partition('] ')
+            self.query_history[index] = f'{timestamp}] [{reason}] {sql_text}'
+            self.update_history_display()
+        
+        tab.set_failed(f'查询{reason}')
+        self.set_result_tab_title(tab, '⏹')
+        self.finish_query(tab)
+        if not tab.closed:
+            self.statusBar().showMessage(f'{tab.title} {reason}，数据目录未受影响')
         
     def generate_analysis(self):
         """生成数据分析报告"""
-        if self.df is None:
+        if self.current_df() is None:
             QMessageBox.warning(self, '警告', '请先加载数据文件')
             return
             
@@ -1300,16 +2813,18 @@ class AdvancedCSVSQLEditor(QMainWindow):
                 analysis += f"  • 可以进行分组统计和交叉分析\n"
                 
             self.analysis_text.setText(analysis)
-            self.tab_widget.setCurrentIndex(3)  # 切换到分析标签页
+            self.tab_widget.setCurrentIndex(4)  # 切换到分析标签页
             
         except Exception as e:
             QMessageBox.critical(self, '错误', f'生成分析报告失败:\n{str(e)}')
         
     def export_results(self):
         """导出查询结果"""
-        if not hasattr(self, 'query_result') or self.query_result is None:
+        tab = self.current_result_tab()
+        if tab is None or tab.result is None:
             QMessageBox.warning(self, '警告', '没有可导出的查询结果')
             return
+        result = tab.result
             
         file_path, _ = QFileDialog.getSaveFileName(
             self, '保存查询结果', '', 
@@ -1319,9 +2834,16 @@ class AdvancedCSVSQLEditor(QMainWindow):
         if file_path:
             try:
                 if file_path.lower().endswith('.csv'):
-                    self.query_result.to_csv(file_path, index=False, encoding='utf-8-sig')
+                    # 分批写出，大结果不会整体载入内存
+                    result.export_csv(file_path)
                 elif file_path.lower().endswith('.xlsx'):
-                    self.query_result.to_excel(file_path, index=False)
+                    if result.row_count > self.EXCEL_MAX_ROWS:
+                        QMessageBox.warning(
+                            self, '警告', 
+                            f'Excel工作表最多容纳 {self.EXCEL_MAX_ROWS} 行，只导出前 {self.EXCEL_MAX_ROWS} 行，'
+                            f'完整结果请导出为CSV'
+                        )
+                    result.to_df(limit=self.EXCEL_MAX_ROWS).to_excel(file_path, index=False)
                     
                 QMessageBox.information(self, '成功', f'结果已导出到:\n{file_path}')
                 
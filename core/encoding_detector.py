@@ -0,0 +1,95 @@
+import codecs
+import os
+
+from compressed_input import compression_of, open_input
+
+# 常见的BOM标记，UTF-32需在UTF-16之前判断（UTF-32 LE的BOM以UTF-16 LE的BOM开头）
+BOM_ENCODINGS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# 可供用户手动指定的编码
+SUPPORTED_ENCODINGS = ['utf-8', 'utf-8-sig', 'gb18030', 'gbk', 'big5', 'utf-16', 'latin1']
+
+# DuckDB CSV读取器内置支持的编码（其余编码需要encodings扩展）
+DUCKDB_ENCODINGS = {
+    'utf-8': 'utf-8',
+    'utf-8-sig': 'utf-8',
+    'utf-16': 'utf-16',
+    'latin1': 'latin-1',
+}
+
+
+def _decodes(data, encoding):
+    """判断字节片段能否按指定编码解码（允许末尾被截断的多字节字符）"""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    try:
+        decoder.decode(data, final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def _decodes_from_middle(data, encoding):
+    """判断从文件中间截取的字节片段能否解码：片段开头可能落在多字节字符内部，依次尝试跳过前几个字节"""
+    if encoding == 'utf-8':
+        # 跳过开头不完整的UTF-8续字节
+        return _decodes(data.lstrip(bytes(range(0x80, 0xC0))), encoding)
+    # GB18030 字符最长4个字节
+    return any(_decodes(data[skip:], encoding) for skip in range(4))
+
+
+def _read_samples(file_path, sample_size, sample_count):
+    """一次性读取文件开头、中间和结尾的若干字节样本（除开头外的样本未对齐到字符边界）"""
+    if compression_of(file_path) is not None:
+        # 压缩文件无法随机读取，只解压开头的样本
+        with open_input(file_path) as f:
+            return [f.read(sample_size)]
+    file_size = os.path.getsize(file_path)
+    samples = []
+    with open(file_path, 'rb') as f:
+        samples.append(f.read(sample_size))
+        if file_size > sample_size * sample_count:
+            step = file_size // sample_count
+            offsets = [i * step for i in range(1, sample_count - 1)] + [file_size - sample_size]
+            for offset in offsets:
+                f.seek(offset)
+                samples.append(f.read(sample_size))
+    return samples
+
+
+def _sample_decodes(samples, encoding):
+    """开头、中间和结尾的样本是否都能按指定编码解码"""
+    head, rest = samples[0], samples[1:]
+    return _decodes(head, encoding) and all(_decodes_from_middle(sample, encoding) for sample in rest)
+
+
+def detect_encoding(file_path, sample_size=256 * 1024, sample_count=4):
+    """采样文件字节判断编码，整个文件只需按结果读取一次"""
+    samples = _read_samples(file_path, sample_size, sample_count)
+    head = samples[0]
+
+    # BOM标记
+    for bom, encoding in BOM_ENCODINGS:
+        if head.startswith(bom):
+            return encoding
+
+    # UTF-8（纯ASCII也视为UTF-8）
+    if _sample_decodes(samples, 'utf-8'):
+        return 'utf-8'
+
+    # GB18030 是 GBK/GB2312 的超集
+    if _sample_decodes(samples, 'gb18030'):
+        return 'gb18030'
+
+    # latin1 可以解码任意字节
+    return 'latin1'
+
+
+def duckdb_encoding(encoding):
+    """将Python编码名转换为DuckDB read_csv的encoding参数，不支持时返回原名"""
+    return DUCKDB_ENCODINGS.get(encoding, encoding)
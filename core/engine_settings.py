@@ -0,0 +1,79 @@
+import json
+import os
+
+import duckdb
+
+from duckdb_catalog import quote_literal
+
+
+class EngineSettings:
+    """数据库引擎资源设置：内存上限、工作线程数、溢写目录，按用户保存在 ~/.sql4csv/settings.json
+
+    这些都是DuckDB数据库级别的设置，在连接上设置后对该数据库的所有游标生效；
+    查询超过内存上限时，中间结果会写入溢写目录而不是耗尽内存。
+    """
+
+    DEFAULT_SETTINGS_FILE = os.path.join(os.path.expanduser('~'), '.sql4csv', 'settings.json')
+    DEFAULT_TEMP_DIR = os.path.join(os.path.expanduser('~'), '.sql4csv', 'spill')
+    DEFAULTS = {
+        'memory_limit_gb': 0,  # 0 表示使用DuckDB默认值（物理内存的80%）
+        'threads': 0,  # 0 表示使用DuckDB默认值（CPU核数）
+        'temp_directory': DEFAULT_TEMP_DIR,
+    }
+
+    def __init__(self, settings_file=None):
+        self.settings_file = settings_file or self.DEFAULT_SETTINGS_FILE
+        self.values = self.load()
+
+    def load(self):
+        """读取设置，缺少的项使用默认值"""
+        values = dict(self.DEFAULTS)
+        try:
+            with open(self.settings_file, 'r', encoding='utf-8') as f:
+                values.update(json.load(f).get('engine', {}))
+        except (OSError, ValueError):
+            pass
+        return values
+
+    def save(self):
+        """保存设置（保留文件中其他部分的设置）"""
+        try:
+            with open(self.settings_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        data['engine'] = self.values
+        os.makedirs(os.path.dirname(self.settings_file), exist_ok=True)
+        tmp_file = self.settings_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.settings_file)
+
+    def apply(self, conn):
+        """在连接上应用设置（内存上限、线程数为0时恢复DuckDB默认值，溢写目录为空时保持不变）
+
+        返回需要重新打开数据库才能生效的设置名列表（溢写目录使用后不能再切换）。
+        """
+        memory_limit_gb = self.values.get('memory_limit_gb') or 0
+        if memory_limit_gb > 0:
+            conn.execute(f"SET memory_limit = '{memory_limit_gb:g}GB'")
+        else:
+            conn.execute('RESET memory_limit')
+
+        threads = int(self.values.get('threads') or 0)
+        if threads > 0:
+            conn.execute(f'SET threads = {threads}')
+        else:
+            conn.execute('RESET threads')
+
+        pending = []
+        temp_directory = self.values.get('temp_directory')
+        current = conn.execute("SELECT current_setting('temp_directory')").fetchone()[0]
+        if temp_directory and temp_directory != current:
+            os.makedirs(temp_directory, exist_ok=True)
+            try:
+                conn.execute(f'SET temp_directory = {quote_literal(temp_directory)}')
+            except duckdb.NotImplementedException:
+                # 已经有数据溢写到原目录
+                pending.append('temp_directory')
+        return pending
@@ -0,0 +1,39 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from file_loader import LoadCancelled
+
+
+class FileLoadThread(QThread):
+    """文件加载线程，避免界面卡顿"""
+    load_finished = pyqtSignal(object)
+    load_cancelled = pyqtSignal()
+    error_occurred = pyqtSignal(str)
+    progress_updated = pyqtSignal(int)
+    bytes_updated = pyqtSignal(object, object)  # 已读取字节数, 总字节数
+    
+    def __init__(self, loader):
+        super().__init__()
+        self.loader = loader
+        self.loader.progress_callback = self.report_progress
+        self.last_percent = -1
+    
+    def report_progress(self, bytes_read, total_bytes):
+        percent = int(bytes_read * 100 / total_bytes) if total_bytes else 100
+        # 只在百分比变化时发送信号，避免刷屏
+        if percent != self.last_percent:
+            self.last_percent = percent
+            self.progress_updated.emit(percent)
+            self.bytes_updated.emit(bytes_read, total_bytes)
+    
+    def cancel(self):
+        """取消加载"""
+        self.loader.cancel()
+    
+    def run(self):
+        try:
+            result = self.loader.load()
+            self.load_finished.emit(result)
+        except LoadCancelled:
+            self.load_cancelled.emit()
+        except Exception as e:
+            self.error_occurred.emit(str(e))
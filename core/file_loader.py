@@ -0,0 +1,579 @@
+import importlib.util
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from compressed_input import DUCKDB_COMPRESSIONS, compression_of, decompressed, is_csv_file
+from encoding_detector import detect_encoding, duckdb_encoding
+
+# 可选依赖，用于Arrow字符串列（只检查是否安装，由pandas按需加载）
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+
+class LoadCancelled(Exception):
+    """文件加载被用户取消"""
+
+
+class ProgressReader(io.RawIOBase):
+    """统计已读取字节数的文件包装器，用于按字节报告加载进度"""
+
+    def __init__(self, raw, on_read, limit=None):
+        super().__init__()
+        self.raw = raw
+        self.on_read = on_read
+        self.remaining = limit  # 最多读取的字节数，None表示读到文件末尾
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.remaining is not None:
+            buffer = memoryview(buffer)[:self.remaining]
+        size = self.raw.readinto(buffer)
+        if size and self.remaining is not None:
+            self.remaining -= size
+        if size:
+            self.on_read(size)
+        return size
+
+    def seekable(self):
+        return self.raw.seekable()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        # zip压缩包需要先读取文件末尾的目录
+        return self.raw.seek(offset, whence)
+
+    def tell(self):
+        return self.raw.tell()
+
+    def close(self):
+        self.raw.close()
+        super().close()
+
+
+def clean_data(df, clean=True, compact_types=False):
+    """数据清理"""
+    if df is not None:
+        if clean:
+            # 删除完全空白的行
+            df = df.dropna(how='all')
+            
+            # 清理列名（去除前后空格）
+            df.columns = df.columns.str.strip()
+            
+            # 重置索引
+            df = df.reset_index(drop=True)
+        
+        # 压缩列类型以节省内存
+        if compact_types:
+            df = compact_dtypes(df)
+            
+    return df
+
+
+def compact_dtypes(df, category_ratio=0.5):
+    """压缩列类型：低基数字符串转为分类类型，数值向下转换，其余字符串使用Arrow存储
+
+    压缩前的内存占用记录在 df.attrs['memory_before'] 中。
+    """
+    memory_before = int(df.memory_usage(deep=True).sum())
+    df = df.copy()
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series):
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            df[col] = pd.to_numeric(series, downcast='integer')
+        elif pd.api.types.is_float_dtype(series):
+            # 只在不损失精度时转为float32
+            downcast = series.astype('float32')
+            if np.array_equal(downcast.to_numpy(dtype='float64'), series.to_numpy(dtype='float64'), equal_nan=True):
+                df[col] = downcast
+        elif series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) == 'string':
+            if len(series) and series.nunique(dropna=True) <= len(series) * category_ratio:
+                df[col] = series.astype('category')
+            elif HAS_PYARROW:
+                df[col] = series.astype('string[pyarrow]')
+    df.attrs['memory_before'] = memory_before
+    return df
+
+
+def compare_schemas(schemas):
+    """比较各文件的列结构，返回与第一个文件不一致之处的说明列表
+
+    schemas: [(文件路径, [(列名, 类型), ...]), ...]
+    """
+    base_path, base_columns = schemas[0]
+    base = dict(base_columns)
+    messages = []
+    for file_path, columns in schemas[1:]:
+        current = dict(columns)
+        file_name = os.path.basename(file_path)
+        missing = [col for col in base if col not in current]
+        extra = [col for col in current if col not in base]
+        changed = [
+            f'{col}({base[col]}→{current[col]})'
+            for col in base if col in current and str(base[col]) != str(current[col])
+        ]
+        if missing:
+            messages.append(f'{file_name}: 缺少列 {", ".join(missing)}')
+        if extra:
+            messages.append(f'{file_name}: 多出列 {", ".join(extra)}')
+        if changed:
+            messages.append(f'{file_name}: 类型不同 {", ".join(changed)}')
+    return messages
+
+
+class FileLoader:
+    """将文件导入数据目录（不依赖Qt，可在工作线程中运行）"""
+
+    CHUNK_ROWS = 100000  # pandas分块读取的行数，分块之间响应取消
+    POLL_INTERVAL = 0.1  # 原生导入时轮询DuckDB进度的间隔（秒）
+    ESTIMATE_BYTES = 1024 * 1024  # 估算总行数时读取的样本大小
+
+    # 抽样方式 {方式: 说明}
+    SAMPLE_METHODS = {
+        'head': '前N行',
+        'reservoir': '水库抽样',
+        'bernoulli': '伯努利抽样',
+    }
+
+    def __init__(self, catalog, file_path, table_name, native=False, clean=True,
+                 encoding=None, progress_callback=None, cache=None, compact_types=False,
+                 sample=None):
+        self.catalog = catalog
+        self.file_path = file_path
+        self.table_name = table_name
+        self.native = native
+        self.clean = clean
+        self.compact_types = compact_types  # 压缩pandas数据的列类型
+        self.encoding = encoding  # None表示自动检测
+        self.progress_callback = progress_callback
+        self.cache = cache  # IngestCache，为None时不使用导入缓存
+        # 抽样导入 {'method': 'head'|'reservoir'|'bernoulli', 'rows': 行数}，None表示完整导入
+        self.sample = sample
+        self.total_bytes = os.path.getsize(file_path)
+        self.follow_end = None  # 跟踪模式：本次只导入到该字节位置（开始加载时的文件大小）
+        self.bytes_read = 0
+        self.cursor = None
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        """取消加载：停止解析，中断正在执行的DuckDB语句"""
+        self.cancelled.set()
+        cursor = self.cursor
+        if cursor is not None:
+            cursor.interrupt()
+
+    def check_cancelled(self):
+        if self.cancelled.is_set():
+            raise LoadCancelled()
+
+    def report_progress(self, bytes_read):
+        self.bytes_read = min(bytes_read, self.total_bytes)
+        if self.progress_callback is not None:
+            self.progress_callback(self.bytes_read, self.total_bytes)
+
+    def on_bytes_read(self, size):
+        self.report_progress(self.bytes_read + size)
+        self.check_cancelled()
+
+    def load(self):
+        """执行加载，返回加载结果；取消时抛出LoadCancelled，数据目录中的已有表保持不变"""
+        result = {
+            'table_name': self.table_name,
+            'file_path': self.file_path,
+            'df': None,
+            'encoding': None,
+            'encoding_detected': False,
+            'schema_drift': [],
+            'from_cache': False,
+        }
+        df = None
+        
+        try:
+            self.cursor = self.catalog.cursor()
+            if self.followable():
+                self.follow_end = self.total_bytes
+            
+            # 源文件未变化时直接从列式快照导入
+            cache_key = None
+            if self.cache is not None:
+                cache_key = self.cache.make_key(self.source_paths(), self.cache_options())
+                if self.load_from_cache(cache_key, result):
+                    cache_key = None
+                else:
+                    df = self.read(result)
+            else:
+                df = self.read(result)
+            
+            if df is not None:
+                # 数据清理
+                df = clean_data(df, clean=self.clean, compact_types=self.compact_types)
+                self.check_cancelled()
+                
+                # 写入数据目录（只导入这一张表）
+                self.catalog.register_dataframe(self.table_name, df, cursor=self.cursor,
+                                                source=self.source())
+            
+            if cache_key is not None:
+                self.save_to_cache(cache_key, result)
+            
+            with self.catalog.lock:
+                # 记录抽样方式，表列表中标记为抽样数据
+                if self.sample is not None:
+                    self.catalog.table_info[self.table_name]['sample'] = self.sample
+                
+                # 记录已导入到的字节位置，跟踪模式从这里开始追加新增行
+                if self.followable():
+                    self.catalog.table_info[self.table_name].update({
+                        'offset': self.follow_end,
+                        # 文件末尾未写完的行已作为最后一行导入，跟踪时从该行开头重新读取并替换
+                        'tail_start': self.last_line_end(),
+                        'encoding': result['encoding'],
+                        'clean': self.clean,
+                    })
+        except duckdb.Error:
+            self.check_cancelled()
+            raise
+        finally:
+            cursor, self.cursor = self.cursor, None
+            if cursor is not None:
+                cursor.close()
+        
+        self.report_progress(self.total_bytes)
+        result['df'] = df
+        return result
+
+    def source(self):
+        """记录到数据目录表信息中的来源"""
+        return self.file_path
+
+    def source_paths(self):
+        """参与缓存键计算的源文件列表"""
+        return [self.file_path]
+
+    def followable(self):
+        """导入的表能否跟踪源文件的新增行（只支持完整导入的单个CSV文件）"""
+        return self.sample is None and self.file_path.lower().endswith('.csv')
+
+    def last_line_end(self, block_size=64 * 1024):
+        """跟踪位置之前最后一个换行符之后的字节位置（文件以换行符结尾时等于跟踪位置）"""
+        with open(self.file_path, 'rb') as f:
+            end = self.follow_end
+            while end > 0:
+                start = max(0, end - block_size)
+                f.seek(start)
+                pos = f.read(end - start).rfind(b'\n')
+                if pos >= 0:
+                    return start + pos + 1
+                end = start
+        # 没有换行符（只有一行表头）时整个文件作为已导入部分
+        return self.follow_end
+
+    def native_overread(self):
+        """原生读取器总是读到文件末尾：加载期间文件有追加时，导入的行可能超出跟踪位置"""
+        return self.follow_end is not None and os.path.getsize(self.file_path) != self.follow_end
+
+    def cache_options(self):
+        """影响导入结果的选项，参与缓存键计算"""
+        return {
+            'native': self.native,
+            'clean': self.clean,
+            'compact_types': self.compact_types,
+            'encoding': self.encoding,
+            'sample': self.sample,
+        }
+
+    def load_from_cache(self, cache_key, result):
+        """命中缓存时从Parquet快照导入，返回是否命中"""
+        entry = self.cache.lookup(cache_key)
+        if entry is None:
+            return False
+        self.catalog.ingest_parquet(self.table_name, entry['path'], cursor=self.cursor,
+                                    source=self.source())
+        result['from_cache'] = True
+        result['encoding'] = entry.get('encoding')
+        result['encoding_detected'] = entry.get('encoding_detected', False)
+        result['schema_drift'] = entry.get('schema_drift', [])
+        return True
+
+    def save_to_cache(self, cache_key, result):
+        """将导入好的表写成压缩的Parquet快照（失败不影响本次加载）"""
+        # 表已经替换，此时取消只跳过写入快照，本次加载仍然完成
+        if self.cancelled.is_set():
+            return
+        try:
+            tmp_path = self.cache.snapshot_path(cache_key)
+        except OSError:
+            return
+        try:
+            self.catalog.export_parquet(self.table_name, tmp_path, cursor=self.cursor)
+            self.cache.add(cache_key, tmp_path, {
+                'source': self.source(),
+                'encoding': result['encoding'],
+                'encoding_detected': result['encoding_detected'],
+                'schema_drift': result['schema_drift'],
+            })
+        except (duckdb.Error, OSError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def read(self, result):
+        """读取文件：原生导入时直接写入数据目录并返回None，否则返回DataFrame"""
+        lower_path = self.file_path.lower()
+        
+        # 根据文件扩展名选择读取方法（压缩的CSV边读边解压）
+        if is_csv_file(self.file_path):
+            # 采样检测编码（或使用用户指定的编码），整个文件只读取一次
+            encoding = self.encoding
+            if not encoding:
+                encoding = detect_encoding(self.file_path)
+                result['encoding_detected'] = True
+            result['encoding'] = encoding
+            
+            if self.native and compression_of(self.file_path) in (None,) + DUCKDB_COMPRESSIONS:
+                try:
+                    self.load_csv_native(encoding, sample=self.native_sample(encoding))
+                    if not self.native_overread():
+                        return None
+                    # 无法确定原生读取器读到的位置，改用pandas只读取到跟踪位置（覆盖已导入的表）
+                    self.report_progress(0)
+                except duckdb.Error:
+                    self.check_cancelled()
+                    # 原生读取器不支持的编码，回退到pandas读取
+                    self.report_progress(0)
+            if self.sample is not None:
+                return self.read_csv_sample(encoding)
+            return self.read_csv_chunks(encoding)
+        elif lower_path.endswith(('.xlsx', '.xls')):
+            if self.sample is not None and self.sample['method'] == 'head':
+                return pd.read_excel(self.file_path, nrows=self.sample['rows'])
+            df = pd.read_excel(self.file_path)
+            if self.sample is not None and len(df) > self.sample['rows']:
+                df = df.sample(n=self.sample['rows']).sort_index().reset_index(drop=True)
+            return df
+        else:
+            raise Exception("不支持的文件格式")
+
+    def native_sample(self, encoding):
+        """原生导入使用的抽样参数（伯努利抽样按估算的总行数换算为百分比）"""
+        if self.sample is None or self.sample['method'] != 'bernoulli':
+            return self.sample
+        percent = min(100.0, self.sample['rows'] * 100.0 / max(self.estimate_rows(encoding), 1))
+        return dict(self.sample, percent=percent)
+
+    def estimate_rows(self, encoding):
+        """读取文件开头的样本，按每行平均（压缩）字节数估算总行数"""
+        compressed_read = []
+        with open(self.file_path, 'rb') as raw:
+            reader = io.BufferedReader(ProgressReader(raw, compressed_read.append))
+            with decompressed(reader, compression_of(self.file_path)) as stream:
+                data = stream.read(self.ESTIMATE_BYTES)
+        # 在解码后的文本中计数（编码换行符时utf-8-sig、utf-16会带上BOM而无法匹配）
+        lines = data.decode(encoding, errors='ignore').count('\n') or 1
+        return int(self.total_bytes * lines / max(sum(compressed_read), 1))
+
+    def read_csv_sample(self, encoding):
+        """单次流式读取CSV得到抽样数据：前N行读到即停止，随机抽样在分块之间维护样本"""
+        rows = self.sample['rows']
+        rng = np.random.default_rng()
+        sample = None
+        seen = 0  # 已读取的总行数
+        probability = None
+        try:
+            with self.open_csv(self.file_path) as reader:
+                if self.sample['method'] == 'head':
+                    return pd.read_csv(reader, encoding=encoding, nrows=rows)
+                if self.sample['method'] == 'bernoulli':
+                    probability = min(1.0, rows / max(self.estimate_rows(encoding), 1))
+                for chunk in pd.read_csv(reader, encoding=encoding, chunksize=self.CHUNK_ROWS):
+                    self.check_cancelled()
+                    if probability is not None:
+                        # 伯努利抽样：每行独立以相同概率保留
+                        picked = chunk[rng.random(len(chunk)) < probability]
+                        sample = picked if sample is None else pd.concat([sample, picked])
+                    else:
+                        sample = self.reservoir_update(sample, chunk, seen, rows, rng)
+                    seen += len(chunk)
+        except UnicodeDecodeError:
+            raise Exception(f"按 {encoding} 编码读取失败，请在工具栏“编码”中手动指定文件编码")
+        if sample is None:
+            # 只有表头的文件
+            return pd.read_csv(self.file_path, encoding=encoding)
+        return sample.sort_index().reset_index(drop=True)
+
+    @staticmethod
+    def reservoir_update(sample, chunk, seen, rows, rng):
+        """水库抽样（Algorithm R）处理一个分块：第t行以 rows/(t+1) 的概率替换样本中随机的一行"""
+        chunk = chunk.set_axis(np.arange(seen, seen + len(chunk)))  # 全局行号，便于最后按原顺序排列
+        fill = max(0, min(len(chunk), rows - seen))
+        if fill:
+            head = chunk.iloc[:fill]
+            sample = head if sample is None else pd.concat([sample, head])
+        rest = chunk.iloc[fill:]
+        if len(rest):
+            slots = rng.integers(0, rest.index.to_numpy() + 1)
+            accepted = slots < rows
+            # 同一分块内多行选中同一位置时，后面的行覆盖前面的行
+            winners = pd.Series(rest.index[accepted], index=slots[accepted])
+            winners = winners[~winners.index.duplicated(keep='last')]
+            kept = np.ones(len(sample), dtype=bool)
+            kept[winners.index.to_numpy()] = False
+            sample = pd.concat([sample[kept], rest.loc[winners.to_numpy()]])
+        return sample
+
+    def load_csv_native(self, encoding, file_path=None, filename_column=None, sample=None):
+        """使用DuckDB原生读取器导入，轮询查询进度换算为已读取字节数"""
+        done = threading.Event()
+        
+        def poll_progress():
+            while not done.wait(self.POLL_INTERVAL):
+                percent = self.cursor.query_progress()
+                if percent >= 0:
+                    self.report_progress(int(self.total_bytes * percent / 100))
+        
+        poller = threading.Thread(target=poll_progress, daemon=True)
+        poller.start()
+        try:
+            self.catalog.ingest_csv(
+                self.table_name, file_path or self.file_path, encoding=duckdb_encoding(encoding),
+                clean=self.clean, cursor=self.cursor, filename_column=filename_column,
+                sample=sample
+            )
+        finally:
+            done.set()
+            poller.join()
+
+    @contextmanager
+    def open_csv(self, file_path, limit=None):
+        """打开CSV文件，压缩文件边读边解压，按已读取的（压缩）字节数报告进度"""
+        with open(file_path, 'rb') as raw:
+            reader = io.BufferedReader(ProgressReader(raw, self.on_bytes_read, limit=limit))
+            with decompressed(reader, compression_of(file_path)) as stream:
+                yield stream
+
+    def read_csv_chunks(self, encoding):
+        """使用pandas分块读取CSV，按已读取字节报告进度"""
+        chunks = []
+        # 只读取开始加载时的文件大小，加载期间追加的行留给跟踪模式
+        limit = self.follow_end
+        try:
+            with self.open_csv(self.file_path, limit=limit) as reader:
+                for chunk in pd.read_csv(reader, encoding=encoding, chunksize=self.CHUNK_ROWS):
+                    self.check_cancelled()
+                    chunks.append(chunk)
+        except UnicodeDecodeError:
+            raise Exception(f"按 {encoding} 编码读取失败，请在工具栏“编码”中手动指定文件编码")
+        if not chunks:
+            # 只有表头的文件（只取列名，加载期间追加的行留给跟踪模式）
+            return pd.read_csv(self.file_path, encoding=encoding, nrows=0)
+        return pd.concat(chunks, ignore_index=True)
+
+
+class MultiFileLoader(FileLoader):
+    """将多个同结构文件并行导入为一张合并表，列结构不一致时报告差异而不是中断"""
+
+    SOURCE_COLUMN = 'source_file'  # 来源文件名列
+
+    def __init__(self, catalog, file_paths, table_name, native=False, clean=True,
+                 encoding=None, add_source_column=False, progress_callback=None, max_workers=None,
+                 cache=None, compact_types=False):
+        super().__init__(catalog, file_paths[0], table_name, native=native, clean=clean,
+                         encoding=encoding, progress_callback=progress_callback, cache=cache,
+                         compact_types=compact_types)
+        self.file_paths = list(file_paths)
+        self.add_source_column = add_source_column
+        self.max_workers = max_workers or os.cpu_count() or 4
+        self.total_bytes = sum(os.path.getsize(path) for path in self.file_paths)
+        self.progress_lock = threading.Lock()
+
+    def source(self):
+        return self.file_paths
+
+    def source_paths(self):
+        return self.file_paths
+
+    def followable(self):
+        return False
+
+    def cache_options(self):
+        options = super().cache_options()
+        options['add_source_column'] = self.add_source_column
+        return options
+
+    def on_bytes_read(self, size):
+        # 多个线程同时读取，累加字节数需要加锁
+        with self.progress_lock:
+            self.report_progress(self.bytes_read + size)
+        self.check_cancelled()
+
+    def load(self):
+        result = super().load()
+        result['file_paths'] = self.file_paths
+        return result
+
+    def read(self, result):
+        csv_paths = [path for path in self.file_paths if is_csv_file(path)]
+        encoding = self.encoding
+        if csv_paths:
+            if not encoding:
+                encoding = detect_encoding(csv_paths[0])
+                result['encoding_detected'] = True
+            result['encoding'] = encoding
+        
+        # 全部是DuckDB能直接读取的CSV时一次并行读取所有文件（按列名合并）
+        native_paths = [
+            path for path in csv_paths if compression_of(path) in (None,) + DUCKDB_COMPRESSIONS
+        ]
+        if self.native and len(native_paths) == len(self.file_paths):
+            try:
+                result['schema_drift'] = compare_schemas([
+                    (path, self.catalog.describe_csv(path, duckdb_encoding(encoding), cursor=self.cursor))
+                    for path in self.file_paths
+                ])
+                self.check_cancelled()
+                source_column = self.SOURCE_COLUMN if self.add_source_column else None
+                self.load_csv_native(encoding, file_path=self.file_paths, filename_column=source_column)
+                return None
+            except duckdb.Error:
+                self.check_cancelled()
+                # 原生读取器无法处理时回退到pandas读取
+                self.report_progress(0)
+        
+        frames = self.read_files_parallel()
+        result['schema_drift'] = compare_schemas([
+            (path, [(col, str(dtype)) for col, dtype in frame.dtypes.items()])
+            for path, frame in zip(self.file_paths, frames)
+        ])
+        return pd.concat(frames, ignore_index=True)
+
+    def read_files_parallel(self):
+        """使用线程池并行解析所有文件"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(self.read_one_file, self.file_paths))
+
+    def read_one_file(self, file_path):
+        """读取单个文件（每个文件单独检测编码）"""
+        if is_csv_file(file_path):
+            encoding = self.encoding or detect_encoding(file_path)
+            try:
+                with self.open_csv(file_path) as reader:
+                    df = pd.read_csv(reader, encoding=encoding)
+            except UnicodeDecodeError:
+                raise Exception(f"{os.path.basename(file_path)} 按 {encoding} 编码读取失败，请手动指定文件编码")
+        elif file_path.lower().endswith(('.xlsx', '.xls')):
+            df = pd.read_excel(file_path)
+            self.on_bytes_read(os.path.getsize(file_path))
+        else:
+            raise Exception(f"不支持的文件格式: {os.path.basename(file_path)}")
+        
+        if self.add_source_column:
+            df[self.SOURCE_COLUMN] = file_path
+        return df
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class IngestCache:
+    """导入缓存：按文件路径、大小、修改时间和清理选项保存Parquet列式快照，超出容量时按LRU淘汰"""
+
+    DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.sql4csv', 'cache')
+    DEFAULT_MAX_BYTES = 10 * 1024 ** 3  # 默认缓存上限 10GB
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or self.DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes or self.DEFAULT_MAX_BYTES
+        self.index_file = os.path.join(self.cache_dir, 'index.json')
+        self.lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.index = self.load_index()
+
+    def load_index(self):
+        """读取缓存索引，并丢弃快照文件已不存在的条目"""
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {
+            key: entry for key, entry in index.items()
+            if os.path.exists(os.path.join(self.cache_dir, entry['file']))
+        }
+
+    def save_index(self):
+        tmp_file = self.index_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.index_file)
+
+    def make_key(self, file_paths, options):
+        """由源文件的路径、大小、修改时间和导入选项生成缓存键"""
+        files = []
+        for path in file_paths:
+            stat = os.stat(path)
+            files.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+        payload = json.dumps({'files': files, 'options': options}, sort_keys=True)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def lookup(self, key):
+        """查找快照，命中时返回条目（含Parquet路径）并更新最近使用时间"""
+        with self.lock:
+            entry = self.index.get(key)
+            if entry is None:
+                return None
+            path = os.path.join(self.cache_dir, entry['file'])
+            if not os.path.exists(path):
+                del self.index[key]
+                self.save_index()
+                return None
+            entry['last_used'] = time.time()
+            self.save_index()
+            return dict(entry, path=path)
+
+    def snapshot_path(self, key):
+        """新快照的临时写入路径（写完后调用add登记）；每次创建唯一的文件，同一文件并发导入时不会互相覆盖"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=f'{key}.', suffix='.parquet.tmp')
+        os.close(fd)
+        return tmp_path
+
+    def add(self, key, tmp_path, metadata=None):
+        """登记写好的快照，并按LRU淘汰超出容量的旧快照"""
+        file_name = f'{key}.parquet'
+        os.replace(tmp_path, os.path.join(self.cache_dir, file_name))
+        with self.lock:
+            self.index[key] = dict(
+                metadata or {},
+                file=file_name,
+                size=os.path.getsize(os.path.join(self.cache_dir, file_name)),
+                last_used=time.time(),
+            )
+            self.evict(keep=key)
+            self.save_index()
+
+    def evict(self, keep=None):
+        """按最近使用时间从旧到新淘汰快照，直到总大小不超过上限"""
+        total = sum(entry['size'] for entry in self.index.values())
+        for key, entry in sorted(self.index.items(), key=lambda item: item[1]['last_used']):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self.remove_file(entry['file'])
+            total -= entry['size']
+            del self.index[key]
+
+    def remove_file(self, file_name):
+        try:
+            os.remove(os.path.join(self.cache_dir, file_name))
+        except OSError:
+            pass
+
+    def total_size(self):
+        """缓存占用的总字节数"""
+        with self.lock:
+            return sum(entry['size'] for entry in self.index.values())
+
+    def clear(self):
+        """清空缓存"""
+        with self.lock:
+            for entry in self.index.values():
+                self.remove_file(entry['file'])
+            self.index = {}
+            self.save_index()
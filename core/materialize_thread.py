@@ -0,0 +1,54 @@
+import time
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from materialized_view import MaterializedView, materialized_views
+
+
+class MaterializeThread(QThread):
+    """在后台创建物化表，或按依赖顺序刷新源表有变化的物化表"""
+    view_refreshed = pyqtSignal(str, str, int, float)  # 表名, 刷新方式, 行数, 耗时（秒）
+    error_occurred = pyqtSignal(str, str)  # 表名, 错误信息
+
+    def __init__(self, catalog, table_names=None, create_sql=None, force=False, manual=False):
+        super().__init__()
+        self.catalog = catalog
+        self.table_names = table_names  # 要刷新的物化表，None 表示检查所有物化表
+        self.create_sql = create_sql  # 不为空时用该查询创建 table_names 中的物化表
+        self.force = force  # 手动刷新时不论源表是否变化都完整重算
+        self.manual = manual  # 用户手动操作时弹窗报告错误，自动刷新只在状态栏提示
+        self.cursor = catalog.cursor()
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        self.cursor.interrupt()
+
+    def run(self):
+        try:
+            if self.create_sql is not None:
+                table_name = self.table_names[0]
+                start_time = time.time()
+                try:
+                    _, row_count = MaterializedView.create(self.catalog, table_name, self.create_sql, self.cursor)
+                except Exception as e:
+                    self.error_occurred.emit(table_name, str(e))
+                    return
+                self.view_refreshed.emit(table_name, 'create', row_count, time.time() - start_time)
+                return
+
+            for table_name in materialized_views(self.catalog):
+                if self.cancelled:
+                    break
+                if self.table_names is not None and table_name not in self.table_names:
+                    continue
+                start_time = time.time()
+                try:
+                    mode, row_count = MaterializedView(self.catalog, table_name).refresh(self.cursor, self.force)
+                except Exception as e:
+                    self.error_occurred.emit(table_name, str(e))
+                    continue
+                if mode != 'fresh':
+                    self.view_refreshed.emit(table_name, mode, row_count, time.time() - start_time)
+        finally:
+            self.cursor.close()
@@ -0,0 +1,331 @@
+import json
+from datetime import datetime
+
+from duckdb_catalog import quote_identifier
+
+# 可以增量合并的聚合函数 {函数名: 合并旧结果和新增部分结果时使用的聚合函数}
+MERGE_FUNCTIONS = {
+    'count_star': 'SUM',
+    'count': 'SUM',
+    'sum': 'SUM',
+    'min': 'MIN',
+    'max': 'MAX',
+}
+
+# 增量合并时暂存新结果的临时表
+MERGE_TABLE = '_sql4csv_merge'
+
+
+def normalize_node(node):
+    """去掉语法树中的位置和别名，用于比较两个表达式是否相同"""
+    if isinstance(node, dict):
+        return {key: normalize_node(value) for key, value in node.items()
+                if key not in ('query_location', 'alias')}
+    if isinstance(node, list):
+        return [normalize_node(value) for value in node]
+    return node
+
+
+def find_nodes(node, predicate):
+    """在语法树中查找满足条件的表达式节点"""
+    if isinstance(node, dict):
+        if predicate(node):
+            yield node
+        values = node.values()
+    elif isinstance(node, list):
+        values = node
+    else:
+        return
+    for value in values:
+        yield from find_nodes(value, predicate)
+
+
+def analyze_query(conn, sql):
+    """分析查询能否在源表只追加了行时增量刷新
+
+    只支持对单个导入表的简单查询：不含连接、子查询、窗口函数、CTE、DISTINCT、ORDER BY、LIMIT 和 HAVING。
+    没有聚合时返回 {'mode': 'append', ...}，新增行的查询结果直接追加；
+    按列分组且聚合函数都可合并（COUNT、SUM、MIN、MAX）时返回 {'mode': 'merge', ...}，
+    新增行的分组结果与已有结果再聚合一次；其他查询返回None，只能完整重算。
+    """
+    try:
+        tree = json.loads(conn.execute('SELECT json_serialize_sql(?)', [sql]).fetchone()[0])
+    except Exception:
+        return None
+    if tree.get('error') or len(tree['statements']) != 1:
+        return None
+    node = tree['statements'][0]['node']
+    if node['type'] != 'SELECT_NODE' or node['modifiers'] or node['cte_map']['map'] \
+            or node.get('sample') or node.get('qualify') or node.get('having'):
+        return None
+    from_table = node['from_table']
+    if from_table['type'] != 'BASE_TABLE' or from_table['schema_name'] or from_table['catalog_name'] \
+            or from_table.get('sample'):
+        return None
+    if any(find_nodes(node, lambda n: n.get('class') in ('WINDOW', 'SUBQUERY'))):
+        return None
+
+    aggregate_names = {row[0] for row in conn.execute(
+        "SELECT DISTINCT function_name FROM duckdb_functions() WHERE function_type = 'aggregate'"
+    ).fetchall()} | {'count_star'}
+
+    def is_aggregate(n):
+        return n.get('class') == 'FUNCTION' and n['function_name'] in aggregate_names
+
+    plan = {'source': from_table['table_name'], 'keys': [], 'aggregates': {}}
+    select_list = node['select_list']
+    group_expressions = node['group_expressions']
+    if node['aggregate_handling'] != 'STANDARD_HANDLING' or len(node['group_sets']) > 1:
+        return None
+    if not group_expressions and not any(find_nodes(select_list, is_aggregate)):
+        plan['mode'] = 'append'
+        return plan
+
+    # 分组列必须原样出现在结果中，其他结果列必须是可合并的聚合函数
+    groups = []
+    for expression in group_expressions:
+        if expression['class'] == 'CONSTANT':
+            # GROUP BY 1 按位置引用结果列
+            position = expression['value'].get('value')
+            if not isinstance(position, int) or not 1 <= position <= len(select_list):
+                return None
+            expression = select_list[position - 1]
+        groups.append(normalize_node(expression))
+    for position, item in enumerate(select_list):
+        if is_aggregate(item):
+            if item['function_name'] not in MERGE_FUNCTIONS or item['distinct'] \
+                    or any(find_nodes(item['children'], is_aggregate)):
+                return None
+            plan['aggregates'][position] = MERGE_FUNCTIONS[item['function_name']]
+        elif normalize_node(item) in groups:
+            plan['keys'].append(position)
+        else:
+            return None
+    if any(group not in [normalize_node(select_list[k]) for k in plan['keys']] for group in groups):
+        return None
+    plan['mode'] = 'merge'
+    return plan
+
+
+def depends_on(catalog, table_name, target):
+    """物化表是否（直接或间接）引用了目标表"""
+    info = catalog.table_info.get(table_name, {})
+    if info.get('kind') != 'materialized':
+        return False
+    for source in info['sources']:
+        if source.lower() == target.lower() or depends_on(catalog, source, target):
+            return True
+    return False
+
+
+def materialized_views(catalog):
+    """所有物化表，被其他物化表引用的排在前面（按此顺序刷新）"""
+    pending = [name for name, info in catalog.table_info.items() if info.get('kind') == 'materialized']
+    ordered = []
+    while pending:
+        for table_name in pending:
+            if not any(depends_on(catalog, table_name, other) for other in pending if other != table_name):
+                break
+        pending.remove(table_name)
+        ordered.append(table_name)
+    return ordered
+
+
+def rebaseline(catalog):
+    """重新打开工作区后版本号重新计数，以当前版本作为各物化表源表的基准（行数变化仍会被检测到）"""
+    for info in catalog.table_info.values():
+        if info.get('kind') != 'materialized':
+            continue
+        for source, state in info['sources'].items():
+            if source in catalog.table_info:
+                try:
+                    state['version'] = catalog.table_version(source)
+                except OSError:
+                    pass
+
+
+class MaterializedView:
+    """保存为结果表的查询，按源表的版本判断是否需要刷新（不依赖Qt）
+
+    源表只在末尾追加了行时只处理新增的行（按rowid截取），否则完整重算。
+    """
+
+    def __init__(self, catalog, table_name):
+        info = catalog.table_info.get(table_name, {})
+        if info.get('kind') != 'materialized':
+            raise ValueError(f'表 "{table_name}" 不是物化表')
+        self.catalog = catalog
+        self.table_name = table_name
+
+    @property
+    def info(self):
+        return self.catalog.table_info[self.table_name]
+
+    @classmethod
+    def create(cls, catalog, table_name, sql, cursor):
+        """执行查询并保存为物化表（同名的物化表被替换）"""
+        sql = sql.strip().rstrip(';').strip()
+        if catalog.statement_types(sql) != ['SELECT']:
+            raise ValueError('只能将单条查询语句（SELECT）保存为物化表')
+        existing = catalog.table_info.get(table_name)
+        if existing is not None and existing['kind'] != 'materialized':
+            raise ValueError(f'表 "{table_name}" 已存在且不是物化表，请使用其他表名')
+        sources = catalog.referenced_tables(sql)
+        for source in sources:
+            if source not in catalog.table_info:
+                raise ValueError(f'物化表只能引用数据目录中的表，未找到: {source}')
+            if source.lower() == table_name.lower() or depends_on(catalog, source, table_name):
+                raise ValueError(f'物化表 "{table_name}" 不能引用自身')
+
+        versions = {source: catalog.table_version(source) for source in sources}
+        with catalog.writer(cursor) as conn:
+            counts = cls.count_rows(catalog, conn, sources)
+            conn.execute(f'CREATE OR REPLACE TABLE {quote_identifier(table_name)} AS {sql}')
+            row_count = conn.execute(f'SELECT COUNT(*) FROM {quote_identifier(table_name)}').fetchone()[0]
+
+        incremental = analyze_query(cursor, sql)
+        if incremental is not None:
+            # 按数据目录中的表名记录增量刷新的源表
+            known = {source.lower(): source for source in sources}
+            incremental['source'] = known.get(incremental['source'].lower(), incremental['source'])
+        with catalog.lock:
+            catalog.table_info[table_name] = {
+                'kind': 'materialized',
+                'source': None,
+                'sql': sql,
+                'sources': cls.source_states(sources, versions, counts),
+                'incremental': incremental,
+                'refreshed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            catalog.bump_version(table_name)
+        return cls(catalog, table_name), row_count
+
+    @staticmethod
+    def count_rows(catalog, conn, sources):
+        """统计源表的行数以及rowid是否连续 {表名: (行数, rowid是否连续)}（只统计数据保存在目录中的表）"""
+        counts = {}
+        for source in sources:
+            if catalog.table_info[source]['kind'] not in ('table', 'materialized'):
+                continue
+            count, max_rowid = conn.execute(
+                f'SELECT COUNT(*), MAX(rowid) FROM {quote_identifier(source)}'
+            ).fetchone()
+            # 删除过行后rowid不再连续，无法按rowid截取新增的行
+            counts[source] = (count, max_rowid is None or max_rowid + 1 == count)
+        return counts
+
+    @staticmethod
+    def source_states(sources, versions, counts):
+        """刷新时源表的状态 {表名: {'version': 版本, 'rows': 行数, 'appendable': rowid是否连续}}"""
+        states = {}
+        for source in sources:
+            count, contiguous = counts.get(source, (None, False))
+            states[source] = {'version': versions[source], 'rows': count, 'appendable': contiguous}
+        return states
+
+    def stale_sources(self):
+        """版本或行数发生变化的源表"""
+        stale = []
+        for source, state in self.info['sources'].items():
+            info = self.catalog.table_info.get(source)
+            if info is None:
+                stale.append(source)
+                continue
+            try:
+                version = self.catalog.table_version(source)
+            except OSError:
+                stale.append(source)
+                continue
+            if version != state['version'] or \
+                    (info['kind'] in ('table', 'materialized') and self.catalog.row_count(source) != state['rows']):
+                stale.append(source)
+        return stale
+
+    def plan(self):
+        """刷新方式：'fresh' 不需要刷新，'append' / 'merge' 只处理新增的行，'full' 完整重算"""
+        stale = self.stale_sources()
+        if not stale:
+            return 'fresh'
+        incremental = self.info.get('incremental')
+        if incremental is None or stale != [incremental['source']]:
+            return 'full'
+        source = incremental['source']
+        state = self.info['sources'][source]
+        if self.catalog.table_info[source]['kind'] not in ('table', 'materialized') or not state['appendable'] \
+                or not self.catalog.appended_since(source, state['version'][0]):
+            return 'full'
+        return incremental['mode']
+
+    @staticmethod
+    def delta_cte(source, start, end):
+        """用与源表同名的CTE遮蔽源表，只包含按rowid截取的新增行"""
+        return (f'WITH {quote_identifier(source)} AS ('
+                f'SELECT * FROM main.{quote_identifier(source)} WHERE rowid >= {int(start)} AND rowid < {int(end)})')
+
+    def refresh(self, cursor, force=False):
+        """刷新物化表，返回 (刷新方式, 行数)；增量刷新时行数为处理的新增行数，完整重算时为结果行数"""
+        mode = 'full' if force else self.plan()
+        if mode == 'fresh':
+            return mode, 0
+        table = quote_identifier(self.table_name)
+        sources = list(self.info['sources'])
+        versions = {source: self.catalog.table_version(source) for source in sources}
+        with self.catalog.writer(cursor) as conn:
+            counts = self.count_rows(self.catalog, conn, sources)
+            if mode != 'full':
+                source = self.info['incremental']['source']
+                start = self.info['sources'][source]['rows']
+                end, contiguous = counts[source]
+                if not contiguous or end < start:
+                    # 源表中有行被删除（通过SQL修改），改为完整重算
+                    mode = 'full'
+            if mode == 'full':
+                conn.execute(f'CREATE OR REPLACE TABLE {table} AS {self.info["sql"]}')
+                row_count = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+            else:
+                row_count = end - start
+                if mode == 'append':
+                    conn.execute(f'INSERT INTO {table} {self.delta_cte(source, start, end)} {self.info["sql"]}')
+                else:
+                    self.merge(conn, source, start, end)
+
+        with self.catalog.lock:
+            self.info['sources'] = self.source_states(sources, versions, counts)
+            self.info['refreshed_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            if mode == 'append':
+                self.catalog.mark_appended(self.table_name)
+            else:
+                self.catalog.bump_version(self.table_name)
+        return mode, row_count
+
+    def merge(self, conn, source, start, end):
+        """把新增行的分组聚合结果与已有结果合并：按分组列再聚合一次，并转换回原来的列类型"""
+        incremental = self.info['incremental']
+        table = quote_identifier(self.table_name)
+        columns = conn.execute(f'DESCRIBE {table}').fetchall()
+        # JSON保存后字典的键变为字符串
+        aggregates = {int(position): func for position, func in incremental['aggregates'].items()}
+        select_items = []
+        for position, (col, dtype, *_) in enumerate(columns):
+            if position in aggregates:
+                select_items.append(
+                    f'CAST({aggregates[position]}({quote_identifier(col)}) AS {dtype}) AS {quote_identifier(col)}'
+                )
+            else:
+                select_items.append(quote_identifier(col))
+        group_by = ''
+        if incremental['keys']:
+            group_by = ' GROUP BY ' + ', '.join(quote_identifier(columns[k][0]) for k in incremental['keys'])
+
+        # 新增行的查询包在子查询中，同名CTE在其中同样生效
+        conn.execute(
+            f'CREATE OR REPLACE TEMP TABLE {MERGE_TABLE} AS {self.delta_cte(source, start, end)} '
+            f'SELECT {", ".join(select_items)} FROM (SELECT * FROM {table} UNION ALL ({self.info["sql"]}\n)) AS _merged'
+            f'{group_by}'
+        )
+        try:
+            conn.execute(f'DELETE FROM {table}')
+            conn.execute(f'INSERT INTO {table} SELECT * FROM {MERGE_TABLE}')
+        finally:
+            conn.execute(f'DROP TABLE IF EXISTS {MERGE_TABLE}')
+
@@ -0,0 +1,130 @@
+from PyQt5.QtGui import QColor, QFont
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+    QTreeWidget, QTreeWidgetItem, QHeaderView, QFileDialog, QMessageBox
+)
+
+from query_profiler import (
+    iter_operators, total_operator_time, hottest_operators, format_extra_info,
+    save_profile, load_profile
+)
+
+
+class ProfileWidget(QWidget):
+    """性能分析显示组件：以算子树显示各算子的耗时、行数和输出大小，突出显示最耗时的算子"""
+
+    # 最耗时的算子依次使用的背景色
+    HOT_COLORS = [QColor(255, 170, 170), QColor(255, 205, 170), QColor(255, 235, 180)]
+
+    def __init__(self):
+        super().__init__()
+        self.profile = None
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+
+        # 控制面板
+        control_layout = QHBoxLayout()
+        self.summary_label = QLabel('点击「性能分析」执行查询并查看各算子的耗时')
+        self.summary_label.setWordWrap(True)
+        control_layout.addWidget(self.summary_label, 1)
+
+        self.open_btn = QPushButton('📂 打开分析结果')
+        self.open_btn.setToolTip('打开之前保存的分析结果，与本次结果对比')
+        self.open_btn.clicked.connect(self.open_profile)
+        control_layout.addWidget(self.open_btn)
+
+        self.save_btn = QPushButton('💾 保存为JSON')
+        self.save_btn.clicked.connect(self.save_profile)
+        self.save_btn.setEnabled(False)
+        control_layout.addWidget(self.save_btn)
+        layout.addLayout(control_layout)
+
+        # 算子树
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(['算子', '耗时(秒)', '占比', '行数', '输出大小', '详情'])
+        self.tree.header().setSectionResizeMode(0, QHeaderView.ResizeToContents)
+        self.tree.header().setSectionResizeMode(5, QHeaderView.Stretch)
+        layout.addWidget(self.tree)
+
+    def show_profile(self, profile):
+        """显示性能分析结果"""
+        self.profile = profile
+        self.save_btn.setEnabled(True)
+        self.tree.clear()
+
+        plan = profile['plan']
+        total_time = total_operator_time(profile)
+        hot_ranks = {id(node): rank for rank, node in enumerate(hottest_operators(profile, len(self.HOT_COLORS)))}
+
+        # 按深度维护父节点，依次挂到树上
+        parents = [self.tree.invisibleRootItem()]
+        for node, depth in iter_operators(plan):
+            timing = node.get('operator_timing', 0)
+            share = timing / total_time * 100 if total_time else 0
+            item = QTreeWidgetItem([
+                node.get('operator_name', '').strip(),
+                f'{timing:.4f}',
+                f'{share:.1f}%',
+                str(node.get('operator_cardinality', '')),
+                self.format_bytes(node.get('result_set_size', 0)),
+                format_extra_info(node.get('extra_info', {})),
+            ])
+            item.setToolTip(5, item.text(5))
+            rank = hot_ranks.get(id(node))
+            if rank is not None:
+                font = QFont()
+                font.setBold(True)
+                for column in range(self.tree.columnCount()):
+                    item.setBackground(column, self.HOT_COLORS[rank])
+                    item.setFont(column, font)
+            del parents[depth + 1:]
+            parents[depth].addChild(item)
+            parents.append(item)
+        self.tree.expandAll()
+
+        # 查询整体的耗时和内存
+        summary = f"总耗时 {plan.get('latency', 0):.3f} 秒，CPU {plan.get('cpu_time', 0):.3f} 秒，" \
+                  f"峰值内存 {self.format_bytes(plan.get('system_peak_buffer_memory', 0))}"
+        if plan.get('system_peak_temp_dir_size'):
+            summary += f"，溢写磁盘 {self.format_bytes(plan['system_peak_temp_dir_size'])}"
+        hottest = hottest_operators(profile, 1)
+        if hottest:
+            summary += f"；最耗时: {hottest[0].get('operator_name', '').strip()} ({hottest[0]['operator_timing']:.3f} 秒)"
+        if profile.get('profiled_at'):
+            summary += f"（{profile['profiled_at']}）"
+        self.summary_label.setText(summary)
+        self.summary_label.setToolTip(profile.get('sql', ''))
+
+    @staticmethod
+    def format_bytes(size):
+        for unit in ('B', 'KB', 'MB'):
+            if size < 1024:
+                return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+            size /= 1024
+        return f'{size:.2f} GB'
+
+    def save_profile(self):
+        """保存分析结果为JSON文件"""
+        if self.profile is None:
+            return
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, '保存分析结果', 'profile.json', 'JSON文件 (*.json)'
+        )
+        if file_path:
+            try:
+                save_profile(self.profile, file_path)
+            except Exception as e:
+                QMessageBox.critical(self, '错误', f'保存失败: {str(e)}')
+
+    def open_profile(self):
+        """打开保存的分析结果"""
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, '打开分析结果', '', 'JSON文件 (*.json)'
+        )
+        if file_path:
+            try:
+                self.show_profile(load_profile(file_path))
+            except Exception as e:
+                QMessageBox.critical(self, '错误', f'打开失败: {str(e)}')
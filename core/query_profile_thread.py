@@ -0,0 +1,34 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from query_profiler import profile_query
+
+
+class QueryProfileThread(QThread):
+    """性能分析线程，在后台执行查询并收集各算子的耗时"""
+    profile_ready = pyqtSignal(object)  # 性能分析结果
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, sql_query, cursor=None, session=None):
+        super().__init__()
+        self.sql_query = sql_query
+        self.cursor = cursor  # 独立游标，分析完后关闭
+        self.session = session  # 查询引用会话临时表时在会话游标上分析
+
+    def cancel(self):
+        if self.cursor is not None:
+            self.cursor.interrupt()
+
+    def run(self):
+        try:
+            if self.session is not None:
+                with self.session.lock:
+                    self.cursor = self.session.cursor
+                    profile = profile_query(self.cursor, self.sql_query)
+            else:
+                profile = profile_query(self.cursor, self.sql_query)
+            self.profile_ready.emit(profile)
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+        finally:
+            if self.session is None:
+                self.cursor.close()
@@ -0,0 +1,87 @@
+import json
+import os
+import tempfile
+from datetime import datetime
+
+import duckdb
+
+from duckdb_catalog import quote_literal
+
+PROFILE_TABLE = '_sql4csv_profile'  # 性能分析时保存查询结果的临时表（分析完即删除）
+
+
+def profile_query(cursor, sql):
+    """开启DuckDB性能分析执行查询，返回性能分析结果
+
+    查询结果写入临时表（与正常执行查询时相同），不取回到内存，分析完即删除。
+    返回 {'sql', 'profiled_at', 'plan'}，plan 为DuckDB输出的JSON算子树。
+    """
+    fd, output_path = tempfile.mkstemp(prefix='sql4csv_profile_', suffix='.json')
+    os.close(fd)
+    try:
+        cursor.execute("SET enable_profiling = 'json'")
+        cursor.execute(f'SET profiling_output = {quote_literal(output_path)}')
+        try:
+            try:
+                cursor.execute(f'CREATE OR REPLACE TEMP TABLE {PROFILE_TABLE} AS {sql}')
+            except duckdb.ParserException:
+                # SUMMARIZE、DESCRIBE、SHOW 等不能作为子查询，直接执行
+                cursor.execute(sql).fetchall()
+        finally:
+            # 先关闭性能分析，后续语句不再覆盖输出文件
+            cursor.execute('RESET enable_profiling')
+            cursor.execute('RESET profiling_output')
+        with open(output_path, 'r', encoding='utf-8') as f:
+            plan = json.load(f)
+        cursor.execute(f'DROP TABLE IF EXISTS {PROFILE_TABLE}')
+    finally:
+        os.remove(output_path)
+    return {
+        'sql': sql,
+        'profiled_at': datetime.now().isoformat(timespec='seconds'),
+        'plan': plan,
+    }
+
+
+def iter_operators(node, depth=0):
+    """深度优先遍历算子树，依次返回 (算子节点, 深度)"""
+    for child in node.get('children', []):
+        yield child, depth
+        yield from iter_operators(child, depth + 1)
+
+
+def total_operator_time(profile):
+    """所有算子耗时之和（秒）"""
+    return sum(node.get('operator_timing', 0) for node, _ in iter_operators(profile['plan']))
+
+
+def hottest_operators(profile, count=3):
+    """耗时最多的几个算子节点（耗时为0的算子不计入）"""
+    nodes = [node for node, _ in iter_operators(profile['plan']) if node.get('operator_timing', 0) > 0]
+    nodes.sort(key=lambda node: node['operator_timing'], reverse=True)
+    return nodes[:count]
+
+
+def format_extra_info(extra_info):
+    """将算子的附加信息（如过滤条件、分组列）整理为一行文本"""
+    parts = []
+    for key, value in extra_info.items():
+        if isinstance(value, list):
+            value = ', '.join(str(item) for item in value)
+        parts.append(f'{key}: {value}')
+    return '; '.join(parts)
+
+
+def save_profile(profile, file_path):
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, ensure_ascii=False, indent=2)
+
+
+def load_profile(file_path):
+    """读取保存的性能分析结果，用于与本次结果对比"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        profile = json.load(f)
+    if 'plan' not in profile:
+        # 直接由DuckDB输出的JSON文件
+        profile = {'sql': profile.get('query_name', ''), 'profiled_at': '', 'plan': profile}
+    return profile
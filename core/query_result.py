@@ -0,0 +1,98 @@
+import threading
+
+
+class QueryResult:
+    """查询结果：小结果直接保存为DataFrame，大结果保存在查询游标的临时表中按需分页取回
+
+    临时表只对该游标可见，不会进入数据目录或工作区；close() 关闭游标后即释放。
+    在会话游标上执行的脚本结果使用会话内唯一的表名和会话锁，close() 只删除临时表。
+    """
+
+    TABLE_NAME = '_sql4csv_result'
+    FULL_FETCH_ROWS = 100000  # 不超过该行数的结果一次取回
+    BATCH_ROWS = 100000  # 导出时每批取回的行数
+
+    def __init__(self, df=None, cursor=None, row_count=None, columns=None,
+                 table_name=TABLE_NAME, lock=None, owns_cursor=True):
+        self.df = df
+        self.cursor = cursor
+        self.row_count = len(df) if df is not None else row_count
+        self.columns = list(df.columns) if df is not None else columns
+        self.table_name = table_name
+        self.lock = lock or threading.Lock()  # 游标会在界面线程和导出时使用
+        self.owns_cursor = owns_cursor  # 会话游标由会话负责关闭
+
+    @classmethod
+    def from_dataframe(cls, df):
+        return cls(df=df)
+
+    @classmethod
+    def from_select(cls, cursor, select_sql, table_name=TABLE_NAME, lock=None, owns_cursor=True):
+        """把SELECT的结果写入游标上的临时表（查询只执行一次），结果不大时直接取回为DataFrame
+
+        结果按原始列名返回（临时表中重名的列会被改名）。
+        """
+        # DESCRIBE 只绑定查询不执行，取得原始列名
+        columns = [row[0] for row in cursor.execute(f'DESCRIBE {select_sql}').fetchall()]
+        # CREATE TABLE AS 返回写入的行数，无需再 COUNT(*)
+        row_count = cursor.execute(f'CREATE OR REPLACE TEMP TABLE {table_name} AS {select_sql}').fetchone()[0]
+        if row_count <= cls.FULL_FETCH_ROWS:
+            df = cursor.execute(f'SELECT * FROM {table_name}').df()
+            cursor.execute(f'DROP TABLE {table_name}')
+            df.columns = columns
+            return cls(df=df)
+        return cls(cursor=cursor, row_count=row_count, columns=columns,
+                   table_name=table_name, lock=lock, owns_cursor=owns_cursor)
+
+    @property
+    def is_paged(self):
+        """结果是否保存在游标中分页取回"""
+        return self.df is None
+
+    def page(self, offset, limit):
+        """取回从offset开始的limit行（按rowid定位，不扫描前面的行）"""
+        if self.df is not None:
+            return self.df.iloc[offset:offset + limit]
+        with self.lock:
+            df = self.cursor.execute(
+                f'SELECT * FROM {self.table_name} WHERE rowid >= ? AND rowid < ? ORDER BY rowid',
+                [offset, offset + limit]
+            ).df()
+        # 临时表中重名的列已被改名，恢复为查询的原始列名
+        df.columns = self.columns
+        return df
+
+    def to_df(self, limit=None):
+        """将结果（或其前limit行）转换为DataFrame"""
+        if limit is None or limit > self.row_count:
+            limit = self.row_count
+        return self.page(0, limit)
+
+    def iter_batches(self, batch_rows=BATCH_ROWS):
+        """按批次依次取回全部结果，内存中只保留一批"""
+        for offset in range(0, max(self.row_count, 1), batch_rows):
+            yield self.page(offset, batch_rows)
+
+    def export_csv(self, file_path, encoding='utf-8-sig'):
+        """分批写出CSV文件（第一批写入表头和BOM）"""
+        for i, batch in enumerate(self.iter_batches()):
+            if i == 0:
+                batch.to_csv(file_path, index=False, encoding=encoding)
+            else:
+                batch.to_csv(file_path, index=False, header=False, mode='a',
+                             encoding=encoding.replace('-sig', ''))
+
+    def close(self):
+        """释放临时表和游标"""
+        cursor, self.cursor = self.cursor, None
+        if cursor is None:
+            return
+        with self.lock:
+            if self.owns_cursor:
+                cursor.close()
+            else:
+                try:
+                    cursor.execute(f'DROP TABLE IF EXISTS {self.table_name}')
+                except Exception:
+                    # 会话游标已关闭（如打开了新的工作区），临时表已随之释放
+                    pass
@@ -0,0 +1,413 @@
+import hmac
+import json
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import duckdb
+
+try:
+    import pyarrow  # 可选依赖，用于以Arrow IPC流返回大结果
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+ARROW_MIME = 'application/vnd.apache.arrow.stream'
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '[::1]')  # 接受的Host请求头（防止DNS重绑定）
+
+
+class PoolExhausted(Exception):
+    """等待空闲游标超时"""
+
+
+class CursorPool:
+    """有上限的DuckDB游标池：每个请求借出一个游标，用完归还；数据目录切换数据库后重新创建游标"""
+
+    def __init__(self, catalog, size):
+        self.catalog = catalog
+        self.size = size
+        self.slots = threading.BoundedSemaphore(size)
+        self.lock = threading.Lock()
+        self.idle = []  # [(创建游标时的连接, 游标), ...]
+        self.in_use = 0  # 已借出的游标数
+
+    @contextmanager
+    def cursor(self, wait):
+        """借出游标，wait 秒内没有空闲游标时抛出PoolExhausted"""
+        if not self.slots.acquire(timeout=wait):
+            raise PoolExhausted()
+        conn = cursor = None
+        try:
+            with self.lock:
+                self.in_use += 1
+                while self.idle and cursor is None:
+                    conn, cursor = self.idle.pop()
+                    if conn is not self.catalog.conn:
+                        self.close_cursor(cursor)
+                        cursor = None
+            if cursor is None:
+                conn = self.catalog.conn
+                cursor = self.catalog.cursor()
+            yield cursor
+        finally:
+            with self.lock:
+                self.in_use -= 1
+                if cursor is not None:
+                    self.idle.append((conn, cursor))
+            self.slots.release()
+
+    @staticmethod
+    def close_cursor(cursor):
+        try:
+            cursor.close()
+        except duckdb.Error:
+            pass  # 所属的数据库已关闭
+
+    def close(self):
+        with self.lock:
+            for _, cursor in self.idle:
+                self.close_cursor(cursor)
+            self.idle.clear()
+
+
+class ServerMetrics:
+    """查询服务的统计：请求数、错误、超时、排队拒绝、延迟分位数、返回的行数和字节数"""
+
+    LATENCY_WINDOW = 1000  # 计算延迟分位数时保留的最近请求数
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.counters = {
+            'requests': 0,
+            'queries': 0,
+            'errors': 0,
+            'timeouts': 0,
+            'rejected': 0,
+            'arrow_responses': 0,
+            'rows_returned': 0,
+            'bytes_sent': 0,
+        }
+        self.latencies = deque(maxlen=self.LATENCY_WINDOW)
+
+    def add(self, **counts):
+        with self.lock:
+            for name, count in counts.items():
+                self.counters[name] += count
+
+    def record_query(self, elapsed, rows, size, arrow):
+        with self.lock:
+            self.counters['queries'] += 1
+            self.counters['rows_returned'] += rows
+            self.counters['bytes_sent'] += size
+            self.counters['arrow_responses'] += int(arrow)
+            self.latencies.append(elapsed)
+
+    def snapshot(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            metrics = dict(self.counters)
+        metrics['uptime'] = round(time.time() - self.started_at, 1)
+        for name, quantile in (('latency_p50', 0.5), ('latency_p95', 0.95), ('latency_max', 1.0)):
+            metrics[name] = round(latencies[min(int(len(latencies) * quantile), len(latencies) - 1)], 4) \
+                if latencies else None
+        return metrics
+
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    """处理查询服务的HTTP请求（需在 Authorization: Bearer 请求头中携带服务的令牌）
+
+    GET  /health   服务状态
+    GET  /tables   数据目录中的表和列
+    GET  /metrics  请求统计
+    POST /query    {"sql": "...", "params": [...], "timeout": 秒, "format": "json"|"arrow"|"auto"}
+    """
+
+    server_version = 'sql4csv'
+    # 使用默认的HTTP/1.0，Arrow流式响应写完后关闭连接，不需要Content-Length
+    response_started = False  # 已开始写出Arrow流，出错时只能断开连接
+
+    def log_message(self, format, *args):
+        pass  # 不在控制台输出每个请求
+
+    @property
+    def query_server(self):
+        return self.server.query_server
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return len(body)
+
+    def send_error_json(self, status, message, metric='errors'):
+        """返回错误，计入 metric 指定的统计项（错误、超时或排队拒绝只计一次）"""
+        self.query_server.metrics.add(**{metric: 1})
+        self.send_json(status, {'error': message})
+
+    def authorized(self):
+        """检查Host请求头和令牌：只接受发往本机地址、携带本次服务令牌的请求"""
+        host = self.headers.get('Host', '')
+        host = host.rsplit(':', 1)[0] if not host.endswith(']') else host
+        if host.lower() not in LOCAL_HOSTS:
+            self.send_error_json(403, '只接受发往本机地址（localhost/127.0.0.1）的请求')
+            return False
+        origin = self.headers.get('Origin')
+        if origin is not None and urlparse(origin).hostname not in ('localhost', '127.0.0.1', '::1'):
+            self.send_error_json(403, '不接受来自网页的跨域请求')
+            return False
+        auth = self.headers.get('Authorization', '')
+        token = auth[len('Bearer '):] if auth.startswith('Bearer ') else ''
+        if not hmac.compare_digest(token.encode(), self.query_server.token.encode()):
+            self.send_error_json(401, '缺少或错误的访问令牌（Authorization: Bearer <令牌>）')
+            return False
+        return True
+
+    def do_GET(self):
+        self.query_server.metrics.add(requests=1)
+        if not self.authorized():
+            return
+        path = urlparse(self.path).path.rstrip('/')
+        if path == '/health':
+            self.send_json(200, {'status': 'ok', 'arrow': pyarrow is not None})
+        elif path == '/metrics':
+            self.send_json(200, self.query_server.metrics_snapshot())
+        elif path == '/tables':
+            self.send_json(200, self.query_server.describe_tables())
+        else:
+            self.send_error_json(404, f'未知的路径: {path}')
+
+    def do_POST(self):
+        self.query_server.metrics.add(requests=1)
+        if not self.authorized():
+            return
+        path = urlparse(self.path).path.rstrip('/')
+        if path != '/query':
+            self.send_error_json(404, f'未知的路径: {path}')
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            sql = request['sql']
+        except (ValueError, KeyError, TypeError):
+            self.send_error_json(400, '请求体应为JSON，且包含 sql 字段')
+            return
+        # 默认返回JSON；客户端接受Arrow时，大结果改为Arrow流
+        default_format = 'auto' if ARROW_MIME in self.headers.get('Accept', '') else 'json'
+        output_format = request.get('format') or default_format
+        if output_format not in ('json', 'arrow', 'auto'):
+            self.send_error_json(400, 'format 应为 json、arrow 或 auto')
+            return
+        if output_format == 'arrow' and pyarrow is None:
+            self.send_error_json(406, '服务端未安装pyarrow，不能返回Arrow格式')
+            return
+        self.query_server.handle_query(self, sql, request.get('params') or [], request.get('timeout'),
+                                       output_format)
+
+
+class QueryServer:
+    """本机HTTP/JSON查询服务：其他脚本通过它查询界面中已导入的表，不需要重新导入（不依赖Qt）
+
+    只接受发往本机地址、携带本次服务随机令牌的请求；只接受单条查询语句（SELECT），
+    且只能查询数据目录中的表，不能通过表函数或文件路径读取其他文件。
+    每个请求从有上限的游标池借出游标执行，超过超时时间中断查询。
+    默认以JSON返回；客户端接受Arrow（Accept 或 format）且安装了pyarrow时，大结果以Arrow IPC流分批返回。
+    """
+
+    DEFAULT_PORT = 8765
+    POOL_SIZE = 4  # 同时执行的查询数
+    POOL_WAIT = 10  # 等待空闲游标的最长时间（秒），超过后返回503
+    DEFAULT_TIMEOUT = 60  # 请求没有指定超时时间时使用（秒）
+    JSON_MAX_ROWS = 100000  # JSON响应最多返回的行数，更大的结果截断（可改用Arrow格式）
+    ARROW_BATCH_ROWS = 65536  # Arrow流每批的行数
+
+    def __init__(self, catalog, port=DEFAULT_PORT, pool_size=POOL_SIZE, timeout=DEFAULT_TIMEOUT,
+                 host='127.0.0.1', token=None):
+        self.catalog = catalog
+        self.host = host  # 默认只监听本机
+        self.token = token or secrets.token_urlsafe(24)  # 访问令牌，每次开启服务随机生成
+        self.port = port
+        self.timeout = timeout
+        self.pool = CursorPool(catalog, pool_size)
+        self.metrics = ServerMetrics()
+        self.httpd = None
+        self.thread = None
+
+    @property
+    def url(self):
+        return f'http://{self.host}:{self.port}'
+
+    @property
+    def is_running(self):
+        return self.httpd is not None
+
+    def start(self):
+        """在后台线程中开始监听（端口被占用时抛出OSError）"""
+        self.httpd = ThreadingHTTPServer((self.host, self.port), QueryRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.query_server = self
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.httpd is None:
+            return
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.httpd = None
+        self.pool.close()
+
+    def metrics_snapshot(self):
+        metrics = self.metrics.snapshot()
+        metrics.update(pool_size=self.pool.size, pool_in_use=self.pool.in_use)
+        return metrics
+
+    def describe_tables(self):
+        """数据目录中的表 {表名: {'kind': 类型, 'columns': [[列名, 类型], ...]}}"""
+        tables = {}
+        for table_name, info in list(self.catalog.table_info.items()):
+            tables[table_name] = {
+                'kind': info.get('kind'),
+                'columns': [list(column) for column in self.catalog.table_columns(table_name)],
+            }
+        return tables
+
+    def handle_query(self, handler, sql, params, timeout, output_format):
+        """执行查询并写出响应"""
+        try:
+            statement_types = self.catalog.statement_types(sql)
+        except duckdb.Error as e:
+            handler.send_error_json(400, f'SQL解析失败: {e}')
+            return
+        if statement_types != ['SELECT']:
+            handler.send_error_json(403, '查询服务只接受单条查询语句（SELECT）')
+            return
+        # 不允许通过表函数（read_csv、read_text 等）或文件路径读取数据目录以外的文件
+        try:
+            functions = self.catalog.table_functions(sql)
+            unknown = [] if functions else [
+                name for name in self.catalog.referenced_tables(sql) if name not in self.catalog.table_info
+            ]
+        except (duckdb.Error, ValueError) as e:
+            handler.send_error_json(400, f'SQL解析失败: {e}')
+            return
+        if functions:
+            handler.send_error_json(403, f'查询服务不允许调用表函数: {", ".join(sorted(set(functions)))}')
+            return
+        if unknown:
+            handler.send_error_json(403, f'只能查询已导入的表，未知的表: {", ".join(unknown)}')
+            return
+        try:
+            timeout = float(timeout or self.timeout)
+        except (TypeError, ValueError):
+            handler.send_error_json(400, 'timeout 应为秒数')
+            return
+
+        started = time.monotonic()
+        try:
+            with self.pool.cursor(self.POOL_WAIT) as cursor:
+                timer = threading.Timer(timeout, cursor.interrupt)
+                timer.daemon = True
+                timer.start()
+                try:
+                    cursor.execute(sql, params)
+                    if output_format == 'json' or (output_format == 'auto' and pyarrow is None):
+                        rows, size = self.write_json(handler, cursor, started)
+                        arrow = False
+                    else:
+                        rows, size, arrow = self.write_arrow_or_json(handler, cursor, started, output_format)
+                finally:
+                    timer.cancel()
+        except PoolExhausted:
+            handler.send_error_json(503, f'查询服务繁忙（{self.pool.size} 个查询正在执行），请稍后重试',
+                                    metric='rejected')
+            return
+        except duckdb.InterruptException:
+            self.send_failure(handler, 504, f'查询超时（{timeout:g}秒）', metric='timeouts')
+            return
+        except duckdb.Error as e:
+            self.send_failure(handler, 400, str(e))
+            return
+        self.metrics.record_query(time.monotonic() - started, rows, size, arrow)
+
+    @staticmethod
+    def send_failure(handler, status, message, metric='errors'):
+        """报告查询失败；Arrow流已经开始写出时只能断开连接"""
+        if handler.response_started:
+            handler.query_server.metrics.add(**{metric: 1})
+            handler.close_connection = True
+        else:
+            handler.send_error_json(status, message, metric=metric)
+
+    def write_json(self, handler, cursor, started, rows=None):
+        """以JSON返回结果（超过 JSON_MAX_ROWS 行时截断），返回 (行数, 字节数)"""
+        columns = [column[0] for column in cursor.description]
+        if rows is None:
+            rows = cursor.fetchmany(self.JSON_MAX_ROWS + 1)
+        truncated = len(rows) > self.JSON_MAX_ROWS
+        rows = [list(row) for row in rows[:self.JSON_MAX_ROWS]]
+        size = handler.send_json(200, {
+            'columns': columns,
+            'rows': rows,
+            'row_count': len(rows),
+            'truncated': truncated,
+            'elapsed': round(time.monotonic() - started, 4),
+        })
+        return len(rows), size
+
+    def write_arrow_or_json(self, handler, cursor, started, output_format):
+        """按批取回Arrow结果：format 为 auto 且结果不超过一批时仍以JSON返回，否则以Arrow IPC流写出
+
+        返回 (行数, 字节数, 是否为Arrow响应)。
+        """
+        reader = cursor.fetch_record_batch(self.ARROW_BATCH_ROWS)
+        first_batch = next(iter(reader), None)
+        if output_format == 'auto':
+            batches = [first_batch] if first_batch is not None else []
+            if first_batch is None or first_batch.num_rows < self.ARROW_BATCH_ROWS:
+                rows = [list(row.values()) for batch in batches for row in batch.to_pylist()]
+                row_count, size = self.write_json(handler, cursor, started, rows)
+                return row_count, size, False
+
+        handler.send_response(200)
+        handler.send_header('Content-Type', ARROW_MIME)
+        handler.end_headers()
+        handler.response_started = True
+        sink = CountingWriter(handler.wfile)
+        row_count = 0
+        with pyarrow.ipc.new_stream(sink, reader.schema) as writer:
+            if first_batch is not None:
+                writer.write_batch(first_batch)
+                row_count += first_batch.num_rows
+            for batch in reader:
+                writer.write_batch(batch)
+                row_count += batch.num_rows
+        return row_count, sink.bytes_written, True
+
+
+class CountingWriter:
+    """统计写出字节数的文件包装器（Arrow流直接写到HTTP连接）"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_written = 0
+        self.closed = False
+
+    def write(self, data):
+        size = self.raw.write(data)
+        self.bytes_written += len(memoryview(data))
+        return size
+
+    def flush(self):
+        self.raw.flush()
+
+    def close(self):
+        self.closed = True  # 连接由HTTP服务关闭
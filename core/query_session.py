@@ -0,0 +1,141 @@
+import threading
+
+from duckdb_catalog import quote_literal
+from result_cache import SQL_TOKEN
+
+
+def statement_spans(sql):
+    """按分号切分SQL脚本，返回各语句的 [(起始位置, 结束位置), ...]
+
+    字符串、带引号的标识符和注释中的分号不作为分隔符；只包含空白和注释的片段会被忽略。
+    """
+    spans = []
+    start = 0
+    has_code = False
+    position = 0
+    for token in SQL_TOKEN.findall(sql):
+        if token == ';':
+            if has_code:
+                spans.append((start, position))
+            start = position + 1
+            has_code = False
+        elif not (token.isspace() or token.startswith(('--', '/*'))):
+            has_code = True
+        position += len(token)
+    if has_code:
+        spans.append((start, len(sql)))
+    return spans
+
+
+def statement_at(sql, position):
+    """返回光标所在位置的语句文本（光标紧跟在某条语句的分号之后时取该语句）"""
+    spans = statement_spans(sql)
+    if not spans:
+        return ''
+    index = 0
+    for i, (start, _) in enumerate(spans):
+        if start <= position:
+            index = i
+    # 光标与上一条语句之间只有分号和空格（同一行）时，执行刚写完的语句
+    if index > 0 and not sql[spans[index - 1][1]:position].strip(' \t;'):
+        index -= 1
+    start, end = spans[index]
+    return sql[start:end].strip()
+
+
+class QuerySession:
+    """查询会话：脚本在同一个会话游标上按顺序执行，临时表在整个会话期间保留
+
+    DuckDB的临时表只对创建它的连接可见，因此多语句脚本、修改数据的语句以及
+    引用了会话临时表的查询都在会话游标上执行（同一时间只执行一个），
+    其他只读查询仍使用各自的独立游标并发执行。
+    """
+
+    RESULT_PREFIX = '_sql4csv_result'  # 会话中保存分页结果的临时表名前缀
+    PREPARED_PREFIX = 'sql4csv_prepared'  # 会话中预处理语句的名称前缀
+    VARIABLE_PREFIX = 'sql4csv_param'  # 绑定参数值使用的会话变量前缀
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.lock = threading.RLock()  # 会话游标同一时间只能执行一条语句
+        self._cursor = None
+        self._conn = None  # 创建会话游标的连接（打开工作区后需要重新创建）
+        self.temp_table_names = set()  # 会话中的临时表（小写），每次执行后刷新
+        self.result_count = 0
+        self.prepared = {}  # {SQL: 预处理语句名}，同一SQL再次执行时不再解析和规划
+
+    @property
+    def cursor(self):
+        """会话游标（数据目录切换到新的工作区后自动重新创建）"""
+        with self.lock:
+            if self._cursor is None or self._conn is not self.catalog.conn:
+                self.reset()
+                self._cursor = self.catalog.cursor()
+                self._conn = self.catalog.conn
+            return self._cursor
+
+    def next_result_table(self):
+        """为分页结果生成会话内唯一的临时表名"""
+        with self.lock:
+            self.result_count += 1
+            return f'{self.RESULT_PREFIX}_{self.result_count}'
+
+    def execute_prepared(self, sql, values):
+        """以预处理语句执行单条SQL（参数为 $1、$2 ...），返回执行后的会话游标
+
+        同一SQL只在第一次执行时 PREPARE，之后直接 EXECUTE，不再解析和规划。
+        参数值先通过参数绑定写入会话变量，EXECUTE 时再取出，不拼接到SQL中。
+        """
+        with self.lock:
+            cursor = self.cursor
+            name = self.prepared.get(sql)
+            if name is None:
+                statements = cursor.extract_statements(sql)
+                if len(statements) != 1:
+                    raise Exception('带参数的模板只能包含一条SQL语句')
+                name = f'{self.PREPARED_PREFIX}_{len(self.prepared) + 1}'
+                cursor.execute(f'PREPARE {name} AS {statements[0].query}')
+                self.prepared[sql] = name
+            arguments = []
+            for number, value in enumerate(values, 1):
+                variable = f'{self.VARIABLE_PREFIX}_{number}'
+                cursor.execute(f'SET VARIABLE {variable} = ?', [value])
+                arguments.append(f'getvariable({quote_literal(variable)})')
+            if arguments:
+                return cursor.execute(f"EXECUTE {name}({', '.join(arguments)})")
+            return cursor.execute(f'EXECUTE {name}')
+
+    def uses_session(self, sql):
+        """SQL是否需要在会话游标上执行：多语句脚本、非SELECT语句或引用了会话临时表"""
+        try:
+            if self.catalog.statement_types(sql) != ['SELECT']:
+                return True
+            with self.catalog.lock:
+                table_names = self.catalog.conn.get_table_names(sql)
+        except Exception:
+            # 无法解析时交给查询本身报告错误
+            return False
+        return any(name.lower() in self.temp_table_names for name in table_names)
+
+    def refresh_temp_tables(self):
+        """刷新会话中的临时表名（在持有会话锁的工作线程中调用）"""
+        with self.lock:
+            rows = self.cursor.execute(
+                'SELECT table_name FROM duckdb_tables() WHERE temporary'
+            ).fetchall()
+        self.temp_table_names = {
+            row[0].lower() for row in rows if not row[0].startswith(self.RESULT_PREFIX)
+        }
+
+    def reset(self):
+        """关闭会话游标，丢弃会话中的临时表"""
+        with self.lock:
+            cursor, self._cursor = self._cursor, None
+            self._conn = None
+            self.temp_table_names = set()
+            self.prepared = {}  # 预处理语句随游标一起释放
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
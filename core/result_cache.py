@@ -0,0 +1,122 @@
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+
+# SQL词法单元：字符串、带引号的标识符、注释、空白、分号，其余原样保留
+SQL_TOKEN = re.compile(
+    r"'(?:[^']|'')*'"
+    r'|"(?:[^"]|"")*"'
+    r'|--[^\n]*'
+    r'|/\*.*?\*/'
+    r'|\s+'
+    r"|[^'\"\s;/-]+"
+    r'|.',
+    re.S
+)
+
+# 结果随时间、随机数或外部文件变化的函数，包含这些函数的查询不缓存
+VOLATILE_FUNCTION = re.compile(
+    r'\b(random|uuid|gen_random_uuid|now|today|current_date|current_time|current_timestamp|'
+    r'get_current_time|get_current_timestamp|nextval|setseed|glob|read_\w+|\w+_scan)\b',
+    re.I
+)
+
+
+def normalize_sql(sql):
+    """规范化SQL文本：去掉注释和结尾分号，合并空白（字符串和带引号的标识符保持不变）"""
+    tokens = []
+    for token in SQL_TOKEN.findall(sql):
+        if token.startswith(('--', '/*')) or token.isspace():
+            if tokens and tokens[-1] != ' ':
+                tokens.append(' ')
+        else:
+            tokens.append(token)
+    return ''.join(tokens).strip().rstrip(';').strip()
+
+
+class ResultCache:
+    """查询结果缓存：按规范化的SQL和所涉及表的版本号保存DataFrame，超出内存预算时按LRU淘汰"""
+
+    DEFAULT_MAX_BYTES = 512 * 1024 ** 2  # 默认内存预算 512MB
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes or self.DEFAULT_MAX_BYTES
+        self.entries = OrderedDict()  # {缓存键: (DataFrame, 占用字节数)}，按最近使用排序
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def make_key(self, catalog, sql):
+        """生成缓存键；查询不是只读的单条SELECT、含易变函数或引用了无法跟踪版本的对象时返回None"""
+        if VOLATILE_FUNCTION.search(sql):
+            return None
+        try:
+            if catalog.statement_types(sql) != ['SELECT']:
+                return None
+            table_names = catalog.referenced_tables(sql)
+        except Exception:
+            return None
+
+        # 只跟踪导入、链接的表和物化表（视图和通过SQL创建的表的数据变化无法感知）
+        versions = {}
+        for table_name in table_names:
+            if catalog.table_info.get(table_name, {}).get('kind') not in ('table', 'linked', 'materialized'):
+                return None
+            versions[table_name] = catalog.table_version(table_name)
+        payload = json.dumps({'sql': normalize_sql(sql), 'versions': versions}, sort_keys=True)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def is_read_only(catalog, sql):
+        """SQL是否只包含SELECT语句（无法解析时视为可能修改数据）"""
+        try:
+            return all(statement_type == 'SELECT' for statement_type in catalog.statement_types(sql))
+        except Exception:
+            return False
+
+    def get(self, key):
+        """查找缓存结果，命中时更新最近使用顺序"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, df):
+        """保存查询结果，超出预算时淘汰最久未使用的结果（单个结果超过预算时不缓存）"""
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self.entries[key] = (df, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+    def clear(self):
+        """清空缓存（执行了修改数据的语句时调用）"""
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        """命中统计 {'hits', 'misses', 'hit_rate', 'entries', 'bytes'}"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+            }
@@ -0,0 +1,97 @@
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QProgressBar, QTableWidget, QTableWidgetItem, QHeaderView
+)
+
+
+class ResultTab(QWidget):
+    """单个查询的结果标签页，保存该查询的线程、结果、耗时和行数"""
+
+    def __init__(self, sql_query, title, parent=None):
+        super().__init__(parent)
+        self.sql_query = sql_query
+        self.title = title
+        self.thread = None  # SQLQueryThread，排队中或来自缓存时为None
+        self.result = None  # QueryResult
+        self.rows_loaded = 0  # 已显示的行数
+        self.history_index = None  # 在查询历史中的位置
+        self.cache_key = None
+        self.params = None  # 模板参数值，不为None时以预处理语句执行
+        self.closed = False  # 标签页已关闭（查询线程可能仍在结束中）
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        # 查询状态
+        info_layout = QHBoxLayout()
+        self.info_label = QLabel('⏳ 排队中...')
+        info_layout.addWidget(self.info_label)
+        info_layout.addStretch()
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(250)
+        self.progress_bar.setVisible(False)
+        info_layout.addWidget(self.progress_bar)
+        layout.addLayout(info_layout)
+
+        # 脚本中各语句的耗时和行数（多语句脚本时显示）
+        self.statements_table = QTableWidget(0, 4)
+        self.statements_table.setHorizontalHeaderLabels(['语句', '类型', '耗时(秒)', '行数'])
+        self.statements_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.statements_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.statements_table.setMaximumHeight(150)
+        self.statements_table.setVisible(False)
+        layout.addWidget(self.statements_table)
+
+        # 结果表格
+        self.table = QTableWidget()
+        self.table.setSelectionMode(QTableWidget.ContiguousSelection)  # 允许连续选择
+        layout.addWidget(self.table)
+
+    def is_running(self):
+        """查询是否正在执行"""
+        return self.thread is not None and self.thread.isRunning()
+
+    def set_running(self):
+        self.info_label.setText('⏳ 执行中...')
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setVisible(True)
+
+    def set_progress(self, percent, elapsed, remaining):
+        """显示查询进度和已用时间"""
+        if percent is None:
+            self.progress_bar.setRange(0, 0)
+            self.info_label.setText(f'⏳ 执行中... 已用 {elapsed:.1f} 秒')
+            return
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(int(percent))
+        remaining_note = f'，预计剩余 {remaining:.0f} 秒' if remaining is not None else ''
+        self.info_label.setText(f'⏳ 执行中... {percent:.1f}%，已用 {elapsed:.1f} 秒{remaining_note}')
+
+    def set_finished(self, result, elapsed=None):
+        """显示结果的行数、列数和耗时（elapsed为None表示来自结果缓存）"""
+        self.result = result
+        self.progress_bar.setVisible(False)
+        timing = f'耗时 {elapsed:.2f} 秒' if elapsed is not None else '来自结果缓存'
+        self.info_label.setText(f'✅ {result.row_count} 行 × {len(result.columns)} 列，{timing}')
+
+    def set_statements(self, statement_stats):
+        """显示脚本中各语句的耗时和行数"""
+        self.statements_table.setRowCount(len(statement_stats))
+        for row, stats in enumerate(statement_stats):
+            sql_item = QTableWidgetItem(' '.join(stats['sql'].split()))
+            sql_item.setToolTip(stats['sql'])
+            self.statements_table.setItem(row, 0, sql_item)
+            self.statements_table.setItem(row, 1, QTableWidgetItem(stats['type']))
+            self.statements_table.setItem(row, 2, QTableWidgetItem(f"{stats['elapsed']:.3f}"))
+            rows = '' if stats['rows'] is None else str(stats['rows'])
+            self.statements_table.setItem(row, 3, QTableWidgetItem(rows))
+        self.statements_table.setVisible(len(statement_stats) > 1)
+
+    def set_failed(self, message):
+        self.progress_bar.setVisible(False)
+        self.info_label.setText(f'❌ {message}')
+
+    def release(self):
+        """释放查询结果（分页结果占用的游标）"""
+        self.closed = True
+        if self.result is not None:
+            self.result.close()
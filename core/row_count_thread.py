@@ -0,0 +1,26 @@
+import duckdb
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+class RowCountThread(QThread):
+    """在后台统计外部链接表的行数（需要扫描整个文件），结果缓存在数据目录的表信息中"""
+    count_ready = pyqtSignal(str)  # 表名
+
+    def __init__(self, catalog, table_name):
+        super().__init__()
+        self.catalog = catalog
+        self.table_name = table_name
+        self.cursor = catalog.cursor()  # 独立游标，统计期间不占用数据目录的锁
+
+    def cancel(self):
+        self.cursor.interrupt()
+
+    def run(self):
+        try:
+            self.catalog.row_count(self.table_name, cursor=self.cursor)
+        except duckdb.Error:
+            # 统计期间表被删除或替换，列表刷新时会重新统计
+            pass
+        finally:
+            self.cursor.close()
+        self.count_ready.emit(self.table_name)
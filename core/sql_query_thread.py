@@ -1,47 +1,191 @@
+import threading
+import time
+
 import duckdb
-import pandas as pd
 from PyQt5.QtCore import QThread, pyqtSignal
 
+from query_result import QueryResult
+
 
 class SQLQueryThread(QThread):
     """SQL查询线程，避免界面卡顿"""
-    result_ready = pyqtSignal(object)
+    result_ready = pyqtSignal(object)  # QueryResult
     error_occurred = pyqtSignal(str)
     progress_updated = pyqtSignal(int)
+    query_cancelled = pyqtSignal(str)  # 取消原因
+    # 进度详情：百分比（DuckDB暂未给出时为None）, 已用秒数, 预计剩余秒数（无法估计时为None）
+    progress_detail = pyqtSignal(object, float, object)
+    
+    POLL_INTERVAL = 0.2  # 轮询DuckDB查询进度的间隔（秒）
+    MIN_ESTIMATE_PERCENT = 5  # 进度达到该百分比后才估计剩余时间
     
-    def __init__(self, sql_query, tables):
+    def __init__(self, sql_query, cursor=None, timeout=None, session=None, params=None):
         super().__init__()
         self.sql_query = sql_query
-        self.tables = tables  # 表数据字典 {表名: DataFrame}
+        self.params = params  # 参数值列表，不为None时以预处理语句在会话游标上执行
+        self.cursor = cursor  # 共享数据目录上的独立游标（会话执行时在取得会话锁后设置）
+        self.session = session  # QuerySession，脚本在会话游标上按顺序执行
+        self.timeout = timeout  # 超时秒数，None表示不限制
+        self.cancel_reason = None
+        self.elapsed = 0.0  # 查询用时（秒）
+        # 各语句的执行情况 [{'sql', 'type', 'elapsed', 'rows'}, ...]，rows为None表示语句不返回行数
+        self.statement_stats = []
     
-    def run(self):
+    def cancel(self, reason='已取消'):
+        """中断正在执行的查询（只影响本线程的游标，未提交的修改会回滚）"""
+        if self.cancel_reason is None:
+            self.cancel_reason = reason
+        if self.cursor is not None:
+            self.cursor.interrupt()
+    
+    def poll_progress(self, started, done):
+        """查询执行期间轮询DuckDB的查询进度，换算已用时间和预计剩余时间
+
+        DuckDB的Python接口只提供完成百分比，不提供已处理的行数。
+        """
+        while not done.wait(self.POLL_INTERVAL):
+            # 等待会话游标期间没有进度
+            percent = self.cursor.query_progress() if self.cursor is not None else -1
+            elapsed = time.monotonic() - started
+            if percent < 0:
+                self.progress_detail.emit(None, elapsed, None)
+                continue
+            # 进度太小时估计值误差很大，不给出剩余时间
+            remaining = elapsed * (100 - percent) / percent if percent >= self.MIN_ESTIMATE_PERCENT else None
+            self.progress_updated.emit(int(percent))
+            self.progress_detail.emit(percent, elapsed, remaining)
+    
+    def run_select(self, sql, **options):
+        """执行单条SELECT，结果保存在游标的临时表中，大结果按需分页取回"""
         try:
-            self.progress_updated.emit(10)
-            
-            # 在当前线程中创建新的数据库连接
-            conn = duckdb.connect(':memory:')
-            
-            # 将所有表导入到数据库
-            self.progress_updated.emit(20)
-            for table_name, df in self.tables.items():
-                # DuckDB可以直接从DataFrame创建表
-                df.to_sql(table_name, conn, index=False, if_exists="replace")
-                # conn.register(table_name, df)
-            
-            self.progress_updated.emit(50)
-            # 执行查询
-            result = pd.read_sql_query(self.sql_query, conn)
-            # result = conn.execute(self.sql_query).df()
+            return QueryResult.from_select(self.cursor, sql, **options)
+        except duckdb.ParserException:
+            # SUMMARIZE、DESCRIBE、SHOW 等不能作为子查询，结果都很小，直接取回
+            return QueryResult.from_dataframe(self.cursor.execute(sql).df())
+    
+    def run_script(self):
+        """在会话游标上按顺序执行各条语句，记录每条语句的耗时和行数
+
+        返回最后一条返回结果的语句的结果；所有语句都不返回结果时返回None。
+        """
+        result = None
+        statements = self.cursor.extract_statements(self.sql_query)
+        for number, statement in enumerate(statements, 1):
+            if self.cancel_reason is not None:
+                raise duckdb.InterruptException('INTERRUPT Error: Interrupted!')
+            statement_started = time.monotonic()
+            statement_result = None
+            rows = None
+            try:
+                if statement.type == duckdb.StatementType.SELECT:
+                    statement_result = self.run_select(
+                        statement.query,
+                        table_name=self.session.next_result_table(),
+                        lock=self.session.lock,
+                        owns_cursor=False
+                    )
+                    rows = statement_result.row_count
+                else:
+                    self.cursor.execute(statement.query)
+                    description = self.cursor.description
+                    columns = [column[0] for column in description] if description is not None else None
+                    if columns == ['Count']:
+                        # INSERT、UPDATE、DELETE、CREATE TABLE AS 返回影响的行数（CREATE VIEW 等没有返回行）
+                        row = self.cursor.fetchone()
+                        rows = row[0] if row is not None else None
+                    elif columns == ['Success']:
+                        # DROP、SET、PRAGMA设置等只返回空的Success列，不算作结果
+                        self.cursor.fetchall()
+                    elif description is not None:
+                        # EXPLAIN、SHOW、PRAGMA 等返回结果
+                        statement_result = QueryResult.from_dataframe(self.cursor.df())
+                        rows = statement_result.row_count
+            except duckdb.InterruptException:
+                raise
+            except Exception as e:
+                if result is not None:
+                    result.close()
+                raise Exception(f'第 {number} 条语句执行失败: {e}') if len(statements) > 1 else e
             
-            # 关闭连接
-            conn.close()
+            self.statement_stats.append({
+                'sql': statement.query.strip(),
+                'type': statement.type.name,
+                'elapsed': time.monotonic() - statement_started,
+                'rows': rows,
+            })
+            if statement_result is not None:
+                # 只保留最后一个结果，释放之前的分页结果
+                if result is not None:
+                    result.close()
+                result = statement_result
+        return result
+    
+    def run_prepared(self):
+        """以预处理语句执行带参数的模板（同一模板再次执行时不再解析和规划）"""
+        statement_started = time.monotonic()
+        self.session.execute_prepared(self.sql_query, self.params)
+        result = None
+        if self.cursor.description is not None:
+            result = QueryResult.from_dataframe(self.cursor.df())
+        self.statement_stats.append({
+            'sql': self.sql_query,
+            'type': 'EXECUTE',
+            'elapsed': time.monotonic() - statement_started,
+            'rows': result.row_count if result is not None else None,
+        })
+        return result
+    
+    def run(self):
+        timer = None
+        result = None
+        started = time.monotonic()
+        done = threading.Event()
+        poller = threading.Thread(target=self.poll_progress, args=(started, done), daemon=True)
+        if self.timeout:
+            timer = threading.Timer(self.timeout, self.cancel, args=(f'超时（{self.timeout}秒）',))
+            timer.daemon = True
+            timer.start()
+        try:
+            # 表已常驻在数据目录中，无需逐表导入
+            poller.start()
+            if self.session is not None:
+                # 脚本在会话游标上执行，临时表在会话期间保留
+                with self.session.lock:
+                    self.cursor = self.session.cursor
+                    try:
+                        if self.cancel_reason is not None:
+                            raise duckdb.InterruptException('INTERRUPT Error: Interrupted!')
+                        result = self.run_script() if self.params is None else self.run_prepared()
+                    finally:
+                        self.session.refresh_temp_tables()
+            else:
+                if self.cancel_reason is not None:
+                    raise duckdb.InterruptException('INTERRUPT Error: Interrupted!')
+                # 执行查询，使用DuckDB按列批量转换DataFrame（不经过逐行的DB-API）；
+                # 单条SELECT的结果保存在游标的临时表中，大结果按需分页取回
+                statements = self.cursor.extract_statements(self.sql_query)
+                if len(statements) == 1 and statements[0].type == duckdb.StatementType.SELECT:
+                    result = self.run_select(self.sql_query)
+                else:
+                    result = QueryResult.from_dataframe(self.cursor.execute(self.sql_query).df())
             
+            done.set()
+            poller.join()
+            self.elapsed = time.monotonic() - started
             self.progress_updated.emit(100)
             self.result_ready.emit(result)
         except Exception as e:
-            self.error_occurred.emit(str(e))
-
-
-
-
-
+            # 先停止轮询，避免进度信号晚于结束信号到达
+            done.set()
+            if poller.is_alive():
+                poller.join()
+            if self.cancel_reason is not None:
+                self.query_cancelled.emit(self.cancel_reason)
+            else:
+                self.error_occurred.emit(str(e))
+        finally:
+            if timer is not None:
+                timer.cancel()
+            # 关闭本线程的游标（分页结果仍需使用游标，由结果对象负责关闭；会话游标由会话负责）
+            if self.session is None and (result is None or not result.is_paged):
+                self.cursor.close()
@@ -0,0 +1,125 @@
+import re
+from datetime import date
+
+from duckdb_catalog import quote_identifier
+from result_cache import SQL_TOKEN
+
+# 模板参数类型 {类型: 显示名称}
+PARAM_TYPES = {
+    'table': '表名',
+    'column': '列名',
+    'integer': '整数',
+    'float': '小数',
+    'text': '文本',
+    'date': '日期',
+    'boolean': '布尔',
+}
+
+# 标识符参数（表名、列名）不能作为预处理语句的参数绑定，校验后加引号替换到SQL中
+IDENTIFIER_TYPES = ('table', 'column')
+
+# 模板中的参数占位符，如 $limit
+PLACEHOLDER = re.compile(r'\$([A-Za-z_]\w*)')
+
+
+def default_templates():
+    """默认模板 [{'name', 'sql', 'params'}, ...]"""
+    table = {'name': 'table', 'type': 'table'}
+    column = {'name': 'column', 'type': 'column'}
+    limit = {'name': 'limit', 'type': 'integer', 'default': 100}
+    value = {'name': 'value', 'type': 'float', 'default': 0}
+    return [
+        {'name': '查看所有数据', 'sql': 'SELECT * FROM $table LIMIT $limit;', 'params': [table, limit]},
+        {'name': '数据统计', 'sql': 'SELECT COUNT(*) as 总行数 FROM $table;', 'params': [table]},
+        {'name': '列信息', 'sql': 'PRAGMA table_info($table);', 'params': [table]},
+        {'name': '数值列统计',
+         'sql': 'SELECT\n  AVG($column) as 平均值,\n  MIN($column) as 最小值,\n  MAX($column) as 最大值\nFROM $table;',
+         'params': [table, column]},
+        {'name': '分组统计',
+         'sql': 'SELECT $column, COUNT(*) as 数量\nFROM $table\nGROUP BY $column\nORDER BY 数量 DESC;',
+         'params': [table, column]},
+        {'name': '去重查询', 'sql': 'SELECT DISTINCT $column FROM $table;', 'params': [table, column]},
+        {'name': '条件筛选', 'sql': 'SELECT * FROM $table\nWHERE $column > $value\nLIMIT $limit;',
+         'params': [table, column, value, limit]},
+        {'name': '排序查询', 'sql': 'SELECT * FROM $table\nORDER BY $column DESC\nLIMIT $limit;',
+         'params': [table, column, limit]},
+        {'name': '多表关联查询',
+         'sql': 'SELECT a.$column1, b.$column2\nFROM $table1 a\nJOIN $table2 b ON a.$key = b.$key\n'
+                'WHERE a.$column1 > $value\nLIMIT $limit;',
+         'params': [
+             {'name': 'table1', 'type': 'table'}, {'name': 'table2', 'type': 'table'},
+             {'name': 'column1', 'type': 'column'}, {'name': 'column2', 'type': 'column'},
+             {'name': 'key', 'type': 'column'}, value, limit,
+         ]},
+        {'name': '查看所有表', 'sql': 'SHOW TABLES;', 'params': []},
+        {'name': '查看表结构', 'sql': 'DESCRIBE $table;', 'params': [table]},
+    ]
+
+
+def template_placeholders(sql):
+    """按出现顺序返回SQL中的参数名（字符串、带引号的标识符和注释中的 $ 不算）"""
+    names = []
+    for token in SQL_TOKEN.findall(sql):
+        if token.startswith(("'", '"', '--', '/*')):
+            continue
+        for name in PLACEHOLDER.findall(token):
+            if name not in names:
+                names.append(name)
+    return names
+
+
+def convert_value(param, value):
+    """将表单中输入的值转换为参数类型对应的Python值，格式不正确时抛出ValueError"""
+    param_type = param.get('type', 'text')
+    label = param['name']
+    if param_type in IDENTIFIER_TYPES or param_type == 'text':
+        value = str(value)
+        if param_type in IDENTIFIER_TYPES and not value:
+            raise ValueError(f'请选择参数 {label} 的{PARAM_TYPES[param_type]}')
+        return value
+    if param_type == 'boolean':
+        if isinstance(value, str):
+            return value.strip().lower() in ('1', 'true', 'yes', '是')
+        return bool(value)
+    if param_type == 'date':
+        if isinstance(value, date):
+            return value
+        try:
+            return date.fromisoformat(str(value).strip())
+        except ValueError:
+            raise ValueError(f'参数 {label} 应为日期（如 2024-01-31）')
+    try:
+        if param_type == 'integer':
+            return int(str(value).strip())
+        return float(str(value).strip())
+    except ValueError:
+        raise ValueError(f'参数 {label} 应为{PARAM_TYPES[param_type]}')
+
+
+def render_template(template, values):
+    """代入模板参数，返回 (SQL, 绑定的参数值列表)
+
+    表名、列名参数校验后加引号替换到SQL中；其他参数按首次出现的顺序替换为
+    $1、$2 ... 位置参数，其值在执行时绑定，不拼接到SQL中。
+    """
+    params = {param['name']: param for param in template.get('params', [])}
+    bound_values = []
+    replacements = {}
+    for name in template_placeholders(template['sql']):
+        param = params.get(name, {'name': name, 'type': 'text'})
+        if name not in values:
+            raise ValueError(f'缺少参数 {name} 的值')
+        value = convert_value(param, values[name])
+        if param.get('type') in IDENTIFIER_TYPES:
+            replacements[name] = quote_identifier(value)
+        else:
+            bound_values.append(value)
+            replacements[name] = f'${len(bound_values)}'
+
+    # 只替换字符串和注释以外的占位符
+    tokens = []
+    for token in SQL_TOKEN.findall(template['sql']):
+        if not token.startswith(("'", '"', '--', '/*')):
+            token = PLACEHOLDER.sub(lambda match: replacements.get(match.group(1), match.group(0)), token)
+        tokens.append(token)
+    return ''.join(tokens).strip(), bound_values
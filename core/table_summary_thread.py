@@ -0,0 +1,27 @@
+import duckdb
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+class TableSummaryThread(QThread):
+    """在后台使用SUMMARIZE统计表的各列（大表需要扫描全部数据，不阻塞界面）"""
+    summary_ready = pyqtSignal(str, object, object)  # 表名, 行数, SUMMARIZE结果
+
+    def __init__(self, catalog, table_name):
+        super().__init__()
+        self.catalog = catalog
+        self.table_name = table_name
+        self.cursor = catalog.cursor()  # 独立游标，统计期间不占用数据目录的锁
+
+    def cancel(self):
+        self.cursor.interrupt()
+
+    def run(self):
+        try:
+            summary = self.catalog.summarize(self.table_name, cursor=self.cursor)
+            row_count = self.catalog.row_count(self.table_name, cursor=self.cursor)
+        except duckdb.Error:
+            # 统计期间表被删除、替换或统计被取消，下次显示时重新统计
+            return
+        finally:
+            self.cursor.close()
+        self.summary_ready.emit(self.table_name, row_count, summary)
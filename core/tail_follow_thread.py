@@ -0,0 +1,70 @@
+import threading
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+class TailFollowThread(QThread):
+    """定时检查被跟踪的CSV文件，在后台把新增行追加到对应的表"""
+    rows_appended = pyqtSignal(str, int)  # 表名, 新增行数
+    error_occurred = pyqtSignal(str, str)  # 表名, 错误信息
+    
+    INTERVAL = 5  # 检查间隔（秒）
+    
+    def __init__(self, interval=INTERVAL):
+        super().__init__()
+        self.interval = interval
+        self.followers = {}  # {表名: TailFollower}
+        # 检查文件期间持有，重命名或停止跟踪时等待本轮检查结束
+        self.lock = threading.RLock()
+        self.wakeup = threading.Event()
+        self.stopping = False
+    
+    def add(self, follower):
+        with self.lock:
+            self.followers[follower.table_name] = follower
+        self.poll_now()
+    
+    def remove(self, table_name):
+        with self.lock:
+            return self.followers.pop(table_name, None) is not None
+    
+    def rename(self, old_name, new_name):
+        with self.lock:
+            follower = self.followers.pop(old_name, None)
+            if follower is not None:
+                follower.table_name = new_name
+                self.followers[new_name] = follower
+    
+    def clear(self):
+        with self.lock:
+            self.followers.clear()
+    
+    def is_following(self, table_name):
+        return table_name in self.followers
+    
+    def poll_now(self):
+        """立即检查一次，不等待定时"""
+        self.wakeup.set()
+    
+    def stop(self):
+        self.stopping = True
+        self.wakeup.set()
+        self.wait()
+    
+    def run(self):
+        while not self.stopping:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            if self.stopping:
+                break
+            with self.lock:
+                for table_name, follower in list(self.followers.items()):
+                    try:
+                        appended = follower.poll()
+                    except Exception as e:
+                        # 出错后停止跟踪该表，避免反复报错
+                        del self.followers[table_name]
+                        self.error_occurred.emit(table_name, str(e))
+                        continue
+                    if appended:
+                        self.rows_appended.emit(table_name, appended)
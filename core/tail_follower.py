@@ -0,0 +1,84 @@
+import io
+import os
+
+import pandas as pd
+
+from duckdb_catalog import quote_identifier
+
+
+class TailFollower:
+    """跟踪持续增长的CSV文件，只解析上次导入位置之后新增的完整行并追加到表中（不依赖Qt）"""
+
+    def __init__(self, catalog, table_name):
+        info = catalog.table_info.get(table_name, {})
+        if 'offset' not in info:
+            raise ValueError(f'表 "{table_name}" 不是从单个CSV文件导入的，无法跟踪新增行')
+        if (info.get('encoding') or '').startswith(('utf-16', 'utf-32')):
+            raise ValueError(f'暂不支持跟踪 {info["encoding"]} 编码的文件')
+        self.catalog = catalog
+        self.table_name = table_name
+        self.widen_columns()
+
+    # 压缩类型导入的列会取最小的类型，新增的值可能超出范围，跟踪前先放宽
+    WIDER_TYPES = {
+        'TINYINT': 'BIGINT', 'SMALLINT': 'BIGINT', 'INTEGER': 'BIGINT',
+        'UTINYINT': 'BIGINT', 'USMALLINT': 'BIGINT', 'UINTEGER': 'BIGINT',
+        'FLOAT': 'DOUBLE',
+    }
+
+    def widen_columns(self):
+        """放宽按已有数据选取的列类型（分类列的ENUM改为VARCHAR），以便接收新出现的取值"""
+        with self.catalog.writer() as conn:
+            for col, dtype in self.catalog.table_columns(self.table_name):
+                wider = 'VARCHAR' if dtype.startswith('ENUM') else self.WIDER_TYPES.get(dtype)
+                if wider:
+                    conn.execute(
+                        f'ALTER TABLE {quote_identifier(self.table_name)} '
+                        f'ALTER {quote_identifier(col)} TYPE {wider}'
+                    )
+                    self.catalog.bump_version(self.table_name)
+
+    @property
+    def file_path(self):
+        return self.catalog.table_info[self.table_name]['source']
+
+    def poll(self):
+        """读取新增的完整行并追加到表中，返回写入的行数（包括替换的最后一行）"""
+        info = self.catalog.table_info[self.table_name]
+        offset = info['offset']
+        size = os.path.getsize(info['source'])
+        if size < offset:
+            raise Exception(f'{os.path.basename(info["source"])} 比上次导入时小，文件可能已被截断或轮转')
+        if size == offset:
+            return 0
+        
+        # 导入时文件末尾有未写完的行：从该行开头重新读取，写完后替换表中的最后一行
+        start = info.get('tail_start', offset)
+        with open(info['source'], 'rb') as f:
+            f.seek(start)
+            data = f.read(size - start)
+        # 只处理到最后一个换行符，未写完的行留到下次
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return 0
+        
+        # 按字符串读取，由DuckDB转换为表中已有的列类型
+        columns = [col for col, _ in self.catalog.table_columns(self.table_name)]
+        # index_col=False：字段多于列数时不把第一列当作索引
+        df = pd.read_csv(io.BytesIO(data[:end]), header=None, names=columns, dtype=str,
+                         index_col=False, encoding=info['encoding'] or 'utf-8')
+        if info.get('clean'):
+            df = df.dropna(how='all')
+        
+        replace_last_row = start < offset
+        if len(df) or replace_last_row:
+            cursor = self.catalog.cursor()
+            try:
+                self.catalog.append_dataframe(self.table_name, df, cursor=cursor,
+                                              replace_last_row=replace_last_row)
+            finally:
+                cursor.close()
+        with self.catalog.lock:
+            info['offset'] = start + end
+            info.pop('tail_start', None)
+        return len(df)
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+# 源码模块在 core/ 下以模块名直接互相导入（与 python main.py / cli.py 的运行方式一致）
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'core'))
+
+from duckdb_catalog import DuckDBCatalog  # noqa: E402
+
+
+@pytest.fixture
+def catalog():
+    catalog = DuckDBCatalog()
+    yield catalog
+    catalog.close()
+
+
+@pytest.fixture
+def write_csv(tmp_path):
+    """在临时目录中写出CSV文件，返回路径"""
+    def write(text, name='data.csv', encoding='utf-8'):
+        path = tmp_path / name
+        path.write_bytes(text.encode(encoding))
+        return str(path)
+    return write
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from file_loader import FileLoader
+from tail_follower import TailFollower
+
+
+def rows(catalog, table_name):
+    return catalog.conn.execute(f'SELECT * FROM {table_name}').fetchall()
+
+
+@pytest.mark.parametrize('native', [False, True])
+def test_load_keeps_last_row_without_trailing_newline(catalog, write_csv, native):
+    path = write_csv('a,b\n1,x\n2,y')
+    FileLoader(catalog, path, 't', native=native).load()
+    assert rows(catalog, 't') == [(1, 'x'), (2, 'y')]
+
+
+@pytest.mark.parametrize('native', [False, True])
+def test_follow_replaces_partial_last_line(catalog, write_csv, native):
+    path = write_csv('id,name,val\n1,a,10\n2,b,20\n3,c,3')
+    FileLoader(catalog, path, 't', native=native).load()
+    follower = TailFollower(catalog, 't')
+
+    with open(path, 'a') as f:
+        f.write('0')
+    assert follower.poll() == 0  # 行还没有写完
+
+    with open(path, 'a') as f:
+        f.write('\n4,d,40\n')
+    assert follower.poll() == 2
+    assert rows(catalog, 't') == [(1, 'a', 10), (2, 'b', 20), (3, 'c', 30), (4, 'd', 40)]
+
+    with open(path, 'a') as f:
+        f.write('5,e,50\n')
+    assert follower.poll() == 1
+    assert rows(catalog, 't')[-1] == (5, 'e', 50)
+
+
+def test_follow_appends_only_new_rows(catalog, write_csv):
+    path = write_csv('id,val\n1,10\n')
+    FileLoader(catalog, path, 't').load()
+    follower = TailFollower(catalog, 't')
+    with open(path, 'a') as f:
+        f.write('2,20\n3,3')
+    assert follower.poll() == 1
+    assert rows(catalog, 't') == [(1, 10), (2, 20)]
+
+
+@pytest.mark.parametrize('encoding', ['utf-8', 'utf-8-sig', 'utf-16'])
+def test_estimate_rows_ignores_bom(catalog, write_csv, encoding):
+    path = write_csv('id,name\n' + ''.join(f'{i},名{i}\n' for i in range(50000)), encoding=encoding)
+    estimate = FileLoader(catalog, path, 't').estimate_rows(encoding)
+    assert 40000 < estimate < 60000
+
+
+@pytest.mark.parametrize('native', [False, True])
+def test_bernoulli_sample_with_bom(catalog, write_csv, native):
+    path = write_csv('id,name\n' + ''.join(f'{i},名{i}\n' for i in range(50000)), encoding='utf-8-sig')
+    loader = FileLoader(catalog, path, 't', native=native, encoding='utf-8-sig',
+                        sample={'method': 'bernoulli', 'rows': 500})
+    loader.load()
+    count = catalog.conn.execute('SELECT COUNT(*) FROM t').fetchone()[0]
+    assert 250 < count < 1000
+
+
+def test_reservoir_sample_keeps_size_and_file_order(catalog, write_csv, monkeypatch):
+    monkeypatch.setattr(FileLoader, 'CHUNK_ROWS', 1000)  # 多个分块，覆盖分块之间的替换
+    path = write_csv('id\n' + ''.join(f'{i}\n' for i in range(10000)))
+    FileLoader(catalog, path, 't', sample={'method': 'reservoir', 'rows': 300}).load()
+    ids = [row[0] for row in rows(catalog, 't')]
+    assert len(ids) == 300
+    assert ids == sorted(set(ids))
+    assert ids[-1] >= 1000  # 样本不只来自第一个分块
+
+
+def test_reservoir_update_is_uniform():
+    rng = np.random.default_rng(0)
+    hits = np.zeros(100)
+    for _ in range(2000):
+        sample = None
+        for start in range(0, 100, 30):
+            chunk = pd.DataFrame({'id': range(start, min(start + 30, 100))})
+            sample = FileLoader.reservoir_update(sample, chunk, start, 10, rng)
+        hits[sample['id'].to_numpy()] += 1
+    # 每行被选中的概率都是 10/100
+    assert hits.min() > 120 and hits.max() < 290
@@ -0,0 +1,101 @@
+import pandas as pd
+import pytest
+
+from materialized_view import MaterializedView, analyze_query
+
+
+@pytest.fixture
+def sales(catalog):
+    catalog.register_dataframe('sales', pd.DataFrame({
+        'region': ['a', 'b', 'a'],
+        'amount': [10, 20, 30],
+    }), source='sales.csv')
+    return catalog
+
+
+def create(catalog, table_name, sql):
+    cursor = catalog.cursor()
+    try:
+        view, _ = MaterializedView.create(catalog, table_name, sql, cursor)
+    finally:
+        cursor.close()
+    return view
+
+
+def refresh(view, force=False):
+    cursor = view.catalog.cursor()
+    try:
+        return view.refresh(cursor, force)
+    finally:
+        cursor.close()
+
+
+def table_rows(catalog, sql):
+    return sorted(catalog.conn.execute(sql).fetchall())
+
+
+AGGREGATE_SQL = ('SELECT region, COUNT(*) AS n, SUM(amount) AS total, MIN(amount) AS low, '
+                 'MAX(amount) AS high FROM sales GROUP BY region')
+
+
+def test_analyze_query_modes(sales):
+    assert analyze_query(sales.conn, 'SELECT region FROM sales WHERE amount > 5')['mode'] == 'append'
+    assert analyze_query(sales.conn, AGGREGATE_SQL)['mode'] == 'merge'
+    assert analyze_query(sales.conn, 'SELECT AVG(amount) FROM sales') is None
+    assert analyze_query(sales.conn, 'SELECT * FROM sales ORDER BY amount') is None
+    assert analyze_query(sales.conn, 'SELECT COUNT(DISTINCT region) FROM sales') is None
+
+
+def test_fresh_without_changes(sales):
+    view = create(sales, 'summary', AGGREGATE_SQL)
+    assert refresh(view) == ('fresh', 0)
+
+
+def test_merge_after_append_matches_full_recompute(sales):
+    view = create(sales, 'summary', AGGREGATE_SQL)
+    sales.append_dataframe('sales', pd.DataFrame({'region': ['b', 'c'], 'amount': [5, 7]}))
+    assert refresh(view) == ('merge', 2)
+    assert table_rows(sales, 'SELECT * FROM summary') == table_rows(sales, AGGREGATE_SQL)
+    assert sales.conn.execute('DESCRIBE summary').fetchall() == \
+        sales.conn.execute(f'DESCRIBE {AGGREGATE_SQL}').fetchall()
+
+
+def test_append_mode_processes_only_new_rows(sales):
+    sql = 'SELECT region, amount * 2 AS doubled FROM sales WHERE amount > 5'
+    view = create(sales, 'big_sales', sql)
+    sales.append_dataframe('sales', pd.DataFrame({'region': ['c', 'd'], 'amount': [1, 50]}))
+    assert refresh(view) == ('append', 2)
+    assert table_rows(sales, 'SELECT * FROM big_sales') == table_rows(sales, sql)
+
+
+def test_replaced_or_modified_source_recomputes(sales):
+    view = create(sales, 'summary', AGGREGATE_SQL)
+    sales.register_dataframe('sales', pd.DataFrame({'region': ['z'], 'amount': [1]}), source='sales.csv')
+    assert refresh(view)[0] == 'full'
+    assert table_rows(sales, 'SELECT region, n FROM summary') == [('z', 1)]
+
+    # 替换最后一行不是单纯追加，只能完整重算
+    sales.append_dataframe('sales', pd.DataFrame({'region': ['y'], 'amount': [2]}), replace_last_row=True)
+    assert view.plan() == 'full'
+    refresh(view)
+    assert table_rows(sales, 'SELECT region, n FROM summary') == [('y', 1)]
+
+
+def test_deleted_rows_fall_back_to_full(sales):
+    view = create(sales, 'summary', AGGREGATE_SQL)
+    sales.conn.execute('DELETE FROM sales WHERE amount = 10')
+    sales.append_dataframe('sales', pd.DataFrame({'region': ['a'], 'amount': [1]}))
+    assert refresh(view)[0] == 'full'
+    assert table_rows(sales, 'SELECT * FROM summary') == table_rows(sales, AGGREGATE_SQL)
+
+
+def test_linked_source_refreshes_when_file_changes(catalog, write_csv):
+    path = write_csv('region,amount\na,1\n')
+    catalog.link_file('events', path)
+    view = create(catalog, 'totals', 'SELECT region, SUM(amount) AS total FROM events GROUP BY region')
+    assert view.plan() == 'fresh'
+
+    with open(path, 'a') as f:
+        f.write('a,2\nb,5\n')
+    assert refresh(view)[0] == 'full'
+    assert table_rows(catalog, 'SELECT * FROM totals') == [('a', 3), ('b', 5)]
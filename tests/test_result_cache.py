@@ -0,0 +1,73 @@
+import os
+
+import pandas as pd
+
+from result_cache import ResultCache, normalize_sql
+
+
+def add_table(catalog, table_name, df):
+    catalog.register_dataframe(table_name, df, source=f'{table_name}.csv')
+
+
+def test_normalize_sql_ignores_comments_and_whitespace():
+    assert normalize_sql('SELECT  *\n-- 注释\nFROM t ;') == normalize_sql('SELECT * FROM t')
+    assert normalize_sql("SELECT 'a  b'") != normalize_sql("SELECT 'a b'")
+
+
+def test_key_stable_until_table_changes(catalog):
+    cache = ResultCache()
+    add_table(catalog, 't', pd.DataFrame({'a': [1, 2]}))
+    key = cache.make_key(catalog, 'SELECT * FROM t')
+    assert key is not None
+    assert cache.make_key(catalog, 'select *  from t;') == cache.make_key(catalog, 'select * from t')
+    assert cache.make_key(catalog, 'SELECT * FROM t') == key
+
+    catalog.append_dataframe('t', pd.DataFrame({'a': [3]}))
+    assert cache.make_key(catalog, 'SELECT * FROM t') != key
+
+
+def test_key_changes_when_table_replaced(catalog):
+    cache = ResultCache()
+    add_table(catalog, 't', pd.DataFrame({'a': [1]}))
+    key = cache.make_key(catalog, 'SELECT * FROM t')
+    add_table(catalog, 't', pd.DataFrame({'a': [1]}))
+    assert cache.make_key(catalog, 'SELECT * FROM t') != key
+
+
+def test_uncacheable_queries(catalog):
+    cache = ResultCache()
+    add_table(catalog, 't', pd.DataFrame({'a': [1]}))
+    assert cache.make_key(catalog, 'SELECT random() FROM t') is None
+    assert cache.make_key(catalog, "SELECT * FROM read_csv('x.csv')") is None
+    assert cache.make_key(catalog, 'DELETE FROM t') is None
+    catalog.conn.execute('CREATE VIEW v AS SELECT * FROM t')
+    catalog.sync_tables()
+    assert cache.make_key(catalog, 'SELECT * FROM v') is None
+
+
+def test_linked_file_change_and_removal(catalog, write_csv):
+    cache = ResultCache()
+    path = write_csv('a\n1\n')
+    catalog.link_file('lk', path)
+    key = cache.make_key(catalog, 'SELECT * FROM lk')
+    with open(path, 'a') as f:
+        f.write('2\n')
+    os.utime(path, ns=(0, 10 ** 9))
+    changed = cache.make_key(catalog, 'SELECT * FROM lk')
+    assert changed != key
+
+    os.remove(path)
+    assert cache.make_key(catalog, 'SELECT * FROM lk') not in (key, changed)
+
+
+def test_lru_eviction_within_budget():
+    df = pd.DataFrame({'a': range(1000)})
+    size = int(df.memory_usage(deep=True).sum())
+    cache = ResultCache(max_bytes=size * 2)
+    cache.put('k1', df)
+    cache.put('k2', df)
+    assert cache.get('k1') is not None  # k1 变为最近使用
+    cache.put('k3', df)
+    assert cache.get('k2') is None
+    assert cache.get('k1') is not None and cache.get('k3') is not None
+    assert cache.stats()['bytes'] <= size * 2